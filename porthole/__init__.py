@@ -3,13 +3,15 @@ try:
     from .app import config
     from .connections import ConnectionManager
     from .contact_management import AutomatedReportContactManager
+    from .delimited import DelimitedFileBuilder
     from .getting_started import new_config, setup_tables
-    from .filters import ResultFilter
+    from .filters import ResultFilter, SortedResultFilter
     from .logger import PortholeLogger
     from .mailer import Mailer
     from .reports import BasicReport, GenericReport, ReportRunner
     from .tasks import DataTask
-    from .queries import QueryExecutor, QueryGenerator, QueryReader, QueryResult
+    from .queries import QueryExecutor, QueryGenerator, QueryReader, QueryResult, QueryResultStream, QueryResultView
+    from .schema import ColumnSchema
     from .workflows import SimpleWorkflow
     from .xlsx import WorkbookBuilder, WorkbookEditor
 except KeyError:
@@ -0,0 +1,93 @@
+from .frames import INT64_MAX, np, numpy_dtype
+
+# Aggregate functions, called with the non-null values of a group. Empty groups aggregate to None, except for count.
+AGGREGATES = {
+    'count': len,
+    'sum': lambda values: sum(values) if values else None,
+    'mean': lambda values: sum(values) / len(values) if values else None,
+    'min': lambda values: min(values) if values else None,
+    'max': lambda values: max(values) if values else None,
+}
+NUMPY_AGGREGATES = {'count', 'sum', 'mean', 'min', 'max'}
+
+
+def group_codes(rows, fields):
+    """
+    Assign a code to each distinct key (a tuple of the values of `fields`) in a single pass over the rows.
+    Returns the keys, in order of first appearance, and the code of each row.
+    """
+    codes = []
+    lookup = {}
+    keys = []
+    for row in rows:
+        key = tuple(row[field] for field in fields)
+        code = lookup.get(key)
+        if code is None:
+            code = lookup[key] = len(keys)
+            keys.append(key)
+        codes.append(code)
+    return keys, codes
+
+
+def aggregate_column(values, column_type, codes, group_count, func):
+    """
+    Aggregate a column of values by group code, returning one value for each group. `func` is the name of one of
+    AGGREGATES or a callable, which is called with a list of the non-null values of each group. Named aggregates of
+    int and float columns are computed using NumPy, if it is installed and the result would be exact (see
+    `numpy_exact`); otherwise they are computed in Python.
+    """
+    if np is not None and column_type in (int, float) and func in NUMPY_AGGREGATES and \
+            numpy_exact(values, column_type, func):
+        return numpy_aggregate(values, column_type, codes, group_count, func)
+    if not callable(func):
+        if func not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate <{func}>. Use one of {sorted(AGGREGATES)}, or a callable.")
+        func = AGGREGATES[func]
+    groups = [[] for _ in range(group_count)]
+    for code, value in zip(codes, values):
+        if value is not None:
+            groups[code].append(value)
+    return [func(group) for group in groups]
+
+
+def numpy_exact(values, column_type, func):
+    """
+    Whether NumPy would aggregate the values exactly: every non-null value must be of `column_type` (which describes
+    only the first), ints must fit in an int64, and integer sums must not be able to overflow it.
+    """
+    present = [value for value in values if value is not None]
+    if numpy_dtype(present, column_type, exact=True) is None:
+        return False
+    if column_type is int and func == 'sum' and present:
+        return max(-min(present), max(present)) * len(present) <= INT64_MAX
+    return True
+
+
+def numpy_aggregate(values, column_type, codes, group_count, func):
+    dtype = np.int64 if column_type is int else np.float64
+    codes = np.asarray(codes, dtype=np.intp)
+    if any(value is None for value in values):
+        present = np.array([value is not None for value in values], dtype=bool)
+        array = np.array([0 if value is None else value for value in values], dtype=dtype)[present]
+        codes = codes[present]
+    else:
+        array = np.array(values, dtype=dtype)
+    counts = np.bincount(codes, minlength=group_count)
+    if func == 'count':
+        return counts.tolist()
+    if func == 'mean':
+        sums = np.bincount(codes, weights=array, minlength=group_count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            aggregated = sums / counts
+    elif func == 'sum' and column_type is float:
+        aggregated = np.bincount(codes, weights=array, minlength=group_count)
+    elif func == 'sum':
+        aggregated = np.zeros(group_count, dtype=dtype)
+        np.add.at(aggregated, codes, array)
+    else:
+        limits = np.iinfo(dtype) if column_type is int else np.finfo(dtype)
+        initial = limits.max if func == 'min' else limits.min
+        aggregated = np.full(group_count, initial, dtype=dtype)
+        ufunc = np.minimum if func == 'min' else np.maximum
+        ufunc.at(aggregated, codes, array)
+    return [None if count == 0 else value for value, count in zip(aggregated.tolist(), counts.tolist())]
@@ -1,9 +1,11 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from . import TimeHelper
 from .app import config
 from .connections import ConnectionManager
+from .delimited import DELIMITED_FORMATS, DelimitedFileBuilder
 from .mailer import Mailer
-from .queries import QueryGenerator
+from .queries import DEFAULT_PREFETCH_BATCHES, QueryGenerator, QueryResult
 from .xlsx import WorkbookBuilder
 from .logger import PortholeLogger
 
@@ -13,42 +15,91 @@ class ReportWriter:
     The purpose of this class is to use the QueryGenerator and WorkbookBuilder
     together to make an Excel file and populate it with data.
     """
-    def __init__(self, report_title, logger=None):
+    def __init__(self, report_title, logger=None, output_format=None, row_threshold=None, large_output_format=None):
         self.report_title = report_title
         self.report_file = None
         self.file_path = config['Default'].get('base_file_path')
         self.workbook_builder = None
         self.record_count = 0
         self.logger = logger or PortholeLogger(report_title)
+        self.output_format = (output_format or config['Default'].get('output_format') or 'xlsx').lower()
+        if row_threshold is None and config['Default'].get('output_row_threshold'):
+            row_threshold = config['Default'].getint('output_row_threshold')
+        self.row_threshold = row_threshold
+        self.large_output_format = (
+            large_output_format or config['Default'].get('large_output_format') or 'zip'
+        ).lower()
+        self.base_filename = None
+        # Formats added before the builder exists (i.e. while the output format is undecided) are applied when it is.
+        self.pending_formats = []
+        for fmt in (self.output_format, self.large_output_format):
+            if fmt != 'xlsx' and fmt not in DELIMITED_FORMATS:
+                raise ValueError(f"Unsupported output format <{fmt}>.")
+
+    @property
+    def report_files(self):
+        """All files created by this ReportWriter."""
+        if isinstance(self.workbook_builder, DelimitedFileBuilder):
+            return list(self.workbook_builder.files)
+        return [self.report_file] if self.report_file else []
 
     def build_file(self):
         """
-        Loads file and path information and creates XLSX Writer Workbook object.
+        Loads file and path information and creates the object used to write the file(s).
         Default file is named with convention yyyy-mm-dd - Report Name.xlsx
+
+        The output format may be `xlsx` (default), or a delimited format: `csv`, `tsv`, `csv.gz`,
+        `tsv.gz`, or `zip` (one CSV per worksheet). Set it using the `output_format` argument or in
+        config. If a row threshold is set, the choice is deferred until the first worksheet is made:
+        if that worksheet's query returned more rows than the threshold, `large_output_format` is used.
+        The threshold has no effect if the first worksheet is streamed, since its row count is not known in advance.
         """
         try:
             # Construct the file path and create the workbook.
             local_timezone = config['Default'].get('local_timezone') or 'UTC'
             today = TimeHelper.today(timezone=local_timezone)
-            report_file_name = f"{today} - {self.report_title}.xlsx"
-            self.report_file = os.path.join(self.file_path, report_file_name)
-            self.workbook_builder = WorkbookBuilder(filename=self.report_file)
+            self.base_filename = os.path.join(self.file_path, f"{today} - {self.report_title}")
+            if self.row_threshold is None:
+                self.create_builder(self.output_format)
         except:
             error = "Unable to build file for {}".format(self.report_title)
             self.logger.exception(error)
 
+    def create_builder(self, output_format):
+        if output_format == 'xlsx':
+            self.report_file = f"{self.base_filename}.xlsx"
+            self.workbook_builder = WorkbookBuilder(filename=self.report_file)
+        else:
+            self.workbook_builder = DelimitedFileBuilder(self.base_filename, output_format)
+            self.report_file = self.workbook_builder.filename
+        for format_name, format_params in self.pending_formats:
+            self.workbook_builder.add_format(format_name, format_params)
+        self.pending_formats = []
+
+    def choose_output_format(self, query_results):
+        """Choose an output format based on the number of rows in the first worksheet, if known."""
+        result_count = query_results.result_count if isinstance(query_results, QueryResult) else None
+        if result_count is not None and result_count > self.row_threshold:
+            return self.large_output_format
+        return self.output_format
+
     def close_workbook(self):
         """
         Closes workbook object after creation is complete.
         Should always be executed before sending file.
         """
         if self.workbook_builder:
-            self.workbook_builder.workbook.close()
+            self.workbook_builder.close_workbook()
 
     def add_format(self, format_name, format_params):
-        self.workbook_builder.add_format(format_name, format_params)
+        if self.workbook_builder is None:
+            self.pending_formats.append((format_name, format_params))
+        else:
+            self.workbook_builder.add_format(format_name, format_params)
 
-    def execute_query(self, cm, query=None, sql=None, increment_counter=True):
+    def execute_query(
+            self, cm, query=None, sql=None, increment_counter=True, stream=False, batch_size=None, pipelined=False
+    ):
         """
         Args:
             cm              (ConnectionManager):
@@ -62,6 +113,12 @@ class ReportWriter:
                                 query_file containing parameter placeholders.
             sql             (str or sqlalchemy.sql.selectable.Select statement):
                                 Optional. A SQL query ready for execution.
+            increment_counter (bool): Optional. Add the number of rows returned to `record_count`.
+            stream          (bool): Optional. Return a QueryResultStream which fetches rows in batches
+                                as it is consumed, rather than fetching all rows up front.
+            batch_size      (int): Optional. Number of rows to fetch at a time when streaming.
+            pipelined       (bool): Optional. Stream the results, fetching batches on a producer thread
+                                so that fetching overlaps with writing the worksheet. Implies `stream`.
 
         Executes SQL and returns QueryResult object, containing data and metadata.
         """
@@ -71,23 +128,48 @@ class ReportWriter:
         params = query.get('params')
         q = QueryGenerator(cm=cm, filename=filename, params=params, sql=sql, logger=self.logger)
         try:
+            if stream or pipelined:
+                row_counter = self.increment_record_count if increment_counter else None
+                prefetch_batches = DEFAULT_PREFETCH_BATCHES if pipelined else None
+                return q.execute(
+                    stream=True, batch_size=batch_size, row_counter=row_counter, prefetch_batches=prefetch_batches
+                )
             results = q.execute()
             if increment_counter:
-                self.record_count += results.result_count
+                self.increment_record_count(results.result_count)
             return results
         except:
             error = "Unable to execute query {}".format(query.get('filename'))
             self.logger.exception(error)
 
+    def increment_record_count(self, count):
+        self.record_count += count
+
     def make_worksheet(self, sheet_name, query_results, **kwargs):
-        """Adds worksheet to workbook using provided query results."""
+        """
+        Adds worksheet to workbook using provided query results, which may be a QueryResultStream
+        (or any other iterable of rows with `field_names`, such as JoinedRows).
+        """
         try:
-            self.workbook_builder.add_worksheet(
-                sheet_name=sheet_name,
-                field_names=query_results.field_names,
-                sheet_data=query_results.result_data,
-                **kwargs
-            )
+            if self.workbook_builder is None and self.base_filename is not None:
+                self.create_builder(self.choose_output_format(query_results))
+            if not isinstance(query_results, QueryResult):
+                self.workbook_builder.add_worksheet_stream(
+                    sheet_name=sheet_name,
+                    field_names=query_results.field_names,
+                    rows_iter=query_results,
+                    **kwargs
+                )
+            else:
+                kwargs.setdefault('schema', getattr(query_results, 'schema', None))
+                self.workbook_builder.add_worksheet(
+                    sheet_name=sheet_name,
+                    field_names=query_results.field_names,
+                    sheet_data=query_results.result_data,
+                    **kwargs
+                )
+            # Delimited files are named after their first worksheet, so the file name is only known once it is written.
+            self.report_file = self.workbook_builder.filename
         except:
             error = "Unable to add worksheet {}".format(sheet_name)
             self.logger.exception(error)
@@ -107,6 +189,8 @@ class ReportWriter:
             sql             (str or sqlalchemy.sql.selectable.Select statement):
                                 Optional. A SQL query ready for execution.
             query_kwargs    (dict): Optional. Dictionary of keyword arguments to pass to `execute_query`.
+                                Pass {'stream': True} to write rows to the worksheet as they are fetched,
+                                or {'pipelined': True} to also fetch on a separate thread while writing.
             worksheet_kwargs (dict): Optional. Dictionary of keyword arguments to pass to `make_worksheet`
 
         Executes a query and uses results to add worksheet to ReportWriter.workbook_builder.
@@ -120,6 +204,59 @@ class ReportWriter:
         results = self.execute_query(cm=cm, query=query, sql=sql, **query_kwargs)
         self.make_worksheet(sheet_name=sheet_name, query_results=results, **worksheet_kwargs)
 
+    def create_worksheets_from_queries(self, worksheets, max_workers=None):
+        """
+        Args:
+            worksheets      (list): Dictionaries of keyword arguments for `create_worksheet_from_query`, one
+                                for each worksheet to be created. Each must include `cm` and `sheet_name`.
+            max_workers     (int): Optional. The maximum number of queries to execute at once. By default,
+                                all queries are executed at once.
+
+        Executes all queries concurrently, each using its own connection from the connection pool of the
+        provided ConnectionManager's engine, and then adds worksheets to ReportWriter.workbook_builder in the
+        order provided. Records are counted and errors are logged exactly as in `create_worksheet_from_query`.
+        """
+        worksheets = list(worksheets)
+        if not worksheets:
+            return
+        connections = []
+
+        def run_query(worksheet):
+            query_kwargs = dict(worksheet.get('query_kwargs') or {})
+            increment_counter = query_kwargs.pop('increment_counter', True)
+            streaming = bool(query_kwargs.get('stream') or query_kwargs.get('pipelined'))
+            try:
+                cm = worksheet['cm'].clone()
+            except:
+                error = "Unable to connect to {} for worksheet {}".format(worksheet['cm'].db, worksheet['sheet_name'])
+                self.logger.exception(error)
+                return None, False
+            connections.append(cm)
+            # Streamed results are counted as they are written. Otherwise, count once all queries are complete.
+            results = self.execute_query(
+                cm=cm,
+                query=worksheet.get('query') or {},
+                sql=worksheet.get('sql'),
+                increment_counter=increment_counter and streaming,
+                **query_kwargs
+            )
+            return results, increment_counter and not streaming
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers or len(worksheets)) as executor:
+                all_results = list(executor.map(run_query, worksheets))
+            for worksheet, (results, increment_counter) in zip(worksheets, all_results):
+                if increment_counter and isinstance(results, QueryResult):
+                    self.increment_record_count(results.result_count)
+                self.make_worksheet(
+                    sheet_name=worksheet['sheet_name'],
+                    query_results=results,
+                    **(worksheet.get('worksheet_kwargs') or {})
+                )
+        finally:
+            for cm in connections:
+                cm.close()
+
 
 class ReportErrorNotifier:
 
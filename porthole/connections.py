@@ -4,6 +4,9 @@ from .logger import PortholeLogger
 
 
 class ConnectionManager:
+    # When enabled (see `enable_engine_cache`), engines are shared by all ConnectionManagers for the same database.
+    engine_cache = None
+
     def __init__(self, db=None, logger=None):
         self.db = db
         self.logger = logger or PortholeLogger(name=__name__)
@@ -18,6 +21,7 @@ class ConnectionManager:
         self.config = config
         self.engine = None
         self.conn = None
+        self.owns_engine = True
         if db:
             self.unpack_params()
 
@@ -35,7 +39,11 @@ class ConnectionManager:
         if not self.db:
             raise ValueError("Cannot connect - db attribute not set.")
         try:
-            self.engine = self.create_engine()
+            if ConnectionManager.engine_cache is not None:
+                self.engine = self.cached_engine()
+                self.owns_engine = False
+            else:
+                self.engine = self.create_engine()
             self.conn = self.engine.connect()
         except Exception as e:
             self.logger.exception(e)
@@ -44,7 +52,11 @@ class ConnectionManager:
     def create_engine(self):
         rdbms = self.rdbms.lower()
         if rdbms == 'sqlite':
-            return create_engine('sqlite:///{db_host}'.format(**self.__dict__))
+            # Allow results to be fetched from a different thread than the one which executed the query.
+            return create_engine(
+                'sqlite:///{db_host}'.format(**self.__dict__),
+                connect_args={'check_same_thread': False}
+            )
         elif rdbms == 'mysql':
             return create_engine('mysql+pymysql://{db_user}:{db_password}@{db_host}'.format(**self.__dict__))
         elif rdbms in ['postgresql', 'postgres']:
@@ -54,9 +66,47 @@ class ConnectionManager:
         else:
             raise ValueError("Unsupported RDBMS: {}".format(self.rdbms))
 
+    def cached_engine(self):
+        engine = ConnectionManager.engine_cache.get(self.db)
+        if engine is None:
+            engine = ConnectionManager.engine_cache[self.db] = self.create_engine()
+        return engine
+
+    @classmethod
+    def enable_engine_cache(cls):
+        """
+        Share one engine (and therefore one connection pool) per database among all ConnectionManagers, rather than
+        creating and disposing of an engine for each, e.g. when running many reports in one process.
+        """
+        if cls.engine_cache is None:
+            cls.engine_cache = {}
+
+    @classmethod
+    def dispose_engine_cache(cls):
+        """Dispose of all cached engines, and stop caching engines."""
+        engines, cls.engine_cache = cls.engine_cache or {}, None
+        for engine in engines.values():
+            engine.dispose()
+
+    def clone(self):
+        """
+        Return a new ConnectionManager for the same database, with its own connection checked out from this
+        manager's engine (and therefore its connection pool). Closing the clone does not dispose of the engine.
+        """
+        cm = ConnectionManager(self.db, logger=self.logger)
+        cm.engine = self.engine
+        cm.owns_engine = False
+        try:
+            cm.conn = self.engine.connect()
+        except Exception as e:
+            self.logger.exception(e)
+            raise
+        return cm
+
     def close(self):
         self.conn.close()
-        self.engine.dispose()
+        if self.owns_engine:
+            self.engine.dispose()
 
     def closed(self):
         if self.conn:
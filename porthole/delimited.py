@@ -0,0 +1,87 @@
+import csv
+import gzip
+import io
+import zipfile
+
+# Delimiter and compression for each supported delimited output format.
+DELIMITED_FORMATS = {
+    'csv': (',', None),
+    'csv.gz': (',', 'gzip'),
+    'tsv': ('\t', None),
+    'tsv.gz': ('\t', 'gzip'),
+    'zip': (',', 'zip'),
+}
+
+
+class DelimitedFileBuilder(object):
+    """
+    Writes worksheets as delimited text files, mirroring the interface of WorkbookBuilder so that reports can switch
+    between output formats by configuration. Rows are streamed to the (optionally compressed) file as they are
+    consumed. Formatting options accepted by WorkbookBuilder are ignored.
+
+    Each worksheet is written to its own file named `{base_filename} - {sheet_name}.csv` (or `.tsv`, `.csv.gz`,
+    etc.), except in `zip` format, where all worksheets are written as members of a single `{base_filename}.zip`.
+    `filename` is the zip archive, or otherwise the first file written (None until a worksheet is added), and `files`
+    lists every file written.
+
+    Keyword arguments
+    :base_filename: (str) The path and name of the output file(s), without extension.
+    :output_format: (str) One of the keys of DELIMITED_FORMATS.
+
+    """
+    def __init__(self, base_filename, output_format='csv'):
+        if output_format not in DELIMITED_FORMATS:
+            raise ValueError(f"Unsupported output format <{output_format}>.")
+        self.base_filename = base_filename
+        self.output_format = output_format
+        self.delimiter, self.compression = DELIMITED_FORMATS[output_format]
+        self.extension = 'tsv' if self.delimiter == '\t' else 'csv'
+        self.files = []
+        self.archive = None
+        self.filename = None
+        if self.compression == 'zip':
+            self.filename = f"{base_filename}.zip"
+            self.archive = zipfile.ZipFile(self.filename, 'w', compression=zipfile.ZIP_DEFLATED)
+            self.files.append(self.filename)
+
+    def add_format(self, format_name, format_params):
+        """Formats do not apply to delimited files, and are ignored."""
+        pass
+
+    def add_worksheet(self, sheet_name, field_names, sheet_data, **kwargs):
+        return self.add_worksheet_stream(sheet_name, field_names, sheet_data, **kwargs)
+
+    def add_worksheet_stream(self, sheet_name, field_names, rows_iter, **kwargs):
+        """
+        Write field names and rows to a new delimited file (or zip archive member).
+
+        :return: The number of data rows written.
+        """
+        rows_written = 0
+        with self.open_sheet(sheet_name) as f:
+            writer = csv.writer(f, delimiter=self.delimiter)
+            writer.writerow(field_names)
+            for row in rows_iter:
+                writer.writerow(row)
+                rows_written += 1
+        return rows_written
+
+    def open_sheet(self, sheet_name):
+        """Return a text file object to which a worksheet's rows can be written."""
+        if self.archive is not None:
+            member = self.archive.open(f"{sheet_name}.{self.extension}", 'w', force_zip64=True)
+            return io.TextIOWrapper(member, encoding='utf-8', newline='')
+        if self.compression == 'gzip':
+            filename = f"{self.base_filename} - {sheet_name}.{self.extension}.gz"
+            f = gzip.open(filename, 'wt', encoding='utf-8', newline='')
+        else:
+            filename = f"{self.base_filename} - {sheet_name}.{self.extension}"
+            f = open(filename, 'w', encoding='utf-8', newline='')
+        self.files.append(filename)
+        if self.filename is None:
+            self.filename = filename
+        return f
+
+    def close_workbook(self):
+        if self.archive is not None:
+            self.archive.close()
@@ -1,17 +1,26 @@
-from .queries import QueryResult
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from .queries import QueryResult, QueryResultView
 
 
 class ResultFilter(object):
     """
-    Used for splitting a QueryResult on a specified attribute into sub-results.
-    Subsets of the provided QueryResultw ill be created for each distinct value
-    of the specified field.
+    Used for splitting a QueryResult on one or more specified attributes into sub-results.
+    Subsets of the provided QueryResult will be created for each distinct value (or
+    combination of values) of the specified field(s).
     ResultFilter objects are iterables which iterate through the filtered_results
     attribute.
 
+    Rows are grouped in a single pass using a dictionary. Each sub-result is a QueryResultView,
+    which refers to the rows of the provided QueryResult by index rather than copying them.
+    `filtered_data` maps each key to the list of its rows (built only when a key is accessed), and `filtered_indexes`
+    to the indexes of its rows.
+
     Keyword arguments
     :result_to_filter: (QueryResult) The object to be split.
-    :filter_by: (str) The field name on which to split.
+    :filter_by: (str or list) The field name on which to split, or a list of field names, in
+        which case each key is a tuple of values.
 
     """
     def __init__(self, result_to_filter, filter_by):
@@ -20,24 +29,61 @@ class ResultFilter(object):
         self.data = result_to_filter.result_data
         self.filter_by = filter_by
         self.keys = []
-        self.filtered_data = {}
+        self.filtered_indexes = {}
         self.filtered_results = {}
-        self.filter_by = filter_by
-        if filter_by not in self.headers:
+        self.filtered_data = FilteredData(self.filtered_results)
+        self.filter_fields = [filter_by] if isinstance(filter_by, str) else list(filter_by)
+        if not self.filter_fields or any(field not in self.headers for field in self.filter_fields):
             raise ValueError("Provided headers must contain filter_by value.")
 
     def filter(self):
-        for row in self.data:
-            key = row[self.filter_by]
-            if key not in self.keys:
-                self.keys.append(key)
-                self.filtered_data[key] = []
-            self.filtered_data[key].append(list(row))
-        for key in self.keys:
-            self.filtered_results[key] = QueryResult(
-                field_names=list(self.headers),
-                result_data=self.filtered_data[key]
-                )
+        encoded = None
+        if len(self.filter_fields) == 1:
+            encoded = self.result_to_filter.encoded_column(self.filter_fields[0])
+        if encoded is not None:
+            groups = self.group_encoded(encoded)
+        else:
+            groups = self.group()
+        for key, indexes in groups.items():
+            self.keys.append(key)
+            self.filtered_indexes[key] = indexes
+            self.filtered_results[key] = QueryResultView(self.result_to_filter, indexes)
+
+    def group(self):
+        """Return a dictionary of the indexes of the rows for each key, in order of first appearance."""
+        groups = {}
+        if len(self.filter_fields) == 1:
+            field = self.filter_fields[0]
+            keys = (row[field] for row in self.data)
+        else:
+            fields = self.filter_fields
+            keys = (tuple(row[field] for field in fields) for row in self.data)
+        for idx, key in enumerate(keys):
+            indexes = groups.get(key)
+            if indexes is None:
+                indexes = groups[key] = []
+            indexes.append(idx)
+        return groups
+
+    def group_encoded(self, column):
+        """Group rows by the codes of a dictionary-encoded column, rather than by comparing values."""
+        groups = [[] for _ in column.values]
+        for idx, code in enumerate(column.codes):
+            groups[code].append(idx)
+        return dict(zip(column.values, groups))
+
+    def for_each(self, callback, max_workers=None):
+        """
+        Call `callback(key, sub_result)` for every group, filtering first if necessary. If `max_workers` is provided,
+        groups are processed concurrently by a pool of threads. Returns the return value of each call, in key order.
+        """
+        if not self.keys:
+            self.filter()
+        if max_workers is None:
+            return [callback(key, result) for key, result in self]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(callback, key, result) for key, result in self]
+            return [future.result() for future in futures]
 
     def __iter__(self):
         self.pos = 0
@@ -51,3 +97,59 @@ class ResultFilter(object):
             return key, self.filtered_results[key]
         else:
             raise StopIteration
+
+
+class FilteredData(Mapping):
+    """A read-only mapping from each key of a ResultFilter to the list of its rows, built when the key is accessed."""
+    def __init__(self, filtered_results):
+        self.filtered_results = filtered_results
+
+    def __getitem__(self, key):
+        return self.filtered_results[key].result_data
+
+    def __iter__(self):
+        return iter(self.filtered_results)
+
+    def __len__(self):
+        return len(self.filtered_results)
+
+
+class SortedResultFilter(object):
+    """
+    Used for splitting rows which are already sorted on the specified attribute(s), e.g. using
+    ORDER BY in the query, into sub-results as they are read. Iterating yields `(key, QueryResult)`
+    as each group completes, holding only the current group in memory, so a QueryResultStream can
+    be split in constant memory regardless of the size of the result.
+
+    Raises ValueError during iteration if a key reappears after its group has completed, which
+    means that the rows are not sorted on the filter_by field(s).
+
+    Keyword arguments
+    :rows: (QueryResult, QueryResultStream or iterable of RowDict) The rows to be split.
+    :filter_by: (str or list) The field name on which to split, or a list of field names, in
+        which case each key is a tuple of values.
+    :field_names: (list) Optional. Required if `rows` has no `field_names` attribute.
+
+    """
+    def __init__(self, rows, filter_by, field_names=None):
+        self.field_names = field_names or rows.field_names
+        self.rows = rows.result_data if isinstance(rows, QueryResult) else rows
+        self.filter_by = filter_by
+        self.filter_fields = [filter_by] if isinstance(filter_by, str) else list(filter_by)
+        if not self.filter_fields or any(field not in self.field_names for field in self.filter_fields):
+            raise ValueError("Provided headers must contain filter_by value.")
+
+    def key(self, row):
+        if len(self.filter_fields) == 1:
+            return row[self.filter_fields[0]]
+        return tuple(row[field] for field in self.filter_fields)
+
+    def __iter__(self):
+        completed = set()
+        for key, rows in groupby(self.rows, key=self.key):
+            if key in completed:
+                raise ValueError(
+                    f"Rows are not sorted by {self.filter_by}; key {key!r} appears in more than one group."
+                )
+            completed.add(key)
+            yield key, QueryResult.from_row_dicts(list(self.field_names), list(rows))
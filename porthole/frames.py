@@ -0,0 +1,125 @@
+from datetime import date, datetime
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# NumPy dtypes for columns of fixed-width types, keyed by column type. Columns of other types use the object dtype.
+NUMPY_DTYPES = {
+    int: 'int64',
+    float: 'float64',
+    bool: 'bool',
+    date: 'datetime64[D]',
+    datetime: 'datetime64[us]',
+}
+# Dtypes to use instead when a column contains nulls.
+NULLABLE_NUMPY_DTYPES = {
+    int: 'float64',
+    float: 'float64',
+    date: 'datetime64[D]',
+    datetime: 'datetime64[us]',
+}
+
+
+def require(module, package, method):
+    if module is None:
+        raise ModuleNotFoundError(
+            f"{package} is a required dependency to use {method}, but is not currently installed."
+        )
+
+
+# The range of values which fit in an int64.
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+def numpy_dtype(values, column_type, exact=False):
+    """
+    Return the NumPy dtype for a column of values, checking every value rather than trusting `column_type` (which
+    may describe only the first non-null value), or None if the values must be held in an object array.
+
+    A column is typed only if every non-null value is exactly of `column_type`, and ints only if they all fit in an
+    int64. Otherwise, a mix of ints and floats is typed as float64, and nulls become NaN or NaT in numeric and date
+    columns - unless `exact` is True, in which case None is returned for any column which would not convert back to
+    the same values (i.e. a mix of ints and floats, or ints with nulls).
+    """
+    dtype = NUMPY_DTYPES.get(column_type)
+    if dtype is None:
+        return None
+    has_nulls = False
+    mixed_numbers = False
+    for value in values:
+        if value is None:
+            has_nulls = True
+        elif value.__class__ is not column_type:
+            if column_type in (int, float) and value.__class__ in (int, float):
+                mixed_numbers = True
+            else:
+                return None
+    if column_type is int or mixed_numbers:
+        ints = [value for value in values if value.__class__ is int]
+        if ints and (min(ints) < INT64_MIN or max(ints) > INT64_MAX):
+            return None
+    if mixed_numbers:
+        return None if exact else 'float64'
+    if column_type is datetime and any(value.tzinfo is not None for value in values if value is not None):
+        return None
+    if has_nulls:
+        if exact and column_type is int:
+            return None
+        return NULLABLE_NUMPY_DTYPES.get(column_type)
+    return dtype
+
+
+def to_numpy_array(values, column_type, exact=False):
+    """
+    Convert a column of values to a NumPy array, typed according to `numpy_dtype` where possible, or else of the
+    object dtype. Nulls become NaN or NaT in numeric and date columns, unless `exact` is True.
+    """
+    require(np, 'numpy', 'to_numpy')
+    dtype = numpy_dtype(values, column_type, exact) or object
+    try:
+        return np.array(values, dtype=dtype)
+    except (TypeError, ValueError, OverflowError):
+        return np.array(values, dtype=object)
+
+
+def to_numpy_arrays(columns, column_types):
+    return [to_numpy_array(values, column_type) for values, column_type in zip(columns, column_types)]
+
+
+def to_dataframe(field_names, columns, column_types):
+    require(pd, 'pandas', 'to_pandas')
+    arrays = to_numpy_arrays(columns, column_types)
+    return pd.DataFrame(dict(zip(field_names, arrays)), columns=field_names)
+
+
+def to_arrow_table(field_names, columns):
+    require(pa, 'pyarrow', 'to_arrow')
+    return pa.Table.from_arrays([pa.array(values) for values in columns], names=list(field_names))
+
+
+def dataframe_columns(df):
+    """
+    Return the field names of a pandas DataFrame and a list of values for each of its columns. Values are converted to
+    native Python types, and nulls (NaN, NaT or None) to None, so that they can be written by WorkbookBuilder.
+    """
+    require(pd, 'pandas', 'from_dataframe')
+    field_names = [str(column) for column in df.columns]
+    columns = []
+    for _, series in df.items():
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = list(series.dt.to_pydatetime())
+        else:
+            values = series.astype(object).tolist()
+        nulls = series.isna().tolist()
+        columns.append([None if null else value for value, null in zip(values, nulls)])
+    return field_names, columns
@@ -18,6 +18,7 @@ Default = OrderedDict([
     ('notification_recipient', NONE),
     ('project', NONE),
     ('local_timezone', 'UTC'),
+    ('output_format', 'xlsx'),
 ])
 
 ConnectionName = OrderedDict([(
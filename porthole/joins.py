@@ -0,0 +1,122 @@
+JOIN_TYPES = ('inner', 'left')
+
+
+def key_function(fields):
+    """
+    Return a function which extracts the join key from a row: a single value, or a tuple of values if more than one
+    field is provided. Keys containing nulls are returned as None, since nulls never match.
+    """
+    if len(fields) == 1:
+        field = fields[0]
+        return lambda row: row[field]
+
+    def key(row):
+        values = tuple(row[field] for field in fields)
+        return None if None in values else values
+
+    return key
+
+
+def joined_field_names(left_fields, right_fields, left_on, right_on, suffix='_right'):
+    """
+    Return the field names of a join, and the fields from the right side which are included. Right-side join fields
+    with the same names as left-side join fields are omitted; other right-side fields which share a name with a
+    left-side field are renamed using `suffix`.
+    """
+    included = [
+        field for field in right_fields
+        if not (field in right_on and left_on[right_on.index(field)] == field)
+    ]
+    names = list(left_fields)
+    for field in included:
+        name = field
+        while name in names:
+            name += suffix
+        names.append(name)
+    return names, included
+
+
+def build_index(rows, key):
+    index = {}
+    for row in rows:
+        row_key = key(row)
+        if row_key is None:
+            continue
+        matches = index.get(row_key)
+        if matches is None:
+            matches = index[row_key] = []
+        matches.append(row)
+    return index
+
+
+def hash_join(left_rows, right_rows, left_key, right_key, how='inner', build_left=False, ordered=True):
+    """
+    Join two sequences of rows, yielding `(left_row, right_row)` for each match, and `(left_row, None)` for unmatched
+    left rows if `how` is 'left'. A hash index is built on one side, by default the right; the other side is only
+    iterated over once, and may be a stream. If `build_left` is True, the left rows must be a sequence.
+
+    Pairs are yielded in the order of the left rows, and for each left row in the order of the right rows. If the
+    index is built on the left side and `ordered` is False, pairs are instead yielded as the right rows are read,
+    followed by unmatched left rows, so that the right rows may be streamed without holding the matches in memory.
+    """
+    if how not in JOIN_TYPES:
+        raise ValueError(f"Join type must be one of {JOIN_TYPES}.")
+    if not build_left:
+        index = build_index(right_rows, right_key)
+        for left in left_rows:
+            row_key = left_key(left)
+            matches = index.get(row_key) if row_key is not None else None
+            if matches:
+                for right in matches:
+                    yield left, right
+            elif how == 'left':
+                yield left, None
+        return
+    index = build_index(enumerate(left_rows), lambda item: left_key(item[1]))
+    if ordered:
+        matched = [None] * len(left_rows)
+        for right in right_rows:
+            row_key = right_key(right)
+            matches = index.get(row_key) if row_key is not None else None
+            for idx, _ in matches or ():
+                if matched[idx] is None:
+                    matched[idx] = []
+                matched[idx].append(right)
+        for left, rights in zip(left_rows, matched):
+            if rights:
+                for right in rights:
+                    yield left, right
+            elif how == 'left':
+                yield left, None
+        return
+    matched = bytearray(len(left_rows)) if how == 'left' else None
+    for right in right_rows:
+        row_key = right_key(right)
+        matches = index.get(row_key) if row_key is not None else None
+        if not matches:
+            continue
+        for idx, left in matches:
+            if matched is not None:
+                matched[idx] = 1
+            yield left, right
+    if matched is not None:
+        for idx, left in enumerate(left_rows):
+            if not matched[idx]:
+                yield left, None
+
+
+class JoinedRows(object):
+    """
+    The rows of a join, computed as they are iterated over. Like a QueryResultStream, JoinedRows has `field_names`,
+    can be written using WorkbookBuilder.add_worksheet_stream, and can only be iterated over once if either side of
+    the join is a stream. `result_count` reflects the number of rows consumed so far.
+    """
+    def __init__(self, field_names, rows):
+        self.field_names = field_names
+        self.rows = rows
+        self.result_count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.result_count += 1
+            yield row
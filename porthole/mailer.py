@@ -16,6 +16,11 @@ COMMASPACE = ', '
 
 
 class Mailer:
+    # When enabled (see `enable_shared_connection`), one SMTP connection is reused for every email sent.
+    share_connection = False
+    shared_smtp = None
+    shared_smtp_key = None
+
     def __init__(
             self,
             recipients=None,
@@ -103,20 +108,59 @@ Active report would have been sent to:
             all_recipients.append(self.admin_email)
 
         try:
-            with smtplib.SMTP(host=self.host, port='587') as s:
-                s.ehlo()
-                s.starttls()
-                s.login(self.username, self.password)
-                s.sendmail(self.send_from,
-                           all_recipients,
-                           composed)
-                self.all_sent_to_recipients = all_recipients
-                s.close()
-                self.logger.info("Email with subject '{}...' sent to {} recipients".format(self.subject, len(all_recipients)))
+            if Mailer.share_connection:
+                self.shared_connection().sendmail(self.send_from, all_recipients, composed)
+            else:
+                with self.connect() as s:
+                    s.sendmail(self.send_from,
+                               all_recipients,
+                               composed)
+            self.all_sent_to_recipients = all_recipients
+            self.logger.info("Email with subject '{}...' sent to {} recipients".format(self.subject, len(all_recipients)))
         except Exception as e:
             self.logger.exception(e)
             raise
 
+    def connect(self):
+        """Open and log in to an SMTP connection."""
+        s = smtplib.SMTP(host=self.host, port='587')
+        s.ehlo()
+        s.starttls()
+        s.login(self.username, self.password)
+        return s
+
+    def shared_connection(self):
+        """Return the shared SMTP connection, reconnecting if it has been dropped or was made with other settings."""
+        key = (self.host, self.username)
+        s = Mailer.shared_smtp
+        if s is not None and Mailer.shared_smtp_key == key:
+            try:
+                if s.noop()[0] == 250:
+                    return s
+            except (smtplib.SMTPException, OSError):
+                pass
+        Mailer.close_shared_connection(disable=False)
+        Mailer.shared_smtp = self.connect()
+        Mailer.shared_smtp_key = key
+        return Mailer.shared_smtp
+
+    @classmethod
+    def enable_shared_connection(cls):
+        """Reuse one SMTP connection for every email sent, e.g. when running many reports in one process."""
+        cls.share_connection = True
+
+    @classmethod
+    def close_shared_connection(cls, disable=True):
+        """Close the shared SMTP connection, if open, and (by default) stop sharing connections."""
+        s, cls.shared_smtp, cls.shared_smtp_key = cls.shared_smtp, None, None
+        if s is not None:
+            try:
+                s.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        if disable:
+            cls.share_connection = False
+
 
 if __name__ == '__main__':
     pass
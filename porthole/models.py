@@ -102,6 +102,23 @@ class ReportLog(Base):
         self.completed_at = TimeHelper.now(string=False)
 
 
+class ReportRun(Base):
+    __tablename__ = "report_runs"
+    id = Column("id", Integer, primary_key=True)
+    report_name = Column("report_name", String(64), nullable=False)
+    run_type = Column("run_type", String(16), nullable=False, server_default="report")
+    status = Column("status", String(16), nullable=False, server_default="queued", index=True)
+    attempts = Column("attempts", Integer, nullable=False, server_default="0")
+    max_attempts = Column("max_attempts", Integer, nullable=False, server_default="3")
+    worker = Column("worker", String(128))
+    claimed_at = Column("claimed_at", DateTime)
+    heartbeat_at = Column("heartbeat_at", DateTime)
+    completed_at = Column("completed_at", DateTime)
+    error_detail = Column("error_detail", String(255))
+    created_at = Column("created_at", DateTime, server_default=func.now())
+    updated_at = Column("updated_at", DateTime, onupdate=func.now())
+
+
 class ReportLogDetail(Base):
     __tablename__ = "report_log_details"
     id = Column("id", Integer, primary_key=True)
@@ -1,27 +1,75 @@
 import os, re, json
+import queue
+import threading
+from bisect import bisect_left, bisect_right
 from collections import OrderedDict
 from decimal import Decimal
 from datetime import date
+from numbers import Number
+from . import aggregates, frames, joins, transforms
 from .app import config
 from .connections import ConnectionManager
 from .logger import PortholeLogger
+from .schema import ColumnSchema, DictionaryColumn, JSON_CONVERTERS
+from .spill import SpilledRows, estimate_rows_size
 
 RE_SQL_STATEMENT = re.compile(''';(?=(?:[^"'`]*["'`][^"'`]*["'`])*[^"'`]*$)''')
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_PREFETCH_BATCHES = 4
 
 
 class QueryResult(object):
-    """Represent result data from an executed query. Includes capability to write results as json."""
+    """
+    Represent result data from an executed query. Includes capability to write results as json.
+
+    `result_data` may be provided as SpilledRows, in which case rows are kept on disk and read back as they are
+    iterated over, rather than being held in memory.
+    """
 
     def __init__(self, result_count=None, field_names=None, result_data=None, row_proxies=None):
+        # Incremented whenever rows change through this object, so that FieldIndexes can cheaply detect staleness.
+        self._version = 0
         self.result_count = result_count
         self.field_names = field_names
-        self.result_data = [RowDict(fields=field_names, values=row) for row in result_data]
+        if isinstance(result_data, SpilledRows):
+            if len(field_names) > len(set(field_names)):
+                raise ValueError("Field names must be unique, but your result set contains non-unique field names.")
+            self.result_data = result_data
+        else:
+            self.result_data = [RowDict(fields=field_names, values=row) for row in result_data]
         self.row_proxies = row_proxies
         self.field_index = {field: idx for idx, field in enumerate(field_names)}
+        self.encoded_columns = {}
+        self._indexes = {}
+        self._schema = None
+
+    @property
+    def schema(self):
+        """A ColumnSchema describing the type of each field, computed once and cached until data is modified."""
+        if self._schema is None:
+            self._schema = ColumnSchema.from_rows(self.field_names, self.result_data)
+        return self._schema
+
+    @property
+    def result_data(self):
+        return self._result_data
+
+    @result_data.setter
+    def result_data(self, result_data):
+        self._result_data = result_data
+        self._version += 1
+
+    @property
+    def spilled(self):
+        """True if rows are stored on disk rather than in memory."""
+        return isinstance(self.result_data, SpilledRows)
 
     @staticmethod
     def json_converter(obj):
         """Required to convert datatypes not otherwise json serializable."""
+        converter = JSON_CONVERTERS.get(obj.__class__)
+        if converter is not None:
+            return converter(obj)
         if isinstance(obj, Decimal):
             return float(obj)
         elif isinstance(obj, date):
@@ -34,16 +82,545 @@ class QueryResult(object):
 
     def write_to_json(self, filename):
         with open(filename, 'w') as f:
-            json.dump(self.result_data, f, default=self.json_converter)
+            if not self.spilled:
+                json.dump(self.result_data, f, default=self.json_converter)
+                return
+            # Spilled rows are written one at a time, producing the same output as json.dump.
+            f.write('[')
+            for idx, row in enumerate(self.result_data):
+                if idx:
+                    f.write(', ')
+                json.dump(row, f, default=self.json_converter)
+            f.write(']')
+
+    def _update_rows(self, func, fields=None):
+        """
+        Call `func` on every row, ensuring that changes are kept even if rows are spilled to disk.
+        `fields` are the fields modified by `func`, if known, so that only their indexes and encodings are discarded.
+        """
+        if self.spilled:
+            self.result_data = self.result_data.updated(func)
+        else:
+            for row in self.result_data:
+                func(row)
+        self._discard_caches(fields)
+
+    def _discard_caches(self, fields=None):
+        """Discard the schema, and the indexes and encodings of `fields` (or of every field), after rows change."""
+        self._schema = None
+        self._version += 1
+        if fields is None:
+            self.encoded_columns = {}
+            self._indexes = {}
+        for field in fields or []:
+            self.encoded_columns.pop(field, None)
+            self._indexes.pop(field, None)
+        # Indexes of unchanged fields remain current.
+        for index in self._indexes.values():
+            index.version = self._version
 
     def map_function_to_field(self, field, func):
         assert field in self.field_names
-        for row in self.result_data:
+
+        def update(row):
             row[field] = func(row[field])
 
+        self._update_rows(update, fields=[field])
+
     def apply(self, func):
-        for row in self.result_data:
-            func(row)
+        self._update_rows(func)
+
+    def column(self, field):
+        """Return a list of all values of the provided field."""
+        return [row[field] for row in self.result_data]
+
+    def columns(self):
+        """Return a list of the values of each field, in order, built in a single pass over the rows."""
+        columns = [list(values) for values in zip(*self.result_data)]
+        return columns or [[] for _ in self.field_names]
+
+    def to_numpy(self):
+        """
+        Return an OrderedDict of a NumPy array for each field. Columns of fixed-width types (ints, floats, bools,
+        dates and naive datetimes) become typed arrays; others use the object dtype. Requires numpy.
+        """
+        arrays = frames.to_numpy_arrays(self.columns(), self.schema.column_types)
+        return OrderedDict(zip(self.field_names, arrays))
+
+    def to_pandas(self):
+        """Return a pandas DataFrame, built from the typed arrays of `to_numpy`. Requires pandas."""
+        return frames.to_dataframe(self.field_names, self.columns(), self.schema.column_types)
+
+    def to_arrow(self):
+        """Return a pyarrow Table. Requires pyarrow."""
+        return frames.to_arrow_table(self.field_names, self.columns())
+
+    @classmethod
+    def from_row_dicts(cls, field_names, rows):
+        """Create a QueryResult containing the provided list of RowDicts, without copying them."""
+        result = cls(result_count=len(rows), field_names=field_names, result_data=[])
+        result.result_data = rows
+        return result
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Create a QueryResult from a pandas DataFrame, e.g. in order to write it using WorkbookBuilder.
+        Values are converted to native Python types, and nulls to None.
+        """
+        field_names, columns = frames.dataframe_columns(df)
+        return cls(result_count=len(df), field_names=field_names, result_data=zip(*columns))
+
+    def join(self, other, on, right_on=None, how='inner', suffix='_right', lazy=False):
+        """
+        Join this result (the left side) to another using a hash join, e.g. to combine results from different
+        databases. Returns a QueryResult, or if `lazy` is True, JoinedRows which are computed as they are iterated.
+
+        The hash index is built on the smaller side. Rows are joined in the order of this result, and for each of its
+        rows in the order of `other`. `other` may also be a QueryResultStream (or other iterable of RowDicts with
+        `field_names`), in which case it is streamed through an index built on this result, and rows are joined in
+        the order of `other`, followed by unmatched rows of this result for a left join.
+
+        Keyword arguments
+        :other: (QueryResult or QueryResultStream) The right side of the join.
+        :on: (str or list) The field(s) on which to join.
+        :right_on: (str or list) Optional. The field(s) of `other` on which to join, if they differ from `on`.
+        :how: (str) 'inner' or 'left'.
+        :suffix: (str) Appended to the names of fields of `other` which conflict with fields of this result.
+        :lazy: (bool) Return JoinedRows rather than a QueryResult.
+
+        """
+        left_on = [on] if isinstance(on, str) else list(on)
+        right_on = left_on if right_on is None else [right_on] if isinstance(right_on, str) else list(right_on)
+        if len(left_on) != len(right_on):
+            raise ValueError("Must join on the same number of fields from each side.")
+        if how not in joins.JOIN_TYPES:
+            raise ValueError(f"Join type must be one of {joins.JOIN_TYPES}.")
+        if any(field not in self.field_names for field in left_on) or \
+                any(field not in other.field_names for field in right_on):
+            raise ValueError("Join fields must be present in the results being joined.")
+        field_names, included = joins.joined_field_names(
+            self.field_names, other.field_names, left_on, right_on, suffix
+        )
+        if isinstance(other, QueryResult):
+            build_left = len(self.result_data) < len(other.result_data)
+            right_rows = other.result_data
+        else:
+            build_left = True
+            right_rows = other
+        pairs = joins.hash_join(
+            self.result_data,
+            right_rows,
+            joins.key_function(left_on),
+            joins.key_function(right_on),
+            how=how,
+            build_left=build_left,
+            ordered=isinstance(other, QueryResult)
+        )
+        nulls = [None] * len(included)
+
+        def joined_values(left, right):
+            right_values = nulls if right is None else [right[field] for field in included]
+            return zip(field_names, list(left) + right_values)
+
+        rows = (RowDict(data=joined_values(left, right)) for left, right in pairs)
+        if lazy:
+            return joins.JoinedRows(field_names, rows)
+        return QueryResult.from_row_dicts(field_names, list(rows))
+
+    def index_on(self, field, kind='hash'):
+        """
+        Return a FieldIndex of the rows by the value of `field`, for fast repeated lookups. The index is built once
+        and cached until the field is modified through this QueryResult or a QueryResultView of it (e.g. by
+        `map_function_to_field`, `apply`, a column transform or assigning `result_data`). Changes made to rows
+        directly (e.g. `result.result_data[0][field] = value`) are not detected; call the index's `rebuild` method
+        after making them.
+
+        :param kind: 'hash' for lookups by value; 'sorted' to also prepare the index for range queries.
+        """
+        assert field in self.field_names
+        index = self._indexes.get(field)
+        if index is None or not index.is_current():
+            index = self._indexes[field] = FieldIndex(self, field)
+        if kind == 'sorted':
+            index.sort()
+        elif kind != 'hash':
+            raise ValueError("Index kind must be 'hash' or 'sorted'.")
+        return index
+
+    def group_by(self, fields):
+        """Group rows by one or more fields, returning a GroupBy whose `agg` method computes aggregates."""
+        return GroupBy(self, fields)
+
+    def pivot(self, index, columns, values, aggfunc='sum'):
+        """
+        Return a QueryResult with one row for each distinct value of the `index` field(s), and one column for each
+        distinct value of the `columns` field, containing the aggregate (see `GroupBy.agg`) of the `values` field.
+        Columns are named after their values, and combinations without any rows are None. Raises ValueError if the
+        name of a column would duplicate an index field or another column.
+        """
+        index = [index] if isinstance(index, str) else list(index)
+        grouped = self.group_by(index + [columns]).agg({values: aggfunc})
+        rows = OrderedDict()
+        column_values = OrderedDict()
+        for row in grouped.result_data:
+            aggregated = list(row)
+            key, column_value = tuple(aggregated[:len(index)]), aggregated[len(index)]
+            column_values[column_value] = None
+            rows.setdefault(key, {})[column_value] = aggregated[-1]
+        field_names = index + [str(column_value) for column_value in column_values]
+        if len(set(field_names)) < len(field_names):
+            duplicates = sorted({name for name in field_names if field_names.count(name) > 1})
+            raise ValueError(f"Pivoted column names {duplicates} duplicate the index fields or other columns.")
+        result_data = [
+            list(key) + [cells.get(column_value) for column_value in column_values] for key, cells in rows.items()
+        ]
+        return QueryResult(result_count=len(result_data), field_names=field_names, result_data=result_data)
+
+    def convert_fields(self, table, fields=None):
+        """
+        Convert whole columns using a lookup table of converters keyed by column type, e.g. `{Decimal: float}`.
+        Only the provided fields are converted, or every field with a matching converter if none are provided.
+        """
+        schema = self.schema
+        if fields is None:
+            fields = [field for field, converter in zip(self.field_names, schema.converters(table)) if converter]
+        for field in fields:
+            self._replace_column(field, schema.convert_column(field, self.column(field), table))
+
+    def _replace_column(self, field, values):
+        """Replace every value of the provided field, in order."""
+        values = iter(values)
+
+        def update(row):
+            row[field] = next(values)
+
+        self._update_rows(update, fields=[field])
+
+    def transform(self, field, func, keep_nulls=True):
+        """
+        Transform a whole column at once, rather than calling a function for every row. `func` is called once with
+        every value of the field, as a NumPy array (see `to_numpy`) if numpy is installed or as a list otherwise, and
+        must return one value for each row, e.g. a NumPy ufunc such as `numpy.sqrt`, or any vectorized callable.
+        Nulls remain null unless `keep_nulls` is False.
+        """
+        assert field in self.field_names
+        column_type = self.schema.get_type(field)
+        self._replace_column(field, transforms.transform_column(self.column(field), column_type, func, keep_nulls))
+
+    def round_field(self, field, ndigits=0):
+        """Round the values of a numeric field, as the built-in `round` does."""
+        column_type = self.schema.get_type(field)
+        self._replace_column(field, transforms.round_column(self.column(field), column_type, ndigits))
+
+    def scale_field(self, field, factor):
+        """Multiply the values of a numeric field by `factor`."""
+        column_type = self.schema.get_type(field)
+        self._replace_column(field, transforms.scale_column(self.column(field), column_type, factor))
+
+    def fill_null(self, field, fill_value):
+        """Replace null values of a field with `fill_value`."""
+        self._replace_column(field, transforms.fill_null_column(self.column(field), fill_value))
+
+    def convert_timezone(self, field, to_timezone, from_timezone='UTC', naive=True):
+        """
+        Convert the datetimes of a field to `to_timezone`. Naive datetimes are assumed to be in `from_timezone`.
+        Converted datetimes are naive unless `naive` is False; note that xlsxwriter cannot write aware datetimes.
+        """
+        transforms.check_datetime_column(field, self.schema.get_type(field))
+        converted = transforms.convert_timezone_column(self.column(field), to_timezone, from_timezone, naive)
+        self._replace_column(field, converted)
+
+    def convert_decimals(self):
+        """Convert every Decimal field to float."""
+        self.convert_fields({Decimal: float})
+
+    def dictionary_encode(self, fields=None):
+        """
+        Dictionary-encode the provided fields, or every string field if none are provided. Each encoded field is kept
+        in `encoded_columns` as a DictionaryColumn, and its values in `result_data` are replaced by the equal values
+        from the column's table, so that repeated values share a single object. Encoded columns are used to group
+        rows by code in ResultFilter, and are discarded when rows are modified.
+        """
+        if fields is None:
+            column_types = self.schema.column_types
+            fields = [field for field, column_type in zip(self.field_names, column_types) if column_type is str]
+        encoded_columns = dict(self.encoded_columns)
+        columns = {field: DictionaryColumn.from_values(self.column(field)) for field in fields}
+        decoded = {field: iter(column) for field, column in columns.items()}
+
+        def update(row):
+            for field, values in decoded.items():
+                row[field] = next(values)
+
+        self._update_rows(update, fields=list(columns))
+        encoded_columns.update(columns)
+        self.encoded_columns = encoded_columns
+
+    def encoded_column(self, field):
+        """
+        Return the DictionaryColumn of a field encoded by `dictionary_encode`, or None if it is not encoded or its
+        rows have been changed since it was encoded (in which case the encoding is discarded).
+        """
+        column = self.encoded_columns.get(field)
+        if column is not None and not column.matches(self.column(field)):
+            self.encoded_columns.pop(field, None)
+            column = None
+        return column
+
+
+class FieldIndex(object):
+    """
+    An index of the rows of a QueryResult by the value of one field: a hash table from each value to the positions of
+    its rows, plus, for range queries, sorted lists of the distinct non-null values. Use `QueryResult.index_on`.
+
+    Values are sorted within groups of comparable types (all numbers form one group; other values are grouped by
+    type), so that a field with values of mixed types can still be sorted.
+
+    Keyword arguments
+    :result: (QueryResult) The indexed result.
+    :field: (str) The indexed field.
+
+    """
+    def __init__(self, result, field):
+        self.result = result
+        self.field = field
+        self.rebuild()
+
+    def rebuild(self):
+        """Index the result's rows again, e.g. after they have been changed directly. Returns the index."""
+        self.version = self.result._version
+        self.positions = {}
+        self.sorted_values = None
+        for idx, value in enumerate(self.result.column(self.field)):
+            positions = self.positions.get(value)
+            if positions is None:
+                positions = self.positions[value] = []
+            positions.append(idx)
+        return self
+
+    @staticmethod
+    def sort_group(value):
+        return 'number' if isinstance(value, Number) else type(value).__name__
+
+    def is_current(self):
+        """Whether the indexed field has not been modified through the result since the index was built."""
+        return self.version == self.result._version
+
+    def sort(self):
+        """Sort the distinct non-null values, in a list for each group of comparable types."""
+        if self.sorted_values is None:
+            groups = {}
+            for value in self.positions:
+                if value is not None:
+                    groups.setdefault(self.sort_group(value), []).append(value)
+            self.sorted_values = {group: sorted(values) for group, values in groups.items()}
+
+    def rows(self, positions):
+        rows = self.result.result_data
+        return [rows[idx] for idx in positions]
+
+    def lookup(self, value):
+        """Return the rows whose value equals `value`, in order."""
+        return self.rows(self.positions.get(value, []))
+
+    def range(self, lo=None, hi=None, include_hi=False):
+        """
+        Return the rows whose value is at least `lo` and less than `hi` (or at most `hi`, if `include_hi` is True),
+        ordered by value. Either bound may be None to leave the range unbounded. Null values are never included.
+        If a bound is provided, only values of types comparable to it are included; otherwise every value is, with
+        each group of comparable types in turn.
+        """
+        self.sort()
+        groups = {self.sort_group(bound) for bound in (lo, hi) if bound is not None}
+        if len(groups) > 1:
+            raise TypeError(f"Range bounds {lo!r} and {hi!r} cannot be compared.")
+        if groups:
+            values = self.sorted_values.get(groups.pop(), [])
+        else:
+            values = [value for group in sorted(self.sorted_values) for value in self.sorted_values[group]]
+        start = 0 if lo is None else bisect_left(values, lo)
+        if hi is None:
+            end = len(values)
+        else:
+            end = bisect_right(values, hi) if include_hi else bisect_left(values, hi)
+        return self.rows(idx for value in values[start:end] for idx in self.positions[value])
+
+
+class GroupBy(object):
+    """
+    The rows of a QueryResult grouped by one or more fields, in a single pass. Use `agg` to compute aggregates.
+
+    Keyword arguments
+    :result: (QueryResult) The result to be grouped.
+    :fields: (str or list) The field(s) by which to group.
+
+    """
+    def __init__(self, result, fields):
+        self.result = result
+        self.fields = [fields] if isinstance(fields, str) else list(fields)
+        if any(field not in result.field_names for field in self.fields):
+            raise ValueError("Provided headers must contain group_by fields.")
+        self.keys, self.codes = aggregates.group_codes(result.result_data, self.fields)
+
+    def agg(self, aggregations):
+        """
+        Return a QueryResult with one row for each group, containing the group's key and the requested aggregates.
+
+        :param aggregations: A dictionary mapping each field to aggregate to an aggregate, or a list of aggregates:
+            'count', 'sum', 'mean', 'min', 'max', or a callable which is given a list of the group's values. Nulls are
+            ignored. Aggregates are named after the field, or `{field}_{aggregate}` if a field has more than one.
+        """
+        field_names = list(self.fields)
+        columns = []
+        for field, funcs in aggregations.items():
+            funcs = list(funcs) if isinstance(funcs, (list, tuple)) else [funcs]
+            values = self.result.column(field)
+            column_type = self.result.schema.get_type(field)
+            for func in funcs:
+                name = getattr(func, '__name__', func)
+                field_names.append(field if len(funcs) == 1 else f"{field}_{name}")
+                columns.append(aggregates.aggregate_column(values, column_type, self.codes, len(self.keys), func))
+        result_data = [list(key) + [column[code] for column in columns] for code, key in enumerate(self.keys)]
+        return QueryResult(result_count=len(result_data), field_names=field_names, result_data=result_data)
+
+
+class QueryResultView(QueryResult):
+    """
+    A lazy view of a subset of another QueryResult's rows, identified by their indexes in the parent. The view's
+    `result_data` is only built when first accessed, and contains the parent's RowDicts rather than copies, so
+    changes made to rows through a view are also seen by the parent (unless the parent's rows are spilled to disk).
+    Changes made through the view's methods also discard the parent's schema, indexes and encodings of the changed
+    fields.
+
+    Keyword arguments
+    :parent: (QueryResult) The result containing the rows.
+    :indexes: (list) The indexes of the rows in the parent's `result_data`, in order.
+
+    """
+    def __init__(self, parent, indexes):
+        self.parent = parent
+        self.indexes = indexes
+        self.result_count = len(indexes)
+        self.field_names = list(parent.field_names)
+        self.row_proxies = None
+        self.field_index = dict(parent.field_index)
+        self.encoded_columns = {}
+        self._indexes = {}
+        self._schema = None
+        self._version = 0
+        self._result_data = None
+
+    @property
+    def result_data(self):
+        if self._result_data is None:
+            rows = self.parent.result_data
+            self._result_data = [rows[idx] for idx in self.indexes]
+        return self._result_data
+
+    @result_data.setter
+    def result_data(self, result_data):
+        self._result_data = result_data
+        self._version += 1
+
+    def _discard_caches(self, fields=None):
+        super()._discard_caches(fields)
+        self.parent._discard_caches(fields)
+
+
+class QueryResultStream(object):
+    """
+    Represent result data from an executed query which is fetched lazily, in batches, as it is iterated over.
+    Rows are yielded as RowDict objects and can only be iterated over once. `result_count` reflects the number
+    of rows consumed so far.
+
+    If `prefetch_batches` is provided, batches are fetched by a producer thread into a bounded queue holding up to
+    that many batches, so that the database can continue streaming results while the consumer processes them.
+    This requires a streaming (server-side) cursor: if the driver buffered every row when the statement was executed,
+    the producer only reads rows which are already in memory. `QueryGenerator.execute` executes statements with
+    the `stream_results` execution option when `prefetch_batches` is provided.
+
+    Keyword arguments
+    :field_names: (list) The field names of the result set.
+    :result_proxy: (ResultProxy) The open result of an executed statement.
+    :batch_size: (int) Optional. The number of rows to fetch at a time.
+    :row_counter: (callable) Optional. Called with the number of rows in each batch as it is consumed.
+    :prefetch_batches: (int) Optional. Fetch on a separate thread, up to this many batches ahead of the consumer.
+
+    """
+    def __init__(self, field_names, result_proxy, batch_size=None, row_counter=None, prefetch_batches=None):
+        if len(field_names) > len(set(field_names)):
+            raise ValueError("Field names must be unique, but your result set contains non-unique field names.")
+        self.field_names = field_names
+        self.result_proxy = result_proxy
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.row_counter = row_counter
+        self.prefetch_batches = prefetch_batches
+        self.result_count = 0
+
+    def __iter__(self):
+        field_names = self.field_names
+        batches = self.prefetched_batches() if self.prefetch_batches else self.fetched_batches()
+        for batch in batches:
+            self.result_count += len(batch)
+            if self.row_counter is not None:
+                self.row_counter(len(batch))
+            for row in batch:
+                yield RowDict(data=zip(field_names, row))
+
+    def fetched_batches(self):
+        """Yields batches of rows, fetched as they are requested. The result is closed once exhausted."""
+        try:
+            while True:
+                batch = self.result_proxy.fetchmany(self.batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            self.result_proxy.close()
+
+    def prefetched_batches(self):
+        """
+        Yields batches of rows, fetched ahead of time by a producer thread. Any exception raised while fetching is
+        raised here, in the consuming thread. If the consumer stops early, the producer is stopped as well.
+        """
+        batches = queue.Queue(maxsize=self.prefetch_batches)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            fetched = self.fetched_batches()
+            try:
+                for batch in fetched:
+                    if not put((batch, None)):
+                        return
+                put((None, None))
+            except Exception as e:
+                put((None, e))
+            finally:
+                fetched.close()
+
+        producer = threading.Thread(target=produce, name="QueryResultStream producer", daemon=True)
+        producer.start()
+        try:
+            while True:
+                batch, error = batches.get()
+                if error is not None:
+                    raise error
+                if batch is None:
+                    break
+                yield batch
+        finally:
+            stop.set()
+            producer.join()
 
 
 class RowDict(OrderedDict):
@@ -73,6 +650,11 @@ class RowDict(OrderedDict):
         return '%s(%r)' % (self.__class__.__name__, list(self.items()))
 
 
+def spilled_row(field_names, values):
+    """Create a RowDict from a row read back from SpilledRows."""
+    return RowDict(data=zip(field_names, values))
+
+
 class QueryGenerator(object):
     """Execute SQL query and return results"""
     def __init__(
@@ -101,15 +683,32 @@ class QueryGenerator(object):
         reader = QueryReader(filepath=self.filepath, filename=self.filename, raw_sql=self.raw_sql, params=self.params)
         return reader.sql
 
-    def execute(self):
+    def execute(self, stream=False, batch_size=None, row_counter=None, prefetch_batches=None, memory_budget=None):
         """
         This method will execute a series of statements, if that is what has been provided.
         The first returnable set of data will be returned - if the statements provided
         include multiple selects, results from only the first will be returned.
         Future implementations may allow for a sequence of results to be returned.
+
+        If `stream` is True, a QueryResultStream is returned instead of a QueryResult, and rows
+        are fetched in batches of `batch_size` as the stream is consumed. The connection must
+        remain open until the stream has been consumed. Provide `prefetch_batches` to fetch
+        batches on a producer thread while the stream is being consumed.
+
+        If the rows fetched would take more than `memory_budget` bytes of memory (by default, the `memory_budget`
+        setting in config, if any), they are spilled to a temporary file instead. See `fetch_results`.
+
+        When streaming, prefetching or fetching within a memory budget, statements are executed with the
+        `stream_results` execution option, so that drivers which support it (e.g. psycopg2 and pymysql) use a
+        server-side cursor, rather than loading every row into memory when the statement is executed.
         """
         if self.sql is None:
             self.sql = self.construct_query()
+        if memory_budget is None and config['Default'].get('memory_budget'):
+            memory_budget = config['Default'].getint('memory_budget')
+        connection = self.cm.conn
+        if stream or prefetch_batches or memory_budget is not None:
+            connection = connection.execution_options(stream_results=True)
         # Only SQL strings can be split, not (e.g.) SQLAlchemy statements.
         if self.multiple_statements and isinstance(self.sql, str):
             statements = self._split_sql()
@@ -118,11 +717,13 @@ class QueryGenerator(object):
         single_statement = True if len(statements) == 1 and self.filename else False
         try:
             for statement in statements:
-                result_proxy = self.cm.conn.execute(statement)
+                result_proxy = connection.execute(statement)
                 log_string = self.filename if single_statement else str(statement)[:25]
                 self.logger.info("Executed {} against {}".format(log_string, self.cm.db))
             if result_proxy.cursor:
-                return self.fetch_results(result_proxy)
+                if stream:
+                    return self.stream_results(result_proxy, batch_size, row_counter, prefetch_batches)
+                return self.fetch_results(result_proxy, memory_budget=memory_budget)
         except Exception as e:
             self.logger.exception(e)
             raise
@@ -134,8 +735,16 @@ class QueryGenerator(object):
         return [stmt.strip() for stmt in RE_SQL_STATEMENT.split(self.sql) if stmt.strip()]
 
     @staticmethod
-    def fetch_results(result_proxy):
+    def fetch_results(result_proxy, memory_budget=None):
+        """
+        Fetch all rows into a QueryResult. If `memory_budget` (bytes) is provided, rows are fetched in batches, and
+        once their estimated size exceeds the budget, all rows are spilled to a temporary memory-mapped file, in the
+        directory given by the `spill_path` setting in config, if any. Spilling only bounds the memory used if the
+        result is read from a streaming cursor (see `execute`), since otherwise the driver holds every row already.
+        """
         field_names = result_proxy.keys()
+        if memory_budget is not None:
+            return QueryGenerator.fetch_results_within_budget(result_proxy, field_names, memory_budget)
         row_proxies = result_proxy.fetchall()
         result_data = [row.values() for row in row_proxies]
         query_results = QueryResult(
@@ -146,6 +755,48 @@ class QueryGenerator(object):
         )
         return query_results
 
+    @staticmethod
+    def fetch_results_within_budget(result_proxy, field_names, memory_budget):
+        row_proxies = []
+        spilled_rows = None
+        estimated_size = 0
+        try:
+            while True:
+                batch = result_proxy.fetchmany(DEFAULT_BATCH_SIZE)
+                if not batch:
+                    break
+                if spilled_rows is not None:
+                    spilled_rows.extend(batch)
+                    continue
+                row_proxies.extend(batch)
+                estimated_size += estimate_rows_size(batch)
+                if estimated_size > memory_budget:
+                    spilled_rows = SpilledRows(
+                        field_names, row_factory=spilled_row, dir=config['Default'].get('spill_path') or None
+                    )
+                    spilled_rows.extend(row_proxies)
+                    row_proxies = None
+        finally:
+            result_proxy.close()
+        if spilled_rows is not None:
+            return QueryResult(result_count=len(spilled_rows), field_names=field_names, result_data=spilled_rows)
+        return QueryResult(
+            result_count=len(row_proxies),
+            field_names=field_names,
+            result_data=[list(row) for row in row_proxies],
+            row_proxies=row_proxies
+        )
+
+    @staticmethod
+    def stream_results(result_proxy, batch_size=None, row_counter=None, prefetch_batches=None):
+        return QueryResultStream(
+            field_names=result_proxy.keys(),
+            result_proxy=result_proxy,
+            batch_size=batch_size,
+            row_counter=row_counter,
+            prefetch_batches=prefetch_batches
+        )
+
 
 class QueryReader(object):
     """
@@ -258,7 +909,9 @@ class QueryExecutor(object):
     def close_database_connection(self):
         self.cm.close()
 
-    def execute_query(self, filepath=None, filename=None, params=None, sql=None, multiple_statements=False):
+    def execute_query(
+            self, filepath=None, filename=None, params=None, sql=None, multiple_statements=False, stream=False
+    ):
         query = QueryGenerator(
             cm=self.cm,
             filepath=filepath,
@@ -268,7 +921,7 @@ class QueryExecutor(object):
             multiple_statements=multiple_statements,
             logger=self.logger
         )
-        return query.execute()
+        return query.execute(stream=stream)
 
     def commit(self):
         self.cm.commit()
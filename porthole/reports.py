@@ -1,13 +1,21 @@
+import datetime
 import os
+import signal
+import sys
+import time
 from inspect import getfullargspec
 from argparse import ArgumentParser
+import pytz
+from sqlalchemy import func
+from sqlalchemy.orm import configure_mappers, joinedload
 from .alerts import Alert
 from .app import config, Session
-from .connections import ConnectionPool
+from .connections import ConnectionManager, ConnectionPool
 from .mailer import Mailer
 from .components import ReportErrorNotifier, ReportWriter
 from .logger import PortholeLogger
-from .models import AutomatedReport, ReportLog
+from .models import AutomatedReport, AutomatedReportRecipient, ReportLog
+from .schedules import Schedule
 from .uploaders import S3Uploader
 
 
@@ -35,6 +43,7 @@ class BasicReport:
         self.subject = None
         self.message = None
         self.attachments = []
+        self.output_format = None
         self.debug_mode = debug_mode
         self.text_format = text_format
         self.email_sent = False
@@ -60,10 +69,22 @@ class BasicReport:
         return self.conns.add_connection(db)
 
     def build_file(self):
-        report_writer = ReportWriter(report_title=self.report_title, logger=self.logger)
+        report_writer = ReportWriter(
+            report_title=self.report_title,
+            logger=self.logger,
+            output_format=self.output_format
+        )
         report_writer.build_file()
-        self.attachments.append(report_writer.report_file)
         self.report_writer = report_writer
+        self.attach_report_files()
+
+    def attach_report_files(self):
+        """Add any files created by the ReportWriter to attachments. Delimited formats create files per worksheet."""
+        if self.report_writer is None:
+            return
+        for report_file in self.report_writer.report_files:
+            if report_file not in self.attachments:
+                self.attachments.append(report_file)
 
     def create_worksheet_from_query(
             self,
@@ -87,6 +108,17 @@ class BasicReport:
             worksheet_kwargs=worksheet_kwargs
         )
 
+    def create_worksheets_from_queries(self, worksheets, max_workers=None):
+        """
+        Delegates functionality to ReportWriter. Each worksheet is a dictionary of keyword arguments for
+        `create_worksheet_from_query`, and queries are executed concurrently.
+        """
+        worksheets = [dict(worksheet) for worksheet in worksheets]
+        for worksheet in worksheets:
+            db = worksheet.pop('db', None) or self.default_db
+            worksheet['cm'] = self.add_conn(db)
+        self.report_writer.create_worksheets_from_queries(worksheets, max_workers=max_workers)
+
     def make_worksheet(self, sheet_name, query_results, **kwargs):
         """Delegates functionality to ReportWriter."""
         self.report_writer.make_worksheet(
@@ -97,6 +129,7 @@ class BasicReport:
 
     def build_email(self):
         """Instantiates Mailer object using provided parameters."""
+        self.attach_report_files()
         email = Mailer(
             recipients=self.to_recipients,
             cc_recipients=self.cc_recipients,
@@ -210,6 +243,9 @@ class GenericReport(BasicReport):
         automated_report_contacts table, add them to it.
 
     """
+    # When set (e.g. by ReportRunner in batch mode), report metadata is read from this ReportMetadataCache.
+    metadata_cache = None
+
     def __init__(
             self,
             report_title,
@@ -261,7 +297,10 @@ class GenericReport(BasicReport):
             return 0
 
     def initialize_report_record(self):
-        self.report_record = self.session.query(AutomatedReport).filter_by(report_name=self.report_name).one()
+        cache = GenericReport.metadata_cache
+        self.report_record = cache.get(self.report_name) if cache is not None else None
+        if self.report_record is None:
+            self.report_record = self.session.query(AutomatedReport).filter_by(report_name=self.report_name).one()
         self.active = self.report_record.active
         self.to_recipients = self.report_record.to_recipients[:]
         self.cc_recipients = self.report_record.cc_recipients[:]
@@ -312,6 +351,7 @@ class GenericReport(BasicReport):
 
     def upload_to_s3(self):
         try:
+            self.attach_report_files()
             uploader = S3Uploader(debug_mode=self.debug_mode)
             uploaded = []
             for attachment in self.attachments:
@@ -322,11 +362,63 @@ class GenericReport(BasicReport):
             self.logger.exception("Unable to upload to S3")
 
 
+class ReportMetadataCache(object):
+    """
+    Loads every AutomatedReport, along with its recipients, in a single query, so that many reports
+    run in one process do not each query for their own metadata. The records are detached from the
+    session which loaded them, so they hold no connection and can be inherited by worker processes.
+    """
+    def __init__(self):
+        self.records = {}
+
+    def load(self):
+        configure_mappers()
+        session = Session()
+        try:
+            records = session.query(AutomatedReport).options(
+                joinedload(AutomatedReport.report_recipients).joinedload(AutomatedReportRecipient.contact)
+            ).all()
+        finally:
+            session.close()
+        self.records = {record.report_name: record for record in records}
+        return self
+
+    def get(self, report_name):
+        return self.records.get(report_name)
+
+    def close(self):
+        self.records = {}
+
+
 class ReportRunner(ArgumentParser):
+    """
+    Runs reports from the command line. `report_map` maps report names to report functions. Values may also be
+    dictionaries with a 'function' key, and optionally 'databases' (the databases the report queries, used to limit
+    concurrency in parallel batches) and 'timeout' (seconds after which a report's worker process is killed).
+
+    With --scheduler, reports are run by a ReportScheduler according to their AutomatedReport schedules. With --serve,
+    reports are run by a ReportServer when requested by the porthole-run client. With --enqueue, reports are queued in
+    the run queue, and with --queue-worker, queued reports are run by a RunQueueWorker.
+
+    The number of reports which may run concurrently against a database is limited by the `max_concurrent_reports`
+    setting in the database's config section, or else in the Default section.
+    """
+    # Seconds to wait for a worker process to finish before checking timeouts and starting more reports.
+    POLL_INTERVAL = 0.5
+
     def __init__(self, report_map=None):
         super().__init__(description="Runs the report designated by the -r or --report parameter. To see a list of available reports, use -l or --list.")
         self.add_argument("-l", "--list", action='store_true', dest='list', help="show a list of available reports")
         self.add_argument("-r", "--report", dest='report', help="name of report to run")
+        self.add_argument("--reports", dest='reports', help="comma-separated names of reports to run in one process")
+        self.add_argument("--all-due", action='store_true', dest='all_due', help="run every active report whose schedule has come due since it last ran")
+        self.add_argument("--serve", action='store_true', dest='serve', help="run reports requested by porthole-run, until stopped")
+        self.add_argument("--socket", dest='socket', help="path of the socket on which to serve requests")
+        self.add_argument("--enqueue", action='store_true', dest='enqueue', help="queue the reports named by -r or --reports in the run queue, rather than running them")
+        self.add_argument("--queue-worker", action='store_true', dest='queue_worker', help="run reports and tasks from the run queue, until stopped")
+        self.add_argument("--scheduler", action='store_true', dest='scheduler', help="run reports as their schedules fall due, until stopped")
+        self.add_argument("-w", "--workers", type=int, dest='workers', help="run a batch of reports in up to this many worker processes")
+        self.add_argument("--timeout", type=float, dest='timeout', help="seconds after which a report's worker process is killed")
         self.add_argument("-d", "--debug", action='store_true', dest='debug_mode', help="run the requested report in debug mode, if defined")
         self.add_argument("-p", "--ping", action='store_true', dest='ping', help="this is used for health checking.")
         self.args, _ = super().parse_known_args()
@@ -336,6 +428,21 @@ class ReportRunner(ArgumentParser):
     def handle_args(self):
         if self.args.list:
             self.list_reports()
+        elif self.args.enqueue:
+            self.enqueue()
+        elif self.args.queue_worker:
+            from .work_queue import RunQueueWorker
+            RunQueueWorker(self, workers=self.args.workers).run_forever()
+        elif self.args.serve:
+            from .server import ReportServer
+            ReportServer(self, socket_path=self.args.socket, workers=self.args.workers).serve_forever()
+        elif self.args.scheduler:
+            from .scheduler import ReportScheduler
+            ReportScheduler(self, workers=self.args.workers).run_forever()
+        elif self.args.reports or self.args.all_due:
+            outcomes = self.run_batch()
+            if not all(outcome.succeeded for outcome in outcomes):
+                sys.exit(1)
         elif self.args.report:
             self.run_report()
 
@@ -344,25 +451,212 @@ class ReportRunner(ArgumentParser):
         for report in self.report_map.keys():
             print(report)
 
-    def run_report(self):
-        report_name = self.args.report
-        report_function = self.report_map.get(report_name)
+    def report_entry(self, report_name):
+        """Return the function mapped to a report, and a dictionary of its options."""
+        entry = self.report_map.get(report_name)
+        if isinstance(entry, dict):
+            options = dict(entry)
+            return options.pop('function', None), options
+        return entry, {}
+
+    def run_report(self, report_name=None):
+        report_name = report_name or self.args.report
+        report_function, _ = self.report_entry(report_name)
         if report_function:
             if 'debug_mode' in getfullargspec(report_function).args:
                 self.logger.info(f"Received call to run {report_name} in debug mode.")
-                report_function(debug_mode=self.args.debug)
+                report_function(debug_mode=self.args.debug_mode)
             else:
                 self.logger.info(f"Received call to run {report_name}")
                 report_function()
         else:
-            self.send_unmapped_report_alert()
+            self.send_unmapped_report_alert(report_name)
             error_message = "Report Runner is unable to run: {}. There is no report function mapped to this name".format(report_name)
             self.logger.error(error_message)
             raise ValueError(error_message)
 
-    def send_unmapped_report_alert(self):
+    def enqueue(self, report_names=None):
+        """
+        Queue runs of the provided reports, or else those named by --reports or --report, in the run queue, to be run
+        by a RunQueueWorker on any node. Returns the ids of the runs.
+        """
+        if report_names is None and self.args.reports:
+            report_names = [name.strip() for name in self.args.reports.split(',') if name.strip()]
+        elif report_names is None:
+            report_names = [self.args.report]
+        from .work_queue import RunQueue
+        queue = RunQueue()
+        run_ids = []
+        for report_name in report_names:
+            run_ids.append(queue.enqueue(report_name))
+            self.logger.info(f"Queued run {run_ids[-1]} of {report_name}.")
+        return run_ids
+
+    def run_batch(self, report_names=None, workers=None):
+        """
+        Run many reports in this process: those provided, or else those named by --reports, or those due now if
+        --all-due is set. Database engines, AutomatedReport metadata and the SMTP connection are shared by all of the
+        reports. An exception raised by one report is logged, and does not prevent the others from running.
+        If more than one worker is requested (or --workers is set), reports are run by `run_parallel` instead.
+        Prints a timing summary, and returns a ReportOutcome for each report.
+        """
+        workers = workers or self.args.workers
+        self.start_batch()
+        try:
+            if report_names is None and self.args.all_due:
+                report_names = self.due_reports()
+            elif report_names is None:
+                report_names = [name.strip() for name in self.args.reports.split(',') if name.strip()]
+            if workers and workers > 1:
+                outcomes = self.run_parallel(report_names, workers)
+            else:
+                outcomes = [self.run_isolated(report_name) for report_name in report_names]
+        finally:
+            self.finish_batch()
+        self.print_summary(outcomes)
+        return outcomes
+
+    def run_isolated(self, report_name, run=None):
+        """
+        Run one report, returning a ReportOutcome rather than raising any exception. The report is run by
+        `run(report_name)`, which defaults to `run_report`.
+        """
+        from .workers import ReportOutcome
+        started = time.monotonic()
+        error = None
+        try:
+            (run or self.run_report)(report_name)
+        except SystemExit as e:
+            # Reports may exit, as the Mailer does when email is disabled; this should only end the report.
+            if e.code not in (None, 0):
+                self.logger.error(f"Report {report_name} exited with status {e.code}.")
+                error = e
+        except Exception as e:
+            self.logger.exception(f"Report {report_name} failed.")
+            error = e
+        return ReportOutcome(report_name, error is None, time.monotonic() - started, error)
+
+    def run_parallel(self, report_names, workers):
+        """
+        Run each report in its own worker process, with up to `workers` running at once, and no more reports
+        running against any database than its concurrency limit allows. Workers which exceed their report's timeout
+        are killed, and their reports fail. Returns a ReportOutcome for each report, in order.
+        """
+        from .workers import WorkerPool
+        pool = WorkerPool(self, workers)
+        pending = list(enumerate(report_names))
+        outcomes = {}
+        while pending or pool.running:
+            for idx, report_name in list(pending):
+                if pool.full:
+                    break
+                if pool.can_start(report_name):
+                    pending.remove((idx, report_name))
+                    pool.start(idx, report_name)
+            pool.wait(self.POLL_INTERVAL)
+            outcomes.update(pool.collect())
+        return [outcomes[idx] for idx in range(len(report_names))]
+
+    def run_in_worker(self, report_name, run=None):
+        """
+        Run a report in a worker process, by `run_isolated`. Engines and SMTP connections inherited from the parent
+        are not reused.
+        """
+        # Workers inherit the stop handlers of the scheduler, server or queue worker which forked them; restore the
+        # defaults, so that SIGTERM (sent by WorkerPool.stop_worker) ends the worker rather than being ignored.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        ConnectionManager.engine_cache = {}
+        Mailer.shared_smtp = Mailer.shared_smtp_key = None
+        Mailer.enable_shared_connection()
+        try:
+            outcome = self.run_isolated(report_name, run)
+        finally:
+            Mailer.close_shared_connection()
+            ConnectionManager.dispose_engine_cache()
+        sys.exit(0 if outcome.succeeded else 1)
+
+    def report_databases(self, report_name):
+        _, options = self.report_entry(report_name)
+        databases = options.get('databases') or [config['Default'].get('database')]
+        return [databases] if isinstance(databases, str) else list(databases)
+
+    def report_timeout(self, report_name):
+        _, options = self.report_entry(report_name)
+        return options.get('timeout', self.args.timeout)
+
+    @staticmethod
+    def database_limit(db):
+        """The number of reports which may run concurrently against a database, or infinity if unlimited."""
+        limit = config[db].get('max_concurrent_reports') if config.has_section(db) else None
+        limit = limit or config['Default'].get('max_concurrent_reports')
+        return max(int(limit), 1) if limit else float('inf')
+
+    @staticmethod
+    def start_batch():
+        ConnectionManager.enable_engine_cache()
+        Mailer.enable_shared_connection()
+        GenericReport.metadata_cache = ReportMetadataCache().load()
+
+    @staticmethod
+    def finish_batch():
+        if GenericReport.metadata_cache is not None:
+            GenericReport.metadata_cache.close()
+            GenericReport.metadata_cache = None
+        Mailer.close_shared_connection()
+        ConnectionManager.dispose_engine_cache()
+
+    def due_reports(self, now=None):
+        """
+        Return the names of mapped, active reports whose schedules have come due since they last started (according
+        to their report logs), up to now (or `now`), so that reports are not skipped if --all-due is run late.
+        Reports which have never run are due if their schedules fire in the current minute.
+        """
+        now = now or datetime.datetime.now(tz=pytz.utc)
+        if now.tzinfo is None:
+            now = pytz.utc.localize(now)
+        cache = GenericReport.metadata_cache or ReportMetadataCache().load()
+        last_started = self.last_started()
+        this_minute = now.replace(second=0, microsecond=0) - datetime.timedelta(microseconds=1)
+        due = []
+        for report_name, record in sorted(cache.records.items()):
+            schedule = Schedule.from_report(record)
+            if not record.active or schedule is None:
+                continue
+            fire_time = schedule.next_fire_time(last_started.get(report_name) or this_minute)
+            if fire_time is None or fire_time > now:
+                continue
+            if report_name in self.report_map:
+                due.append(report_name)
+            else:
+                self.logger.warning(f"Report {report_name} is due, but there is no report function mapped to it.")
+        return due
+
+    @staticmethod
+    def last_started():
+        """Return the time (in UTC) at which each report last started, according to the report logs."""
+        session = Session()
+        try:
+            return dict(
+                session.query(ReportLog.report_name, func.max(ReportLog.started_at)).group_by(ReportLog.report_name)
+            )
+        finally:
+            session.close()
+
+    @staticmethod
+    def print_summary(outcomes):
+        width = max([len(outcome.report_name) for outcome in outcomes] + [len('Report')])
+        print(f"{'Report':<{width}}  {'Status':<9}  Seconds")
+        for outcome in outcomes:
+            status = 'succeeded' if outcome.succeeded else 'failed'
+            print(f"{outcome.report_name:<{width}}  {status:<9}  {outcome.seconds:7.2f}")
+        failed = len([outcome for outcome in outcomes if not outcome.succeeded])
+        total = sum(outcome.seconds for outcome in outcomes)
+        print(f"{len(outcomes)} reports run, {failed} failed, in {total:.2f} seconds.")
+
+    def send_unmapped_report_alert(self, report_name=None):
         alert = Alert(
-            subject=f"Attempt to execute unmapped report <{self.args.report}>",
+            subject=f"Attempt to execute unmapped report <{report_name or self.args.report}>",
             message="Check to ensure report mapping is correct.",
             recipients=[config['Admin']['admin_email']]
         )
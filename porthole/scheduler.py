@@ -0,0 +1,178 @@
+import datetime
+import heapq
+import signal
+from collections import deque, namedtuple
+import pytz
+from sqlalchemy import or_
+from .app import Session
+from .models import AutomatedReport
+from .schedules import Schedule, SCHEDULE_FIELDS
+from .workers import WorkerPool
+
+ScheduledReport = namedtuple('ScheduledReport', ['schedule', 'signature', 'version'])
+
+
+class ReportScheduler(object):
+    """
+    A long-running scheduler which runs reports according to the schedule columns of AutomatedReport, replacing
+    a cron entry per report. The next fire time of every active, mapped report is kept in a min-heap, and due
+    reports are run by a bounded pool of worker processes. Schedules are reloaded periodically, fetching only the
+    AutomatedReport records created or updated since the last reload.
+
+    A report which is still running (or waiting for a worker) when it is next due is skipped, rather than run twice.
+    If the scheduler falls behind, each late report runs once, rather than once for every fire time it missed.
+
+    Keyword arguments
+    :runner: The ReportRunner whose `report_map` defines the reports which may be run.
+    :workers: (int) The maximum number of reports running at once.
+    :reload_interval: (int) Seconds between reloads of schedules.
+
+    """
+    DEFAULT_WORKERS = 4
+    # Longest time to sleep between checks, so that timed out workers and stop signals are noticed promptly.
+    POLL_INTERVAL = 1.0
+    # Reloads fetch records updated slightly before the last one seen, so that records committed late are not missed.
+    # Loading a record again is harmless, as unchanged schedules are left alone.
+    RELOAD_OVERLAP = datetime.timedelta(minutes=5)
+
+    def __init__(self, runner, workers=None, reload_interval=60):
+        self.runner = runner
+        self.pool = WorkerPool(runner, workers or self.DEFAULT_WORKERS)
+        self.reload_interval = datetime.timedelta(seconds=reload_interval)
+        self.logger = runner.logger
+        self.schedules = {}
+        self.versions = {}
+        self.heap = []
+        self.queued = deque()
+        self.last_updated = None
+        self.next_reload = None
+        self.stopping = False
+
+    @staticmethod
+    def now():
+        return datetime.datetime.now(tz=pytz.utc)
+
+    def run_forever(self):
+        """Run reports as they become due, until SIGINT or SIGTERM is received, then wait for running reports."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.logger.info(f"Starting report scheduler with {self.pool.workers} workers.")
+        while not self.stopping:
+            self.run_pending()
+            self.pool.wait(self.seconds_until_next_event())
+        self.logger.info("Stopping report scheduler; waiting for running reports to finish.")
+        while self.pool.running:
+            self.pool.wait(self.POLL_INTERVAL)
+            self.log_outcomes(self.pool.collect())
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run_pending(self, now=None):
+        """Reload schedules if due, queue reports which are due, start as many as possible, and log finished ones."""
+        now = now or self.now()
+        if self.next_reload is None or now >= self.next_reload:
+            self.reload(now)
+            self.next_reload = now + self.reload_interval
+        self.queue_due(now)
+        self.start_queued()
+        self.log_outcomes(self.pool.collect())
+
+    def seconds_until_next_event(self, now=None):
+        now = now or self.now()
+        events = [self.next_reload] + ([self.heap[0][0]] if self.heap else [])
+        seconds = min((event - now).total_seconds() for event in events)
+        return max(min(seconds, self.POLL_INTERVAL), 0)
+
+    def reload(self, now=None):
+        """
+        Load AutomatedReport records created or updated since the last reload (or all of them, the first time), and
+        reschedule any whose schedules have changed. Reports whose records have been deleted are unscheduled.
+        """
+        session = Session()
+        try:
+            query = session.query(AutomatedReport)
+            if self.last_updated is not None:
+                since = self.last_updated - self.RELOAD_OVERLAP
+                query = query.filter(or_(AutomatedReport.updated_at >= since, AutomatedReport.created_at >= since))
+            records = query.all()
+            report_names = {report_name for report_name, in session.query(AutomatedReport.report_name)}
+        finally:
+            session.close()
+        for record in records:
+            self.update_schedule(record, now)
+            for timestamp in (record.created_at, record.updated_at):
+                if timestamp is not None and (self.last_updated is None or timestamp > self.last_updated):
+                    self.last_updated = timestamp
+        for report_name in set(self.schedules) - report_names:
+            self.unschedule(report_name)
+
+    def update_schedule(self, record, now=None):
+        """Schedule a report according to its AutomatedReport record, unless its schedule is unchanged."""
+        report_name = record.report_name
+        signature = (record.active, record.schedule_timezone) + tuple(
+            getattr(record, f"schedule_{name}") for name, _, _ in SCHEDULE_FIELDS
+        )
+        current = self.schedules.get(report_name)
+        if current is not None and current.signature == signature:
+            return
+        self.unschedule(report_name)
+        if not record.active:
+            return
+        try:
+            schedule = Schedule.from_report(record)
+        except (ValueError, LookupError):
+            self.logger.exception(f"Report {report_name} has an invalid schedule.")
+            return
+        if schedule is None:
+            return
+        report_function, _ = self.runner.report_entry(report_name)
+        if report_function is None:
+            self.logger.warning(f"Report {report_name} is scheduled, but there is no report function mapped to it.")
+            return
+        version = self.versions.get(report_name, 0) + 1
+        self.versions[report_name] = version
+        self.schedules[report_name] = ScheduledReport(schedule, signature, version)
+        self.push(report_name, now or self.now())
+
+    def unschedule(self, report_name):
+        """Remove a report's schedule. Its entry in the heap is left in place, and ignored when popped."""
+        if self.schedules.pop(report_name, None) is not None:
+            self.versions[report_name] += 1
+
+    def push(self, report_name, after):
+        scheduled = self.schedules[report_name]
+        fire_time = scheduled.schedule.next_fire_time(after)
+        if fire_time is not None:
+            heapq.heappush(self.heap, (fire_time, report_name, scheduled.version))
+
+    def queue_due(self, now):
+        """Queue each report whose next fire time has passed, and push its following fire time onto the heap."""
+        while self.heap and self.heap[0][0] <= now:
+            fire_time, report_name, version = heapq.heappop(self.heap)
+            if self.versions.get(report_name) != version:
+                continue
+            if report_name in self.queued or self.pool.is_running(report_name):
+                self.logger.warning(f"Skipping report {report_name} due at {fire_time}; its last run has not finished.")
+            else:
+                self.queued.append(report_name)
+            self.push(report_name, max(fire_time, now))
+
+    def start_queued(self):
+        """Start queued reports, in the order they became due, while workers and database capacity allow."""
+        for report_name in list(self.queued):
+            if self.pool.full:
+                break
+            if self.pool.can_start(report_name):
+                self.queued.remove(report_name)
+                self.logger.info(f"Starting scheduled report {report_name}.")
+                self.pool.start(report_name, report_name)
+
+    def log_outcomes(self, finished):
+        for _, outcome in finished:
+            if outcome.succeeded:
+                self.logger.info(f"Report {outcome.report_name} succeeded in {outcome.seconds:.2f} seconds.")
+            else:
+                self.logger.error(
+                    f"Report {outcome.report_name} failed after {outcome.seconds:.2f} seconds: {outcome.error}"
+                )
@@ -0,0 +1,145 @@
+import datetime
+import pytz
+
+# The name, lowest value and highest value of each schedule field. Day of week 0 (or 7) is Sunday, as in cron.
+SCHEDULE_FIELDS = [
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day_of_month', 1, 31),
+    ('month_of_year', 1, 12),
+    ('day_of_week', 0, 7),
+]
+
+# How far ahead to search for a schedule's next fire time; schedules such as February 30th never fire.
+MAX_SEARCH_YEARS = 8
+
+
+def parse_schedule_field(spec, low, high):
+    """
+    Parse a field in cron syntax, e.g. `*`, `*/15`, `9-17`, `0,30` or `1-5/2`, into the set of values it matches.
+    A null or empty field is treated as `*`.
+    """
+    spec = '*' if spec is None or not str(spec).strip() else str(spec).replace(' ', '')
+    values = set()
+    for part in spec.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/', 1)
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(value) for value in part.split('-', 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid schedule field <{spec}>: values must be between {low} and {high}.")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def is_restricted(spec):
+    return spec is not None and str(spec).strip() not in ('', '*')
+
+
+class Schedule(object):
+    """
+    A cron-style schedule, as stored in the schedule columns of AutomatedReport. Each field is a string in cron
+    syntax, and null fields match every value. As in cron, if both day of month and day of week are restricted,
+    a day matching either of them matches. Times are matched in the schedule's timezone.
+
+    Keyword arguments
+    :minute: (str) Minutes of the hour, 0-59.
+    :hour: (str) Hours of the day, 0-23.
+    :day_of_month: (str) Days of the month, 1-31.
+    :month_of_year: (str) Months, 1-12.
+    :day_of_week: (str) Days of the week, 0-7, where 0 and 7 are Sunday.
+    :timezone: (str) The name of the timezone in which the schedule is defined.
+
+    """
+    def __init__(
+            self,
+            minute=None,
+            hour=None,
+            day_of_month=None,
+            month_of_year=None,
+            day_of_week=None,
+            timezone='UTC'
+    ):
+        specs = [minute, hour, day_of_month, month_of_year, day_of_week]
+        self.minutes, self.hours, self.days_of_month, self.months, self.days_of_week = (
+            parse_schedule_field(spec, low, high) for spec, (_, low, high) in zip(specs, SCHEDULE_FIELDS)
+        )
+        if 7 in self.days_of_week:
+            self.days_of_week = (self.days_of_week - {7}) | {0}
+        self.day_of_month_restricted = is_restricted(day_of_month)
+        self.day_of_week_restricted = is_restricted(day_of_week)
+        self.timezone = pytz.timezone(timezone or 'UTC')
+
+    @classmethod
+    def from_report(cls, report):
+        """Return the Schedule of an AutomatedReport, or None if none of its schedule columns are set."""
+        specs = [getattr(report, f"schedule_{name}") for name, _, _ in SCHEDULE_FIELDS]
+        if not any(spec is not None and str(spec).strip() for spec in specs):
+            return None
+        return cls(*specs, timezone=report.schedule_timezone)
+
+    def day_matches(self, day):
+        in_month = day.day in self.days_of_month
+        in_week = day.isoweekday() % 7 in self.days_of_week
+        if self.day_of_month_restricted and self.day_of_week_restricted:
+            return in_month or in_week
+        return in_month and in_week
+
+    def matches(self, local_time):
+        """Whether the schedule fires at the provided time, which is in the schedule's timezone."""
+        return (
+            local_time.minute in self.minutes
+            and local_time.hour in self.hours
+            and local_time.month in self.months
+            and self.day_matches(local_time.date())
+        )
+
+    def is_due(self, now=None):
+        """Whether the schedule fires during the current minute, or the minute of `now` (naive datetimes are UTC)."""
+        now = now or datetime.datetime.now(tz=pytz.utc)
+        if now.tzinfo is None:
+            now = pytz.utc.localize(now)
+        return self.matches(now.astimezone(self.timezone))
+
+    def next_fire_time(self, after=None):
+        """
+        Return the first time after `after` (or now) at which the schedule fires, as a UTC datetime, or None if
+        it never fires. Naive datetimes are UTC. Local times skipped by a daylight saving change never fire, and
+        repeated local times fire once.
+        """
+        after = after or datetime.datetime.now(tz=pytz.utc)
+        if after.tzinfo is None:
+            after = pytz.utc.localize(after)
+        local = after.astimezone(self.timezone).replace(tzinfo=None, second=0, microsecond=0)
+        local += datetime.timedelta(minutes=1)
+        limit = local + datetime.timedelta(days=366 * MAX_SEARCH_YEARS)
+        while local < limit:
+            # Skip whole months, days and hours which cannot match, rather than checking every minute.
+            if local.month not in self.months:
+                local = (local.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self.day_matches(local.date()):
+                local = local.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif local.hour not in self.hours:
+                local = local.replace(minute=0) + datetime.timedelta(hours=1)
+            elif local.minute not in self.minutes:
+                local += datetime.timedelta(minutes=1)
+            else:
+                fire_time = self.localize(local)
+                if fire_time is not None and fire_time > after:
+                    return fire_time.astimezone(pytz.utc)
+                local += datetime.timedelta(minutes=1)
+        return None
+
+    def localize(self, local_time):
+        """Localize a naive time in the schedule's timezone, or return None if the time does not exist there."""
+        aware = self.timezone.localize(local_time, is_dst=True)
+        if self.timezone.normalize(aware).replace(tzinfo=None) != local_time:
+            return None
+        return aware
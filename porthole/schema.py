@@ -0,0 +1,118 @@
+from array import array
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+DEFAULT_SAMPLE_SIZE = 100
+
+# Converters used to make values json serializable, keyed by the exact type of the value.
+JSON_CONVERTERS = {
+    Decimal: float,
+    date: date.isoformat,
+    datetime: datetime.isoformat,
+}
+
+
+class ColumnSchema(object):
+    """
+    A per-column type profile of a result set. The type of each column is the type of its first non-null value within
+    a sample of rows, or None if every sampled value is null. Profiling a result once allows writers to dispatch on the
+    type of each column through lookup tables of converters, rather than checking the type of every cell.
+
+    Keyword arguments
+    :field_names: (list) The column names, in order.
+    :column_types: (list) The type of each column, in order.
+
+    """
+    def __init__(self, field_names, column_types):
+        if len(field_names) != len(column_types):
+            raise ValueError("Must provide one column type for each field name.")
+        self.field_names = list(field_names)
+        self.column_types = list(column_types)
+        self.field_index = {field: idx for idx, field in enumerate(self.field_names)}
+
+    def __repr__(self):
+        columns = ", ".join(
+            "{}: {}".format(field, getattr(column_type, '__name__', None))
+            for field, column_type in zip(self.field_names, self.column_types)
+        )
+        return "<ColumnSchema({})>".format(columns)
+
+    @classmethod
+    def from_rows(cls, field_names, rows, sample_size=DEFAULT_SAMPLE_SIZE):
+        """Profile the provided rows, examining at most `sample_size` of them."""
+        column_types = [None] * len(field_names)
+        unknown = len(column_types)
+        for row in islice(rows, sample_size):
+            for idx, value in enumerate(row):
+                if column_types[idx] is None and value is not None:
+                    column_types[idx] = value.__class__
+                    unknown -= 1
+            if not unknown:
+                break
+        return cls(field_names, column_types)
+
+    def get_type(self, field):
+        return self.column_types[self.field_index[field]]
+
+    def converters(self, table):
+        """Return the converter from `table` for each column's type, in order, or None where there is none."""
+        return [table.get(column_type) for column_type in self.column_types]
+
+    def convert_column(self, field, values, table):
+        """
+        Convert a whole column of values using the converter from `table` for the column's type. Values which are
+        not of the column's type (including nulls) are returned unchanged.
+        """
+        column_type = self.get_type(field)
+        converter = table.get(column_type)
+        if converter is None:
+            return list(values)
+        return [converter(value) if value.__class__ is column_type else value for value in values]
+
+
+class DictionaryColumn(object):
+    """
+    A dictionary encoding of a column: an integer code for each value, plus a table of the distinct values in order of
+    first appearance. Iterating over a DictionaryColumn yields the decoded values, all of which are the objects held
+    in the table, so that repeated values share a single object.
+
+    Keyword arguments
+    :codes: (array) The code of each value, i.e. its position in `values`.
+    :values: (list) The distinct values.
+
+    """
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    @classmethod
+    def from_values(cls, values):
+        codes = array('l')
+        table = []
+        lookup = {}
+        for value in values:
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(table)
+                table.append(value)
+            codes.append(code)
+        return cls(codes, table)
+
+    def matches(self, values):
+        """
+        Whether the column still describes the provided values, i.e. each is the table object for its code. Values
+        changed (or rows added or removed) since the column was encoded are detected, even if made directly.
+        """
+        table = self.values
+        return len(values) == len(self.codes) and all(
+            value is table[code] for value, code in zip(values, self.codes)
+        )
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        values = self.values
+        for code in self.codes:
+            yield values[code]
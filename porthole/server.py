@@ -0,0 +1,220 @@
+import gc
+import itertools
+import json
+import os
+import signal
+import socket
+import tempfile
+import time
+from collections import deque
+from sqlalchemy.orm import configure_mappers
+from .app import config
+from .connections import ConnectionManager
+from .workers import WorkerPool
+
+SOCKET_ENV_NAME = 'PORTHOLE_SOCKET'
+
+
+def default_socket_path():
+    """The socket path set by the PORTHOLE_SOCKET environment variable, or else porthole.sock in the temp directory."""
+    return os.environ.get(SOCKET_ENV_NAME) or os.path.join(tempfile.gettempdir(), 'porthole.sock')
+
+
+class ReportServer(object):
+    """
+    A resident report server. The server preloads porthole, its dependencies and the database dialects used by its
+    config once, then listens on a Unix domain socket, and runs each report requested there in a worker process forked
+    from itself, so reports start without paying Python's start up cost. Requests are sent by the porthole-run client.
+
+    Each request is a line of JSON with the name of a report, and whether to wait for it to finish, e.g.
+    {"report": "daily_sales", "wait": true}. The response is a line of JSON, sent once the report is accepted or,
+    if waiting, once it has finished, e.g. {"report": "daily_sales", "succeeded": true, "seconds": 1.5, "error": null}.
+
+    Keyword arguments
+    :runner: The ReportRunner whose `report_map` defines the reports which may be run.
+    :socket_path: (str) The path of the socket. Defaults to PORTHOLE_SOCKET, or porthole.sock in the temp directory.
+    :workers: (int) The maximum number of reports running at once; further requests wait for a worker.
+
+    """
+    DEFAULT_WORKERS = 4
+    # Longest time to wait between checks, so that timed out workers and stop signals are noticed promptly.
+    POLL_INTERVAL = 1.0
+    # Seconds to wait for a client to send its request once connected. Requests are read without blocking, so a
+    # slow client does not delay other clients.
+    REQUEST_TIMEOUT = 5
+    MAX_REQUEST_SIZE = 65536
+
+    def __init__(self, runner, socket_path=None, workers=None):
+        self.runner = runner
+        self.socket_path = socket_path or default_socket_path()
+        self.pool = WorkerPool(runner, workers or self.DEFAULT_WORKERS)
+        self.logger = runner.logger
+        self.keys = itertools.count()
+        self.queued = deque()
+        self.clients = {}
+        # Connections whose requests have not been read in full, with their keys, data so far, and deadlines.
+        self.pending = {}
+        self.listener = None
+        self.stopping = False
+
+    def serve_forever(self):
+        """Serve requests until SIGINT or SIGTERM is received, then wait for running reports to finish."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.preload()
+        self.listen()
+        self.logger.info(f"Report server listening on {self.socket_path} with {self.pool.workers} workers.")
+        try:
+            while not self.stopping:
+                self.start_queued()
+                for ready in self.pool.wait(self.POLL_INTERVAL, [self.listener] + list(self.pending)):
+                    if ready is self.listener:
+                        self.accept()
+                    else:
+                        self.read_request(ready)
+                self.expire_pending()
+                self.finish(self.pool.collect())
+        finally:
+            self.close()
+        self.logger.info("Stopping report server; waiting for running reports to finish.")
+        for key, _, _ in list(self.pending.values()):
+            self.respond(key, {'report': None, 'succeeded': False, 'error': "The report server stopped."})
+        self.pending.clear()
+        while self.pool.running:
+            self.pool.wait(self.POLL_INTERVAL)
+            self.finish(self.pool.collect())
+        for key, report_name in self.queued:
+            self.respond(key, {'report': report_name, 'succeeded': False, 'error': "The report server stopped."})
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def preload(self):
+        """Do the work every report would otherwise repeat: configure mappers, and load each database's dialect."""
+        configure_mappers()
+        for db in config.sections():
+            if not config.has_option(db, 'rdbms'):
+                continue
+            try:
+                ConnectionManager(db, logger=self.logger).create_engine().dispose()
+            except Exception:
+                self.logger.warning(f"Unable to preload database {db}.")
+        # Keep preloaded objects out of garbage collection, so pages shared with workers are not copied.
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+
+    def listen(self):
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError(f"A report server is already listening on {self.socket_path}.")
+            finally:
+                probe.close()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.socket_path)
+        # Only the server's user may run reports.
+        os.chmod(self.socket_path, 0o600)
+        self.listener.listen(64)
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def accept(self):
+        """Accept a connection, whose request is read by `read_request` as it arrives."""
+        connection, _ = self.listener.accept()
+        connection.setblocking(False)
+        key = next(self.keys)
+        self.clients[key] = connection
+        self.pending[connection] = (key, b'', time.monotonic() + self.REQUEST_TIMEOUT)
+
+    def read_request(self, connection):
+        """Read the data available from a connection, and once its request is complete, handle it."""
+        key, data, deadline = self.pending[connection]
+        try:
+            chunk = connection.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            del self.pending[connection]
+            self.respond(key, {'report': None, 'succeeded': False, 'error': f"Invalid request: {e}"})
+            return
+        data += chunk
+        if chunk and b'\n' not in data and len(data) < self.MAX_REQUEST_SIZE:
+            self.pending[connection] = (key, data, deadline)
+            return
+        del self.pending[connection]
+        # Responses are small, and sent with a timeout rather than without blocking.
+        connection.settimeout(self.REQUEST_TIMEOUT)
+        self.handle_request(key, data.split(b'\n', 1)[0])
+
+    def expire_pending(self):
+        now = time.monotonic()
+        for connection, (key, _, deadline) in list(self.pending.items()):
+            if now >= deadline:
+                del self.pending[connection]
+                self.respond(key, {'report': None, 'succeeded': False, 'error': "Invalid request: timed out"})
+
+    def handle_request(self, key, line):
+        """Parse a request, and queue the requested report."""
+        try:
+            request = json.loads(line.decode('utf-8'))
+        except ValueError as e:
+            self.respond(key, {'report': None, 'succeeded': False, 'error': f"Invalid request: {e}"})
+            return
+        if not isinstance(request, dict) or not isinstance(request.get('report'), str):
+            error = "Invalid request: expected an object with the name of a report."
+            self.respond(key, {'report': None, 'succeeded': False, 'error': error})
+            return
+        report_name = request['report']
+        report_function, _ = self.runner.report_entry(report_name)
+        if report_function is None:
+            error = f"There is no report function mapped to {report_name}."
+            self.logger.error(error)
+            self.respond(key, {'report': report_name, 'succeeded': False, 'error': error})
+            return
+        self.logger.info(f"Received request to run {report_name}")
+        if not request.get('wait', True):
+            self.respond(key, {'report': report_name, 'accepted': True})
+        self.queued.append((key, report_name))
+
+    def start_queued(self):
+        """Start queued reports, in the order they were requested, while workers and database capacity allow."""
+        for key, report_name in list(self.queued):
+            if self.pool.full:
+                break
+            if self.pool.can_start(report_name):
+                self.queued.remove((key, report_name))
+                self.pool.start(key, report_name, target=self.run_in_worker)
+
+    def run_in_worker(self, report_name):
+        """Run a report in a worker process, closing the sockets it inherited from the server."""
+        self.listener.close()
+        for connection in self.clients.values():
+            connection.close()
+        self.runner.run_in_worker(report_name)
+
+    def finish(self, finished):
+        for key, outcome in finished:
+            error = None if outcome.error is None else str(outcome.error)
+            response = {'report': outcome.report_name, 'succeeded': outcome.succeeded, 'seconds': outcome.seconds}
+            self.respond(key, dict(response, error=error))
+
+    def respond(self, key, response):
+        """Send a response to the client which made a request, if it has not already had one, and disconnect it."""
+        connection = self.clients.pop(key, None)
+        if connection is None:
+            return
+        try:
+            connection.sendall(json.dumps(response).encode('utf-8') + b'\n')
+        except OSError:
+            self.logger.warning(f"Unable to respond to the request to run {response.get('report')}.")
+        finally:
+            connection.close()
@@ -0,0 +1,107 @@
+import mmap
+import pickle
+import sys
+import tempfile
+from array import array
+
+# Approximate per-row overhead of a RowDict in memory, in addition to the size of its values.
+ROW_OVERHEAD = 200
+VALUE_OVERHEAD = 100
+
+
+def estimate_rows_size(rows):
+    """
+    Estimate the in-memory size, in bytes, of a batch of rows once converted to RowDicts.
+    Only the first row is measured, and is assumed to be representative of the batch.
+    """
+    if not rows:
+        return 0
+    row_size = ROW_OVERHEAD + sum(sys.getsizeof(value) + VALUE_OVERHEAD for value in rows[0])
+    return row_size * len(rows)
+
+
+class SpilledRows(object):
+    """
+    A sequence of rows stored in a temporary file rather than in memory. Each row's values are pickled into the file
+    and the offset of each row is recorded, so that rows can be read back, in order or by index, through a
+    memory map of the file. Rows are returned as new objects created by `row_factory` each time they are read, so
+    changes to them are not persisted; use `updated` to change every row.
+
+    Keyword arguments
+    :field_names: (list) The field names of the rows.
+    :row_factory: (callable) Called with the field names and a tuple of values to create each row that is read.
+    :dir: (str) Optional. The directory in which to create the temporary file.
+
+    """
+    def __init__(self, field_names, row_factory, dir=None):
+        self.field_names = list(field_names)
+        self.row_factory = row_factory
+        self.dir = dir
+        self.file = tempfile.TemporaryFile(dir=dir)
+        self.offsets = array('Q', [0])
+        self.buffer = None
+
+    def append(self, values):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+            self.file.seek(0, 2)
+        data = pickle.dumps(tuple(values), pickle.HIGHEST_PROTOCOL)
+        self.file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def extend(self, rows):
+        for values in rows:
+            self.append(values)
+
+    def map_file(self):
+        """Memory map the file for reading, once writing is complete."""
+        if self.buffer is None and len(self):
+            self.file.flush()
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.buffer
+
+    def read_row(self, idx):
+        buffer = self.map_file()
+        values = pickle.loads(buffer[self.offsets[idx]:self.offsets[idx + 1]])
+        return self.row_factory(self.field_names, values)
+
+    def updated(self, func):
+        """
+        Call `func` on every row, returning a new SpilledRows containing the rows as modified by `func`.
+        This object is closed afterwards.
+        """
+        rows = SpilledRows(self.field_names, self.row_factory, dir=self.dir)
+        for row in self:
+            func(row)
+            rows.append(row.values())
+        self.close()
+        return rows
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+        self.file.close()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.read_row(idx) for idx in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("SpilledRows index out of range")
+        return self.read_row(item)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.read_row(idx)
+
+    def __del__(self):
+        try:
+            self.close()
+        except:
+            pass
@@ -41,6 +41,15 @@ class DataTask:
         else:
             self.report_log = None
 
+    @staticmethod
+    def enqueue(task_name, max_attempts=3):
+        """
+        Queue a run of a task in the run queue, returning the run's id. The run is made by a RunQueueWorker, whose
+        runner's report_map maps the task name to its function.
+        """
+        from porthole.work_queue import RunQueue, TASK_RUN
+        return RunQueue().enqueue(task_name, run_type=TASK_RUN, max_attempts=max_attempts)
+
     def get_conn(self, db):
         return self.conns.pool.get(db)
 
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+import pytz
+from .frames import INT64_MAX, np, numpy_dtype, pd, to_numpy_array
+
+# Timezone offsets change only on quarter-hour boundaries, so conversions can be cached per quarter hour.
+OFFSET_INTERVAL_MINUTES = 15
+
+
+def transform_column(values, column_type, func, keep_nulls=True):
+    """
+    Call `func` once with a whole column of values: as a NumPy array if numpy is installed, or as a list otherwise.
+    The array is typed (see `numpy_dtype`) only if every value converts to the dtype and back unchanged; otherwise it
+    has the object dtype, so that values keep their Python types. `func` must return a sequence with one value for
+    each value it is given. If `keep_nulls` is True, null values remain null, and are not passed to `func`.
+    """
+    positions = None
+    if keep_nulls and any(value is None for value in values):
+        positions = [idx for idx, value in enumerate(values) if value is not None]
+        inputs = [values[idx] for idx in positions]
+    else:
+        inputs = list(values)
+    column = to_numpy_array(inputs, column_type, exact=True) if np is not None else inputs
+    transformed = func(column)
+    if np is not None and isinstance(transformed, np.ndarray):
+        transformed = transformed.tolist()
+    elif np is not None:
+        # NumPy scalars, e.g. from iterating over an array, are converted to the equivalent Python values.
+        transformed = [value.item() if isinstance(value, np.generic) else value for value in transformed]
+    else:
+        transformed = list(transformed)
+    if len(transformed) != len(inputs):
+        raise ValueError("Column transforms must return one value for each row.")
+    if positions is None:
+        return transformed
+    result = [None] * len(values)
+    for idx, new_value in zip(positions, transformed):
+        result[idx] = new_value
+    return result
+
+
+def is_exact_numeric(values, column_type):
+    """Whether the non-null values can be transformed as an int64 or float64 array without changing any of them."""
+    if np is None or column_type not in (int, float):
+        return False
+    return numpy_dtype([value for value in values if value is not None], column_type, exact=True) is not None
+
+
+def round_column(values, column_type, ndigits=0):
+    """Round numeric values as the built-in `round` does, i.e. halves are rounded to even."""
+    if is_exact_numeric(values, column_type):
+        return transform_column(values, column_type, lambda column: np.round(column, ndigits))
+    return [None if value is None else round(value, ndigits) for value in values]
+
+
+def scale_column(values, column_type, factor):
+    """Multiply numeric values by `factor`. Decimal values are multiplied by `factor` as a Decimal."""
+    if is_exact_numeric(values, column_type) and factor.__class__ in (int, float) and not (
+            column_type is int and factor.__class__ is int and overflows(values, factor)
+    ):
+        return transform_column(values, column_type, lambda column: column * factor)
+    if column_type is Decimal and not isinstance(factor, Decimal):
+        factor = Decimal(str(factor))
+    return [None if value is None else value * factor for value in values]
+
+
+def overflows(values, factor):
+    """Whether multiplying any of the int values by an int factor would overflow an int64."""
+    largest = max((abs(value) for value in values if value is not None), default=0)
+    return largest * abs(factor) > INT64_MAX
+
+
+def fill_null_column(values, fill_value):
+    return [fill_value if value is None else value for value in values]
+
+
+def convert_timezone_column(values, to_timezone, from_timezone='UTC', naive=True):
+    """
+    Convert datetimes to `to_timezone`. Naive datetimes are assumed to be in `from_timezone`; ambiguous and
+    non-existent local times are resolved as standard time. If `naive` is True, the converted datetimes are returned
+    without tzinfo, as required by xlsxwriter.
+
+    Uses pandas if installed. Otherwise, conversions are cached per quarter hour, so that pytz is consulted once for
+    each quarter hour present in the column rather than once per value.
+    """
+    if pd is not None:
+        return convert_timezone_pandas(values, to_timezone, from_timezone, naive)
+    source = pytz.timezone(from_timezone)
+    target = pytz.timezone(to_timezone)
+
+    def convert(value):
+        if value.tzinfo is None:
+            value = source.localize(value)
+        value = value.astimezone(target)
+        return value.replace(tzinfo=None) if naive else value
+
+    if not naive:
+        return [None if value is None else convert(value) for value in values]
+    offsets = {}
+    converted = []
+    for value in values:
+        if value is None:
+            converted.append(None)
+            continue
+        interval = value.replace(
+            minute=value.minute - value.minute % OFFSET_INTERVAL_MINUTES, second=0, microsecond=0
+        )
+        offset = offsets.get(interval)
+        if offset is None:
+            offset = offsets[interval] = convert(interval) - interval.replace(tzinfo=None)
+        converted.append(value.replace(tzinfo=None) + offset)
+    return converted
+
+
+def convert_timezone_pandas(values, to_timezone, from_timezone, naive):
+    aware = any(value.tzinfo is not None for value in values if value is not None)
+    series = pd.Series(pd.to_datetime(values, utc=aware))
+    if not aware:
+        series = series.dt.tz_localize(
+            from_timezone, ambiguous=np.zeros(len(series), dtype=bool), nonexistent=timedelta(hours=1)
+        )
+    series = series.dt.tz_convert(to_timezone)
+    if naive:
+        series = series.dt.tz_localize(None)
+    converted = series.dt.to_pydatetime()
+    return [None if value is None else new_value for value, new_value in zip(values, converted)]
+
+
+def check_datetime_column(field, column_type):
+    if column_type not in (datetime, None):
+        raise TypeError(f"Field <{field}> must contain datetimes, not {column_type.__name__}.")
@@ -0,0 +1,282 @@
+import datetime
+import os
+import signal
+import socket
+import time
+from collections import deque
+from functools import partial
+from sqlalchemy import func
+from .app import Session
+from .models import ReportRun
+from .workers import WorkerPool
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+REPORT_RUN = 'report'
+TASK_RUN = 'task'
+
+# Databases on which claims use SELECT ... FOR UPDATE SKIP LOCKED. Others claim runs by a conditional UPDATE.
+SKIP_LOCKED_DIALECTS = ('postgresql', 'mysql')
+
+
+class RunQueue(object):
+    """
+    A queue of report and DataTask runs, stored in the report_runs table, which any number of workers on any number
+    of nodes may share. Workers claim runs atomically, send heartbeats while they run them, and record their outcomes.
+    Runs whose workers stop sending heartbeats (e.g. because a node crashed) are reclaimed, and queued again until
+    they have been attempted `max_attempts` times. All times are taken from the database's clock, so that nodes'
+    clocks need not agree.
+
+    Keyword arguments
+    :stale_after: (int) Seconds without a heartbeat after which a run is reclaimed.
+
+    """
+    def __init__(self, stale_after=300):
+        self.stale_after = stale_after
+
+    @staticmethod
+    def database_time(session):
+        return session.query(func.now()).scalar()
+
+    def enqueue(self, report_name, run_type=REPORT_RUN, max_attempts=3):
+        """Queue a run of a report (or a DataTask, if `run_type` is 'task'), returning the run's id."""
+        session = Session()
+        try:
+            run = ReportRun(
+                report_name=report_name, run_type=run_type, status=QUEUED, attempts=0, max_attempts=max_attempts
+            )
+            session.add(run)
+            session.commit()
+            return run.id
+        finally:
+            session.close()
+
+    def claim(self, worker):
+        """Claim the oldest queued run for `worker`, returning it, or None if no run is queued."""
+        session = Session(expire_on_commit=False)
+        try:
+            if session.bind.dialect.name in SKIP_LOCKED_DIALECTS:
+                return self.claim_skip_locked(session, worker)
+            return self.claim_conditional(session, worker)
+        finally:
+            session.close()
+
+    def claim_skip_locked(self, session, worker):
+        run = session.query(ReportRun).filter(
+            ReportRun.status == QUEUED
+        ).order_by(ReportRun.id).with_for_update(skip_locked=True).first()
+        if run is None:
+            session.rollback()
+            return None
+        now = self.database_time(session)
+        run.status = RUNNING
+        run.worker = worker
+        run.attempts += 1
+        run.claimed_at = run.heartbeat_at = now
+        session.commit()
+        return run
+
+    def claim_conditional(self, session, worker, candidates=10):
+        """Claim a run with an UPDATE which only succeeds if the run is still queued, trying the oldest few in turn."""
+        run_ids = [run_id for run_id, in session.query(ReportRun.id).filter(
+            ReportRun.status == QUEUED
+        ).order_by(ReportRun.id).limit(candidates)]
+        for run_id in run_ids:
+            now = self.database_time(session)
+            claimed = session.query(ReportRun).filter(ReportRun.id == run_id, ReportRun.status == QUEUED).update({
+                ReportRun.status: RUNNING,
+                ReportRun.worker: worker,
+                ReportRun.attempts: ReportRun.attempts + 1,
+                ReportRun.claimed_at: now,
+                ReportRun.heartbeat_at: now,
+            }, synchronize_session=False)
+            session.commit()
+            if claimed:
+                return session.query(ReportRun).get(run_id)
+        return None
+
+    def heartbeat(self, run_ids, worker):
+        """
+        Record that `worker` is still running the provided runs. Returns the ids of those which it no longer holds,
+        because they were reclaimed.
+        """
+        if not run_ids:
+            return []
+        session = Session()
+        try:
+            now = self.database_time(session)
+            session.query(ReportRun).filter(
+                ReportRun.id.in_(run_ids), ReportRun.worker == worker, ReportRun.status == RUNNING
+            ).update({ReportRun.heartbeat_at: now}, synchronize_session=False)
+            session.commit()
+            held = {run_id for run_id, in session.query(ReportRun.id).filter(
+                ReportRun.id.in_(run_ids), ReportRun.worker == worker, ReportRun.status == RUNNING
+            )}
+        finally:
+            session.close()
+        return [run_id for run_id in run_ids if run_id not in held]
+
+    def complete(self, run_id, worker, succeeded, error=None):
+        """Record the outcome of a run, unless it has been reclaimed from `worker`."""
+        session = Session()
+        try:
+            session.query(ReportRun).filter(
+                ReportRun.id == run_id, ReportRun.worker == worker, ReportRun.status == RUNNING
+            ).update({
+                ReportRun.status: SUCCEEDED if succeeded else FAILED,
+                ReportRun.completed_at: self.database_time(session),
+                ReportRun.error_detail: None if error is None else str(error)[:255],
+            }, synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+
+    def release(self, run_id, worker):
+        """
+        Queue again a run which `worker` claimed but did not start, unless it has been reclaimed from `worker`.
+        The claim is not counted as an attempt.
+        """
+        session = Session()
+        try:
+            session.query(ReportRun).filter(
+                ReportRun.id == run_id, ReportRun.worker == worker, ReportRun.status == RUNNING
+            ).update({
+                ReportRun.status: QUEUED,
+                ReportRun.worker: None,
+                ReportRun.attempts: ReportRun.attempts - 1,
+            }, synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+
+    def reclaim_stale(self):
+        """
+        Queue again each running run which has not had a heartbeat for `stale_after` seconds, or fail it if it has
+        been attempted `max_attempts` times. Returns the number of runs reclaimed.
+        """
+        session = Session()
+        try:
+            now = self.database_time(session)
+            threshold = now - datetime.timedelta(seconds=self.stale_after)
+            stale = (ReportRun.status == RUNNING, ReportRun.heartbeat_at < threshold)
+            reclaimed = session.query(ReportRun).filter(*stale, ReportRun.attempts < ReportRun.max_attempts).update({
+                ReportRun.status: QUEUED,
+                ReportRun.worker: None,
+            }, synchronize_session=False)
+            session.query(ReportRun).filter(*stale, ReportRun.attempts >= ReportRun.max_attempts).update({
+                ReportRun.status: FAILED,
+                ReportRun.completed_at: now,
+                ReportRun.error_detail: "The run's worker stopped sending heartbeats.",
+            }, synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+        return reclaimed
+
+
+class RunQueueWorker(object):
+    """
+    Claims runs from a RunQueue and runs each in a worker process, with up to `workers` running at once, until
+    stopped. Report runs are run as the runner would run them; task runs wrap the report_map function of the same
+    name in a DataTask. While runs are in progress the worker sends heartbeats, and if a run is reclaimed from it
+    (because its heartbeats were late) its process is killed, so that the run is not run twice at once.
+    Every worker also reclaims stale runs, so no separate supervisor is needed.
+
+    Keyword arguments
+    :runner: The ReportRunner whose `report_map` defines the reports and tasks which may be run.
+    :queue: The RunQueue from which runs are claimed.
+    :workers: (int) The maximum number of runs in progress at once.
+    :heartbeat_interval: (int) Seconds between heartbeats; this should be well below the queue's `stale_after`.
+    :poll_interval: (int) Seconds to wait between claims when the queue is empty.
+
+    """
+    DEFAULT_WORKERS = 4
+
+    def __init__(self, runner, queue=None, workers=None, heartbeat_interval=30, poll_interval=5):
+        self.runner = runner
+        self.queue = queue or RunQueue()
+        self.pool = WorkerPool(runner, workers or self.DEFAULT_WORKERS)
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self.logger = runner.logger
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.claimed = deque()
+        self.next_heartbeat = 0
+        self.stopping = False
+
+    def run_forever(self):
+        """Claim and run runs until SIGINT or SIGTERM is received, then wait for those in progress to finish."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.logger.info(f"Starting run queue worker {self.name} with {self.pool.workers} workers.")
+        while not self.stopping:
+            started = self.run_pending()
+            self.pool.wait(0 if started else self.poll_interval)
+        self.logger.info(f"Stopping run queue worker {self.name}; waiting for runs in progress to finish.")
+        self.release_claimed()
+        while self.pool.running:
+            self.pool.wait(1)
+            self.send_heartbeats()
+            self.finish(self.pool.collect())
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def release_claimed(self):
+        """Queue again the runs which have been claimed but not started, so that other workers may run them."""
+        for run in self.claimed:
+            self.queue.release(run.id, self.name)
+        self.claimed.clear()
+
+    def run_pending(self):
+        """Send heartbeats if due, record finished runs, and claim and start runs while capacity allows."""
+        self.send_heartbeats()
+        self.finish(self.pool.collect())
+        started = 0
+        while not self.pool.full:
+            if not self.claimed:
+                run = self.queue.claim(self.name)
+                if run is None:
+                    break
+                self.claimed.append(run)
+            run = self.claimed[0]
+            if not self.pool.can_start(run.report_name):
+                break
+            self.claimed.popleft()
+            self.logger.info(f"Starting {run.run_type} run {run.id} of {run.report_name}.")
+            self.pool.start(run.id, run.report_name, target=self.target(run))
+            started += 1
+        return started
+
+    def target(self, run):
+        if run.run_type == TASK_RUN:
+            return partial(self.runner.run_in_worker, run=self.run_task)
+        return self.runner.run_in_worker
+
+    def run_task(self, task_name):
+        from .tasks import DataTask
+        task_function, _ = self.runner.report_entry(task_name)
+        if task_function is None:
+            raise ValueError(f"There is no task function mapped to {task_name}.")
+        DataTask(task_name, task_function).execute()
+
+    def send_heartbeats(self, force=False):
+        """Send heartbeats for runs in progress, if one is due, and kill the processes of any reclaimed runs."""
+        if not force and time.monotonic() < self.next_heartbeat:
+            return
+        self.next_heartbeat = time.monotonic() + self.heartbeat_interval
+        self.queue.reclaim_stale()
+        run_ids = list(self.pool.running) + [run.id for run in self.claimed]
+        for run_id in self.queue.heartbeat(run_ids, self.name):
+            self.logger.error(f"Run {run_id} was reclaimed from worker {self.name}.")
+            if run_id in self.pool.running:
+                _, process, _, _ = self.pool.running[run_id]
+                self.pool.stop_worker(process)
+            self.claimed = deque(run for run in self.claimed if run.id != run_id)
+
+    def finish(self, finished):
+        for run_id, outcome in finished:
+            self.queue.complete(run_id, self.name, outcome.succeeded, outcome.error)
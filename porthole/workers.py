@@ -0,0 +1,100 @@
+import multiprocessing
+import multiprocessing.connection
+import time
+from collections import Counter, namedtuple
+from .app import default_engine
+
+ReportOutcome = namedtuple('ReportOutcome', ['report_name', 'succeeded', 'seconds', 'error'])
+
+
+class WorkerPool(object):
+    """
+    Runs reports in worker processes, one process per report, with up to `workers` running at once, and no more
+    reports running against any database than its concurrency limit allows. Reports are run by the `runner`
+    (a ReportRunner), which also provides each report's databases and timeout, and each database's limit.
+
+    Keyword arguments
+    :runner: The ReportRunner whose `run_in_worker` method runs each report.
+    :workers: (int) The maximum number of worker processes running at once.
+
+    """
+    def __init__(self, runner, workers):
+        self.runner = runner
+        self.workers = workers
+        if 'fork' in multiprocessing.get_all_start_methods():
+            self.context = multiprocessing.get_context('fork')
+        else:
+            self.context = multiprocessing.get_context()
+        self.running = {}
+        self.usage = Counter()
+
+    @property
+    def full(self):
+        return len(self.running) >= self.workers
+
+    def can_start(self, report_name):
+        """Whether a worker is free, and every database the report queries is below its concurrency limit."""
+        databases = self.runner.report_databases(report_name)
+        return not self.full and all(self.usage[db] < self.runner.database_limit(db) for db in databases)
+
+    def is_running(self, report_name):
+        return any(name == report_name for name, _, _, _ in self.running.values())
+
+    def start(self, key, report_name, target=None):
+        """
+        Start a worker process for a report. `key` identifies the report's outcome when it is collected. The worker
+        runs `target(report_name)`, which defaults to the runner's `run_in_worker` method.
+        """
+        databases = self.runner.report_databases(report_name)
+        self.usage.update(databases)
+        # Connections in the default engine's pool must not be shared with the worker.
+        default_engine.dispose()
+        process = self.context.Process(
+            target=target or self.runner.run_in_worker, args=(report_name,), name=f"report {report_name}"
+        )
+        process.start()
+        self.running[key] = (report_name, process, time.monotonic(), databases)
+
+    def wait(self, timeout, objects=()):
+        """
+        Wait up to `timeout` seconds for a worker to finish, or for any of `objects` (e.g. sockets) to be ready.
+        Returns those of `objects` which are ready.
+        """
+        sentinels = [process.sentinel for _, process, _, _ in self.running.values()]
+        if sentinels or objects:
+            ready = multiprocessing.connection.wait(sentinels + list(objects), timeout=timeout)
+            return [obj for obj in objects if obj in ready]
+        if timeout > 0:
+            time.sleep(timeout)
+        return []
+
+    def collect(self):
+        """
+        Return a (key, ReportOutcome) tuple for each worker which has finished. Workers which have exceeded their
+        report's timeout are killed, and their reports fail.
+        """
+        finished = []
+        for key, (report_name, process, started, databases) in list(self.running.items()):
+            timeout = self.runner.report_timeout(report_name)
+            elapsed = time.monotonic() - started
+            if process.exitcode is None and (timeout is None or elapsed < timeout):
+                continue
+            error = None
+            if process.exitcode is None:
+                self.stop_worker(process)
+                error = TimeoutError(f"Report {report_name} timed out after {timeout} seconds.")
+                self.runner.logger.error(str(error))
+            elif process.exitcode != 0:
+                error = RuntimeError(f"Report {report_name} worker exited with status {process.exitcode}.")
+            del self.running[key]
+            self.usage.subtract(databases)
+            finished.append((key, ReportOutcome(report_name, error is None, elapsed, error)))
+        return finished
+
+    @staticmethod
+    def stop_worker(process):
+        process.terminate()
+        process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
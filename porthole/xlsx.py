@@ -1,6 +1,38 @@
 import datetime
+import os
+from decimal import Decimal
+from itertools import chain, islice
+from math import exp, floor, log
+from random import Random
+from xml.etree.ElementTree import iterparse
 import xlsxwriter
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.dimensions import ColumnDimension
+
+# Type-specialized worksheet methods, keyed by the exact type of a cell value.
+# Strings are left to the generic `write` method, so that (as elsewhere) they may be converted to formulas or URLs.
+CELL_WRITERS = {
+    int: 'write_number',
+    float: 'write_number',
+    Decimal: 'write_number',
+    bool: 'write_boolean',
+    datetime.datetime: 'write_datetime',
+    datetime.date: 'write_datetime',
+}
+# Types written as dates, which need a date number format.
+DATE_TYPES = frozenset([datetime.datetime, datetime.date])
+
+# Cheap estimates of the displayed length of a cell value, keyed by the exact type of the value.
+# Values of other types are measured using `len(str(value))`.
+WIDTH_ESTIMATORS = {
+    str: len,
+    type(None): lambda value: 0,
+    bool: lambda value: 5,
+    datetime.date: lambda value: 10,
+    datetime.datetime: lambda value: 19,
+}
 
 
 class WorkbookBuilder(object):
@@ -11,12 +43,16 @@ class WorkbookBuilder(object):
 
     DEFAULT_COL_WIDTH = 10
     MAX_COLUMN_WIDTH = 50
+    MAX_ROWS = 1048576
+    MAX_SHEET_NAME_LENGTH = 31
     DEFAULT_HEADER_PARAMS = {'bold': True}
 
     def __init__(self, filename=None):
         self.filename = filename
         self.default_header_format = None
         self.formats = {}
+        self.format_params = {}
+        self.date_formats = {}
         self.workbook_options = {
             'constant_memory': True,
             'default_date_format': 'mm/dd/yy'}
@@ -39,12 +75,25 @@ class WorkbookBuilder(object):
         if format_name in self.formats:
             raise IndexError(f"Workbook already contains format object < {format_name} >")
         self.formats[format_name] = self.workbook.add_format(format_params)
+        self.format_params[format_name] = format_params
+
+    def date_format(self, format_name):
+        """
+        Return a format combining a named format with the workbook's default date format (unless the named format has
+        its own number format), for date cells, which would otherwise be written without a date format.
+        """
+        date_format = self.date_formats.get(format_name)
+        if date_format is None:
+            params = dict({'num_format': self.workbook.default_date_format.num_format})
+            params.update(self.format_params[format_name])
+            date_format = self.date_formats[format_name] = self.workbook.add_format(params)
+        return date_format
 
     def add_worksheet(
             self, sheet_name, field_names, sheet_data,
             format_axis=None, format_rules=None, row_start=0, col_start=0,
             autofit_columns=True, column_width=None, freeze_first_row=False,
-            header_format=None, show_autofilter=False
+            header_format=None, show_autofilter=False, autofit_sample_size=None, overflow=True, schema=None
     ):
         """
         :param sheet_name: Worksheet name as string.
@@ -59,42 +108,214 @@ class WorkbookBuilder(object):
         :param freeze_first_row: Optional, default False. Freezes first row when scrolling.
         :param header_format: Optional, default None. Apply specified format name to header row.
         :param show_autofilter: Optional, default False. Show autofilter on first row.
+        :param autofit_sample_size: Optional, default None. Auto-fit columns using a sample of this many rows (see
+            `ColumnWidths`), rather than every row. Useful for very large sheets.
+        :param overflow: Optional, default True. Continue writing rows which do not fit on the worksheet onto
+            additional worksheets named e.g. `Sheet (2)`. If False, a ValueError is raised instead.
+        :param schema: Optional, default None. A `ColumnSchema` (e.g. `QueryResult.schema`) used to select a writer
+            for each column. If not provided, column types are taken from the first row.
 
         Add worksheet to the workbook. This method assumes that each inner list (row) has the same number of elements.
         """
+        return self.add_worksheet_stream(
+            sheet_name=sheet_name,
+            field_names=field_names,
+            rows_iter=sheet_data,
+            format_axis=format_axis,
+            format_rules=format_rules,
+            row_start=row_start,
+            col_start=col_start,
+            autofit_columns=autofit_columns,
+            column_width=column_width,
+            freeze_first_row=freeze_first_row,
+            header_format=header_format,
+            show_autofilter=show_autofilter,
+            autofit_sample_size=autofit_sample_size,
+            overflow=overflow,
+            schema=schema
+        )
+
+    def add_worksheet_stream(
+            self, sheet_name, field_names, rows_iter,
+            format_axis=None, format_rules=None, row_start=0, col_start=0,
+            autofit_columns=True, column_width=None, freeze_first_row=False,
+            header_format=None, show_autofilter=False, autofit_sample_size=None, overflow=True, schema=None
+    ):
+        """
+        Add worksheet to the workbook, writing rows as they are consumed from `rows_iter`. Any iterable of rows may be
+        provided, including a `QueryResultStream`. Rows are never materialized, and column widths are auto-fitted
+        incrementally, so together with the workbook's `constant_memory` option the worksheet is written in constant
+        memory. Accepts the same optional parameters as `add_worksheet`.
+
+        If there are more rows than fit on one worksheet (see `MAX_ROWS`), writing continues on additional worksheets
+        named e.g. `Sheet (2)`, `Sheet (3)`, each with the same headers, formats and options. Set `overflow` to False
+        to raise a ValueError instead.
+
+        :return: The number of data rows written.
+        """
         if autofit_columns and column_width:
             raise ValueError("Cannot both auto-fit columns and set a uniform column width.")
-        worksheet = self.workbook.add_worksheet(sheet_name)
-        cell_formats = create_cell_formats(sheet_data, format_axis, format_rules)
-
-        e_row = row_start
-        e_col = col_start
-
-        # Write field names in first row.
-        for i, field_name in enumerate(field_names):
-            worksheet.write(
-                e_row,
-                e_col + i,
-                field_name,
-                self.formats.get(header_format, self.default_header_format)
+        if format_axis not in (None, 0, 1, 'row', 'column'):
+            raise ValueError("Must provide valid format axis: 0 or 'row', 1 or 'column'.")
+
+        rows = iter(rows_iter)
+        column_widths = None
+        if autofit_columns is True:
+            column_widths = ColumnWidths(
+                field_names,
+                column_width=column_width,
+                date_width=len(str(self.workbook.default_date_format.num_format)),
+                sample_size=autofit_sample_size
             )
+            rows = column_widths.track(rows)
+
+        column_formats = {}
+        if format_axis in (1, 'column'):
+            column_rules = compile_column_rules(field_names, format_rules)
+            for i, rule in enumerate(column_rules):
+                if isinstance(rule, str):
+                    # Rules of type `all` become column formats, applied to every cell without a cell format.
+                    column_formats[col_start + i] = self.formats.get(rule)
+            cell_rules = [rule if callable(rule) else None for rule in column_rules]
+        elif format_axis in (0, 'row'):
+            row_rule = compile_row_rules(format_rules)
+
+        column_types = schema.column_types if schema is not None else None
+        header_cell_format = self.formats.get(header_format, self.default_header_format)
+        capacity = self.MAX_ROWS - row_start - 1
+        worksheets = []
+        rows_written = 0
+        while True:
+            worksheet = self.workbook.add_worksheet(overflow_sheet_name(sheet_name, len(worksheets) + 1))
+            worksheets.append(worksheet)
+
+            # Write field names in first row.
+            for i, field_name in enumerate(field_names):
+                worksheet.write(row_start, col_start + i, field_name, header_cell_format)
+            for col, column_format in column_formats.items():
+                worksheet.set_column(col, col, None, column_format)
+
+            # Write the data, starting in the row after the field names.
+            sheet_rows = islice(rows, capacity)
+            if format_axis is None:
+                sheet_rows_written = self.write_unformatted_rows(
+                    worksheet, sheet_rows, row_start + 1, col_start, column_types
+                )
+            elif format_axis in (1, 'column'):
+                sheet_rows_written = self.write_column_formatted_rows(
+                    worksheet, sheet_rows, cell_rules, row_start + 1, col_start, column_types
+                )
+            else:
+                sheet_rows_written = self.write_row_formatted_rows(
+                    worksheet, sheet_rows, row_rule, row_start + 1, col_start, column_types
+                )
+            rows_written += sheet_rows_written
+            if sheet_rows_written < capacity:
+                break
+            next_row, rows = peek(rows)
+            if next_row is None:
+                break
+            if not overflow:
+                raise ValueError(f"Worksheet <{sheet_name}> cannot contain more than {capacity} rows.")
+
+        if column_widths is not None:
+            col_widths = column_widths.widths()
+        else:
+            col_widths = [column_width or WorkbookBuilder.DEFAULT_COL_WIDTH] * len(field_names)
+        for worksheet in worksheets:
+            for i, width in enumerate(col_widths):
+                worksheet.set_column(col_start + i, col_start + i, width, column_formats.get(col_start + i))
+            if freeze_first_row:
+                worksheet.freeze_panes(1, 0)
+            if show_autofilter:
+                worksheet.autofilter(0, 0, 0, len(field_names) - 1)
+        return rows_written
+
+    @staticmethod
+    def write_unformatted_rows(worksheet, rows, row_start=0, col_start=0, column_types=None):
+        """
+        Fast path for writing data which has no format rules. No format matrix is created. Each column is assigned a
+        type-specialized writer (e.g. `write_number`) based on `column_types` or, if not provided, the type of its value
+        in the first row. Any cell whose type differs from its column's type falls back to the generic `write` method,
+        as do all strings, so that strings are converted to formulas or URLs whatever their column's type.
 
-        # Increment row counter for incoming data.
-        e_row += 1
+        :return: The number of rows written.
+        """
+        first_row, rows = peek(rows)
+        if first_row is None:
+            return 0
+        row_num = row_start - 1
+        column_types = column_types or [value.__class__ for value in first_row]
+        columns = list(enumerate(select_column_writers(worksheet, column_types), col_start))
+        if not any(writer for _, (_, writer) in columns):
+            for row_num, value_row in enumerate(rows, row_start):
+                worksheet.write_row(row_num, col_start, value_row)
+            return row_num - row_start + 1
+        write = worksheet.write
+        for row_num, value_row in enumerate(rows, row_start):
+            for (col_num, (value_type, writer)), val in zip(columns, value_row):
+                if val.__class__ is value_type:
+                    writer(row_num, col_num, val)
+                else:
+                    write(row_num, col_num, val)
+        return row_num - row_start + 1
+
+    def write_column_formatted_rows(self, worksheet, rows, cell_rules, row_start=0, col_start=0, column_types=None):
+        """
+        Write rows using the same type-specialized writers as `write_unformatted_rows`, evaluating compiled cell rules
+        (see `compile_column_rules`) as each row is written. Columns without a cell rule incur no per-cell format work.
 
-        # Write the data.
-        for value_row, format_row in zip(sheet_data, cell_formats):
-            for x, (val, fmt) in enumerate(zip(value_row, format_row)):
-                worksheet.write(e_row, e_col + x, val, self.formats.get(fmt))
-            e_row += 1
+        :return: The number of rows written.
+        """
+        first_row, rows = peek(rows)
+        if first_row is None:
+            return 0
+        row_num = row_start - 1
+        column_types = column_types or [value.__class__ for value in first_row]
+        writers = select_column_writers(worksheet, column_types)
+        columns = list(zip(range(col_start, col_start + len(writers)), writers, cell_rules))
+        formats = self.formats
+        write = worksheet.write
+        for row_num, value_row in enumerate(rows, row_start):
+            for (col_num, (value_type, writer), rule), val in zip(columns, value_row):
+                cell_format = None if rule is None else formats.get(rule(value_row))
+                if val.__class__ is value_type:
+                    writer(row_num, col_num, val, cell_format)
+                else:
+                    write(row_num, col_num, val, cell_format)
+        return row_num - row_start + 1
+
+    def write_row_formatted_rows(self, worksheet, rows, row_rule, row_start=0, col_start=0, column_types=None):
+        """
+        Write rows using the same type-specialized writers as `write_unformatted_rows`, evaluating a compiled row rule
+        (see `compile_row_rules`) once per row. The resulting format is applied to the whole row using `set_row`,
+        and to each of the row's cells. Date cells are given the format combined with a date number format (see
+        `date_format`).
 
-        col_widths = self.calculate_column_widths(field_names, sheet_data, autofit_columns, column_width)
-        for i, width in enumerate(col_widths):
-            worksheet.set_column(i, i, width)
-        if freeze_first_row:
-            worksheet.freeze_panes(1, 0)
-        if show_autofilter:
-            worksheet.autofilter(0, 0, 0, len(field_names) - 1)
+        :return: The number of rows written.
+        """
+        first_row, rows = peek(rows)
+        if first_row is None:
+            return 0
+        row_num = row_start - 1
+        column_types = column_types or [value.__class__ for value in first_row]
+        columns = list(enumerate(select_column_writers(worksheet, column_types), col_start))
+        formats = self.formats
+        write = worksheet.write
+        for row_num, value_row in enumerate(rows, row_start):
+            format_name = row_rule(value_row)
+            row_format = None if format_name is None else formats.get(format_name)
+            date_format = None
+            if row_format is not None:
+                worksheet.set_row(row_num, None, row_format)
+                date_format = self.date_format(format_name)
+            for (col_num, (value_type, writer)), val in zip(columns, value_row):
+                cell_format = date_format if val.__class__ in DATE_TYPES else row_format
+                if val.__class__ is value_type:
+                    writer(row_num, col_num, val, cell_format)
+                else:
+                    write(row_num, col_num, val, cell_format)
+        return row_num - row_start + 1
 
     def calculate_column_widths(self, field_names, sheet_data, autofit_columns=False, column_width=None):
         """
@@ -104,88 +325,346 @@ class WorkbookBuilder(object):
         :param column_width: Optional, default of None. Specify a uniform column width.
         :return: List of column widths as integers
         """
-        column_width = column_width or WorkbookBuilder.DEFAULT_COL_WIDTH
-        col_widths = [column_width] * len(field_names)
+        if autofit_columns is not True:
+            return [column_width or WorkbookBuilder.DEFAULT_COL_WIDTH] * len(field_names)
+        column_widths = ColumnWidths(
+            field_names,
+            column_width=column_width,
+            date_width=len(str(self.workbook.default_date_format.num_format))
+        )
+        for row in sheet_data:
+            column_widths.add_row(row)
+        return column_widths.widths()
+
+
+class ColumnWidths(object):
+    """
+    Accumulates column widths one row at a time, so that columns can be "auto-fitted" while rows are being written.
+    Field names are included when calculating widths. The displayed length of each value is estimated cheaply based
+    on its type (see `WIDTH_ESTIMATORS`), and only the longest length seen in each column is kept.
 
-        if autofit_columns is True:
-            # We want the longest value in a given column, including the field name.
-            headers_and_data = [field_names] + sheet_data
-            for row in headers_and_data:
-                for idx, value in enumerate(row):
-                    if isinstance(value, datetime.datetime):
-                        # datetime string representation is usually much longer (26 chars)
-                        # than default date format (8 chars)
-                        formatted_length = len(str(self.workbook.default_date_format.num_format))
-                        compare_value = max(formatted_length, WorkbookBuilder.DEFAULT_COL_WIDTH)
-                    else:
-                        compare_value = len(str(value))
-                    if compare_value > col_widths[idx]:
-                        col_widths[idx] = compare_value * 1.15
-
-        for i, width in enumerate(col_widths):
-            if width > WorkbookBuilder.MAX_COLUMN_WIDTH:
-                col_widths[i] = WorkbookBuilder.MAX_COLUMN_WIDTH
-
-        return col_widths
+    For very large sheets, provide `sample_size` to bound the cost: the first `sample_size` rows are measured, along
+    with a reservoir sample of up to `sample_size` of the remaining rows, which is measured when widths are requested.
+
+    Keyword arguments
+    :field_names: (list) The column names, in order.
+    :column_width: (int) Optional. The minimum (or uniform) column width. Defaults to `WorkbookBuilder.DEFAULT_COL_WIDTH`.
+    :date_width: (int) Optional. The displayed width of datetime values, which is usually much shorter than their
+        string representation.
+    :sample_size: (int) Optional, default None. If provided, estimate widths from a sample of rows rather than all rows.
+    :seed: Optional. Seed for the random number generator used for sampling.
+
+    """
+    def __init__(self, field_names, column_width=None, date_width=None, sample_size=None, seed=None):
+        self.column_width = column_width or WorkbookBuilder.DEFAULT_COL_WIDTH
+        self.max_lengths = [0] * len(field_names)
+        self.estimators = dict(WIDTH_ESTIMATORS)
+        if date_width is not None:
+            self.estimators[datetime.datetime] = lambda value: date_width
+        self.sample_size = sample_size
+        self.rows_seen = 0
+        self.reservoir = []
+        self.random = Random(seed)
+        self._weight = None
+        self._next_sample = None
+        self.update(field_names)
+
+    def update(self, row):
+        max_lengths = self.max_lengths
+        estimators = self.estimators
+        for idx, value in enumerate(row):
+            estimator = estimators.get(value.__class__)
+            length = len(str(value)) if estimator is None else estimator(value)
+            if length > max_lengths[idx]:
+                max_lengths[idx] = length
+
+    def add_row(self, row):
+        """Account for a data row, measuring it immediately unless it falls outside of the sample."""
+        self.rows_seen += 1
+        if self.sample_size is None or self.rows_seen <= self.sample_size:
+            self.update(row)
+        else:
+            self.sample(row)
+
+    def sample(self, row):
+        """
+        Maintain a uniform reservoir sample of rows beyond the first `sample_size`. Uses "Algorithm L", which
+        computes how many rows to skip between replacements, so most rows cost a single comparison.
+        """
+        position = self.rows_seen - self.sample_size
+        if position <= self.sample_size:
+            self.reservoir.append(row)
+            if position == self.sample_size:
+                self._weight = exp(log(self.random.random()) / self.sample_size)
+                self._skip_ahead(position)
+        elif position == self._next_sample:
+            self.reservoir[self.random.randrange(self.sample_size)] = row
+            self._weight *= exp(log(self.random.random()) / self.sample_size)
+            self._skip_ahead(position)
+
+    def _skip_ahead(self, position):
+        self._next_sample = position + floor(log(self.random.random()) / log(1 - self._weight)) + 1
+
+    def track(self, rows):
+        """Yields each of the provided rows unchanged, updating column widths as they pass through."""
+        for row in rows:
+            self.add_row(row)
+            yield row
+
+    def widths(self):
+        """:return: List of column widths, none of which exceed `WorkbookBuilder.MAX_COLUMN_WIDTH`."""
+        for row in self.reservoir:
+            self.update(row)
+        self.reservoir = []
+        return [
+            min(length * 1.15 if length > self.column_width else self.column_width, WorkbookBuilder.MAX_COLUMN_WIDTH)
+            for length in self.max_lengths
+        ]
 
 
 class WorkbookEditor(object):
-    def __init__(self, workbook_filename):
+    """
+    Allows for editing of existing Excel workbooks using the openpyxl library.
+
+    By default the whole workbook is loaded into memory. With `read_only=True` the workbook is instead opened in
+    openpyxl's read-only mode, so that rows are streamed from the file as they are read. In read-only mode, sheet
+    replacements are deferred until `save_workbook`, which copies every other sheet through to a new write-only
+    workbook row by row. Cell values and styles (number formats, fonts, fills, borders and alignment), column
+    dimensions and merged cells are copied; other sheet features, such as charts, images and conditional formats,
+    are not.
+    """
+    # Cell style attributes copied through to the new workbook.
+    CELL_STYLES = ('font', 'fill', 'border', 'number_format', 'alignment', 'protection')
+
+    def __init__(self, workbook_filename, read_only=False):
         self.workbook_filename = workbook_filename
-        self.workbook = openpyxl.load_workbook(filename=workbook_filename)
+        self.read_only = read_only
+        self.replacements = {}
+        self.workbook = openpyxl.load_workbook(filename=workbook_filename, read_only=read_only)
 
     def replace_sheet_contents(self, sheet_name: str, data_rows: list, headers: list) -> None:
+        if self.read_only:
+            if sheet_name not in self.workbook.sheetnames:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            # Rows will be consumed when the workbook is saved.
+            self.replacements[sheet_name] = (headers, data_rows)
+            return
         del self.workbook[sheet_name]
         worksheet = self.workbook.create_sheet(sheet_name)
         worksheet.append(headers)
         for row in data_rows:
             worksheet.append(list(row))
 
-    def get_all_values(self, sheet_name: str) -> list:
-        rows = []
-        for row in self.workbook[sheet_name].values:
-            rows.append(row)
-        return rows
-    
+    def get_all_values(self, sheet_name: str, columns: list = None) -> list:
+        return list(self.iter_values(sheet_name, columns))
+
+    def iter_values(self, sheet_name: str, columns: list = None):
+        """
+        Yields the values of each row of the worksheet as a tuple, starting with the header row. If `columns` is
+        provided, only those columns are included, identified either by header name or by (zero-based) index.
+        """
+        rows = self.workbook[sheet_name].values
+        if columns is None:
+            yield from rows
+            return
+        header_row, rows = peek(rows)
+        if header_row is None:
+            return
+        indices = [header_row.index(column) if isinstance(column, str) else column for column in columns]
+        for row in rows:
+            yield tuple(row[i] if i < len(row) else None for i in indices)
+
     def save_workbook(self, save_as: str = None) -> None:
         if save_as is None:
             save_as=self.workbook_filename
-        self.workbook.save(save_as)
+        if self.read_only:
+            self._copy_through(save_as)
+        else:
+            self.workbook.save(save_as)
+
+    def _copy_through(self, save_as: str) -> None:
+        """
+        Stream every worksheet into a new write-only workbook, substituting any replaced sheet contents, and save it.
+        The new workbook is written to a temporary file and then moved into place, so `save_as` may be the source file.
+        """
+        new_workbook = openpyxl.Workbook(write_only=True)
+        for sheet_name in self.workbook.sheetnames:
+            worksheet = new_workbook.create_sheet(sheet_name)
+            if sheet_name in self.replacements:
+                headers, data_rows = self.replacements[sheet_name]
+                worksheet.append(headers)
+                for row in data_rows:
+                    worksheet.append(list(row))
+            else:
+                self._copy_sheet(self.workbook[sheet_name], worksheet)
+        temp_file = os.path.join(os.path.dirname(os.path.abspath(save_as)), f".{os.path.basename(save_as)}.tmp")
+        try:
+            new_workbook.save(temp_file)
+            self.workbook.close()
+            os.replace(temp_file, save_as)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        self.replacements = {}
+        self.workbook = openpyxl.load_workbook(filename=save_as, read_only=True)
+
+    def _copy_sheet(self, source, worksheet):
+        """Copy a read-only worksheet's column dimensions, merged cells and styled cells to a write-only worksheet."""
+        self._copy_layout(source, worksheet)
+        styles = self.CELL_STYLES
+        for row in source.rows:
+            values = []
+            for cell in row:
+                if not getattr(cell, 'has_style', False):
+                    values.append(cell.value)
+                    continue
+                styled = WriteOnlyCell(worksheet, cell.value)
+                for style in styles:
+                    setattr(styled, style, getattr(cell, style))
+                values.append(styled)
+            worksheet.append(values)
+
+    @staticmethod
+    def _copy_layout(source, worksheet):
+        """
+        Copy column dimensions and merged cells, which openpyxl does not load in read-only mode, by streaming through
+        the source worksheet's XML. Rows are discarded as they are parsed.
+        """
+        with source._get_source() as xml:
+            for _, element in iterparse(xml):
+                tag = element.tag.rsplit('}', 1)[-1]
+                if tag == 'col':
+                    attributes = dict(element.attrib)
+                    # Column styles refer to the source workbook's style table.
+                    attributes.pop('style', None)
+                    column = get_column_letter(int(attributes['min']))
+                    worksheet.column_dimensions[column] = ColumnDimension(worksheet, index=column, **attributes)
+                elif tag == 'mergeCell':
+                    worksheet.merged_cells.add(element.get('ref'))
+                elif tag == 'row':
+                    element.clear()
+
+
+def select_column_writers(worksheet, column_types):
+    """
+    Given a worksheet and the type of each column (e.g. from a `ColumnSchema`), return a list of (type, method) pairs -
+    one for each column. The method is the worksheet's type-specialized writer for the column's type. Columns without
+    a specialized writer are (None, None).
+    """
+    writers = []
+    for column_type in column_types:
+        method_name = CELL_WRITERS.get(column_type)
+        if method_name:
+            writers.append((column_type, getattr(worksheet, method_name)))
+        else:
+            writers.append((None, None))
+    return writers
+
+
+def overflow_sheet_name(sheet_name, sheet_number):
+    """
+    Return the name of the nth worksheet used to hold data for `sheet_name`, e.g. `Sheet`, `Sheet (2)`, `Sheet (3)`.
+    The provided name is truncated if necessary so that the result is a valid worksheet name.
+    """
+    if sheet_number == 1:
+        return sheet_name
+    suffix = f" ({sheet_number})"
+    return sheet_name[:WorkbookBuilder.MAX_SHEET_NAME_LENGTH - len(suffix)] + suffix
+
+
+def peek(rows):
+    """Return the first of the provided rows (or None, if there are none) and an iterator over all of the rows."""
+    rows = iter(rows)
+    first_row = next(rows, None)
+    if first_row is None:
+        return None, rows
+    return first_row, chain([first_row], rows)
 
 
 def apply_column_rule(row, rule):
     """
     Given a cell value and a rule, return a format name. See `create_cell_formats` for more detail.
     """
+    return compile_column_rule(rule)(row)
+
+
+def compile_column_rule(rule):
+    """
+    Given a rule, return a function which accepts a row and returns a format name (or None). The rule type is only
+    dispatched on once. See `create_cell_formats` for more detail.
+    """
     rule_type = rule['type']
     if rule_type == 'all':
-        return rule['format']
+        format_name = rule['format']
+        return lambda row: format_name
     if rule_type == 'boolean':
-        if rule['function'](row):
-            return rule['format']
-        else:
-            return None
+        function, format_name = rule['function'], rule['format']
+        return lambda row: format_name if function(row) else None
     if rule_type == 'conditional':
-        return rule['function'](row)
+        return rule['function']
     raise ValueError(f"Column rule type <{rule['type']}> not supported")
 
 
+def compile_column_rules(field_names, format_rules):
+    """
+    Compile column format rules once, returning one entry for each field name: None if the column has no rule,
+    the format name itself for rules of type `all`, or otherwise a function which accepts a row and returns a
+    format name (or None).
+    """
+    compiled = []
+    for field_name in field_names:
+        rule = format_rules.get(field_name)
+        if rule is None:
+            compiled.append(None)
+        elif rule['type'] == 'all':
+            compiled.append(rule['format'])
+        else:
+            compiled.append(compile_column_rule(rule))
+    return compiled
+
+
 def create_column_formats(data, format_rules):
     """
     Iterate through provided data and apply format rules, returning format names corresponding to each data element.
     """
-    result = []
-    for row in data:
-        row_formats = [
-            apply_column_rule(row, format_rules[col_name]) if col_name in format_rules else None
-            for col_name in row.keys()
-        ]
-        result.append(row_formats)
-    return result
+    if not data:
+        return []
+    column_rules = compile_column_rules(list(data[0].keys()), format_rules)
+    return [
+        [rule(row) if callable(rule) else rule for rule, _ in zip(column_rules, row)]
+        for row in data
+    ]
+
+
+def compile_row_rules(format_rules):
+    """
+    Compile row format rules once, returning a single function which accepts a row and returns the format name of the
+    first rule to produce one (or None). See `create_cell_formats` for more detail.
+    """
+    if isinstance(format_rules, dict):
+        format_rules = [format_rules]
+    compiled = [compile_column_rule(rule) for rule in format_rules]
+
+    def row_rule(row):
+        for rule in compiled:
+            format_name = rule(row)
+            if format_name is not None:
+                return format_name
+        return None
+    return row_rule
 
 
 def create_row_formats(data, format_rules):
-    raise NotImplementedError("Formatting rows has not yet been implemented, but will be included in a future release.")
+    """
+    Iterate through provided data and apply format rules once per row, returning format names corresponding to
+    each data element.
+    """
+    row_rule = compile_row_rules(format_rules)
+    result = []
+    for row in data:
+        format_name = row_rule(row)
+        result.append([format_name] * len(row))
+    return result
 
 
 def create_cell_formats(data, format_axis=None, format_rules=None):
@@ -204,8 +683,12 @@ def create_cell_formats(data, format_axis=None, format_rules=None):
     Columns - Keys are field names as strings. Values are dictionaries representing the rule to apply for that specific
         column. These dictionaries must contain `type`, and may contain `format` and/or `function`.
 
+    Rows - A list of dictionaries, each representing a rule to apply to entire rows (a single rule may be provided
+        without a list). Rules are evaluated in order, once per row, and the first format name produced is applied
+        to the whole row. Rules have the same structure as column rules.
+
     Possible values for `type` include:
-        all: format the entire column using the provided format name.
+        all: format the entire column (or every row) using the provided format name.
         boolean: format any values with the provided format name, which test as True using a provided `function`,
             The functions should accept a RowDict and return True or False.
         conditional: format any values with one or more provided format names. The provided `function` should accept
@@ -218,7 +701,12 @@ def create_cell_formats(data, format_axis=None, format_rules=None):
         'age': {'type': 'boolean', 'format': 'bold_red', 'function': lambda row: row['field'] % 2 == 0},
     }
 
-    :type format_rules: Dictionary, with keys representing column names (if applying column rules).
+    format_rules = [
+        {'type': 'boolean', 'format': 'highlight', 'function': lambda row: row['status'] == 'overdue'},
+    ]
+
+    :type format_rules: Dictionary, with keys representing column names (if applying column rules), or list of
+        dictionaries (if applying row rules).
     :return: List of lists of strings, where each is the name of the format object to be applied to that data
         element, or None if no format is to be applied.
     """
@@ -0,0 +1,71 @@
+"""
+porthole-run: asks a running report server (see porthole.server.ReportServer) to run reports. The reports themselves
+are run by the server, so the client needs nothing from porthole beyond the server's default socket path.
+"""
+import json
+import socket
+import sys
+from argparse import ArgumentParser
+from porthole.server import default_socket_path
+
+
+def send_request(report_name, socket_path=None, wait=True):
+    """Ask the server to run a report, returning the socket from which its response may be read."""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path or default_socket_path())
+        client.sendall(json.dumps({'report': report_name, 'wait': wait}).encode('utf-8') + b'\n')
+    except OSError:
+        client.close()
+        raise
+    return client
+
+
+def read_response(client):
+    with client, client.makefile('rb') as stream:
+        line = stream.readline()
+    if not line:
+        raise ConnectionError("The report server closed the connection without responding.")
+    return json.loads(line.decode('utf-8'))
+
+
+def run_reports(report_names, socket_path=None, wait=True):
+    """
+    Ask the server to run each report, and return its responses. The reports run concurrently, as the server allows.
+    If `wait` is set, each response is sent once its report has finished; otherwise once the report is accepted.
+    """
+    clients = []
+    try:
+        for report_name in report_names:
+            clients.append(send_request(report_name, socket_path, wait))
+        return [read_response(client) for client in clients]
+    finally:
+        for client in clients:
+            client.close()
+
+
+def main(argv=None):
+    parser = ArgumentParser(prog='porthole-run', description="Runs reports in a running porthole report server.")
+    parser.add_argument("reports", nargs='+', help="names of reports to run")
+    parser.add_argument("-s", "--socket", dest='socket', help=f"path of the server's socket (default: {default_socket_path()})")
+    parser.add_argument("--no-wait", action='store_false', dest='wait', help="return once the reports are accepted, without waiting for them to finish")
+    args = parser.parse_args(argv)
+    try:
+        responses = run_reports(args.reports, args.socket, args.wait)
+    except OSError as e:
+        print(f"Unable to reach the report server at {args.socket or default_socket_path()}: {e}", file=sys.stderr)
+        return 2
+    succeeded = True
+    for response in responses:
+        if response.get('accepted'):
+            print(f"{response['report']}: accepted")
+        elif response.get('succeeded'):
+            print(f"{response['report']}: succeeded in {response['seconds']:.2f} seconds")
+        else:
+            succeeded = False
+            print(f"{response.get('report')}: failed: {response.get('error')}")
+    return 0 if succeeded else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,6 +8,10 @@ setup(
     author_email='speedyturkey@gmail.com',
     url='https://github.com/speedyturkey/porthole',
     packages=['porthole'],
+    py_modules=['porthole_run'],
+    entry_points={
+        'console_scripts': ['porthole-run=porthole_run:main'],
+    },
     python_requires='>3.6',
     install_requires=[
         'openpyxl',
@@ -18,7 +22,10 @@ setup(
         'xlsxwriter',
     ],
     extras_require={
-        'AWS': ["boto3"]
+        'AWS': ["boto3"],
+        'numpy': ["numpy"],
+        'pandas': ["pandas"],
+        'arrow': ["pyarrow"],
     },
     zip_safe=False
 )
@@ -0,0 +1,24 @@
+class FakeResultProxy(object):
+    """
+    Stands in for a SQLAlchemy ResultProxy, returning the provided rows from `fetchmany`. If `fail_after` is provided,
+    fetching raises RuntimeError once that many rows have been fetched.
+    """
+    def __init__(self, rows, field_names=None, fail_after=None):
+        self.rows = list(rows)
+        self.field_names = field_names
+        self.fetched = 0
+        self.fail_after = fail_after
+        self.closed = False
+
+    def fetchmany(self, size):
+        if self.fail_after is not None and self.fetched >= self.fail_after:
+            raise RuntimeError("Connection lost")
+        batch = self.rows[self.fetched:self.fetched + size]
+        self.fetched += len(batch)
+        return batch
+
+    def keys(self):
+        return self.field_names
+
+    def close(self):
+        self.closed = True
@@ -1,8 +1,13 @@
 import os, unittest, json
-from datetime import date
+from unittest import mock
+from datetime import date, datetime
+from decimal import Decimal
 from collections import OrderedDict
-from porthole import QueryReader, QueryResult, QueryExecutor
-from porthole.queries import RowDict
+from porthole import config, QueryReader, QueryResult, QueryExecutor
+from porthole import ResultFilter
+from porthole.frames import np, pd, pa
+from porthole.queries import QueryGenerator, QueryResultStream, RowDict
+from tests.helpers import FakeResultProxy
 
 
 class TestQueries(unittest.TestCase):
@@ -32,6 +37,23 @@ class TestQueries(unittest.TestCase):
         self.assertEqual('billy', result.result_data[0]['Name'])
         self.assertEqual('erika', result.result_data[1]['Name'])
 
+    def test_queryresult_schema(self):
+        result = QueryResult(field_names=['Name', 'Amount'], result_data=[[None, Decimal('1.5')], ['Foo', None]])
+        self.assertEqual(result.schema.column_types, [str, Decimal])
+        result.convert_decimals()
+        self.assertEqual(result.column('Amount'), [1.5, None])
+        self.assertEqual(result.schema.get_type('Amount'), float)
+
+    def test_queryresult_dictionary_encode(self):
+        result = QueryResult(field_names=headers, result_data=[[''.join(['Bi', 'lly']), row1[1]]] + data)
+        result.dictionary_encode()
+        column = result.encoded_columns['Name']
+        self.assertEqual(['Billy', 'Erika'], column.values)
+        self.assertEqual([0, 0, 1], list(column.codes))
+        self.assertIs(result.result_data[0]['Name'], result.result_data[1]['Name'])
+        result.map_function_to_field('Name', str.upper)
+        self.assertEqual({}, result.encoded_columns)
+
     def test_queryreader_no_params(self):
         """A QueryReader can be instantiated when no parameters are required."""
         s = QueryReader(filename='tests/test_query_no_params')
@@ -79,6 +101,360 @@ class TestQueries(unittest.TestCase):
             result2 = qe.execute_query(sql='select * from sys.flarp;')
             self.assertIsInstance(result2, QueryResult)
 
+    def test_streaming_uses_server_side_cursor(self):
+        for options in ({'stream': True}, {'stream': True, 'prefetch_batches': 2}, {'memory_budget': 10 ** 6}):
+            cm = mock.Mock(db='Test')
+            proxy = cm.conn.execution_options.return_value.execute.return_value
+            proxy.keys.return_value = headers
+            proxy.fetchmany.return_value = []
+            QueryGenerator(cm, sql='select 1').execute(**options)
+            cm.conn.execution_options.assert_called_once_with(stream_results=True)
+            cm.conn.execute.assert_not_called()
+        cm = mock.Mock(db='Test')
+        cm.conn.execute.return_value.keys.return_value = headers
+        cm.conn.execute.return_value.fetchall.return_value = []
+        QueryGenerator(cm, sql='select 1').execute()
+        cm.conn.execution_options.assert_not_called()
+
+    def test_configured_memory_budget_uses_server_side_cursor(self):
+        cm = mock.Mock(db='Test')
+        cm.conn.execution_options.return_value.execute.return_value = FakeResultProxy(data, headers)
+        cm.conn.execution_options.return_value.execute.return_value.cursor = True
+        previous = config['Default'].get('memory_budget')
+        config['Default']['memory_budget'] = '100'
+        try:
+            result = QueryGenerator(cm, sql='select 1').execute()
+        finally:
+            if previous is None:
+                config.remove_option('Default', 'memory_budget')
+            else:
+                config['Default']['memory_budget'] = previous
+        cm.conn.execution_options.assert_called_once_with(stream_results=True)
+        cm.conn.execute.assert_not_called()
+        self.assertTrue(result.spilled)
+        self.assertEqual(data, [list(row) for row in result.result_data])
+
+    def test_prefetch_uses_server_side_cursor(self):
+        cm = mock.Mock(db='Test')
+        streaming = cm.conn.execution_options.return_value
+        streaming.execute.return_value = FakeResultProxy(data * 5, headers)
+        streaming.execute.return_value.cursor = True
+        stream = QueryGenerator(cm, sql='select 1').execute(stream=True, batch_size=3, prefetch_batches=2)
+        cm.conn.execution_options.assert_called_once_with(stream_results=True)
+        self.assertEqual(2, stream.prefetch_batches)
+        self.assertEqual(data * 5, [list(row) for row in stream])
+
+
+class TestQueryResultStream(unittest.TestCase):
+
+    def test_stream(self):
+        proxy = FakeResultProxy(data * 5, headers)
+        counts = []
+        stream = QueryResultStream(headers, proxy, batch_size=3, row_counter=counts.append)
+        rows = list(stream)
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(rows[1]['Name'], 'Erika')
+        self.assertEqual(counts, [3, 3, 3, 1])
+        self.assertEqual(stream.result_count, 10)
+        self.assertTrue(proxy.closed)
+
+    def test_prefetched_stream(self):
+        proxy = FakeResultProxy(data * 50, headers)
+        stream = QueryResultStream(headers, proxy, batch_size=3, prefetch_batches=2)
+        self.assertEqual([row['Name'] for row in stream], ['Billy', 'Erika'] * 50)
+        self.assertEqual(stream.result_count, 100)
+        self.assertTrue(proxy.closed)
+
+    def test_prefetched_stream_error(self):
+        proxy = FakeResultProxy(data * 50, headers, fail_after=6)
+        stream = QueryResultStream(headers, proxy, batch_size=3, prefetch_batches=2)
+        with self.assertRaisesRegex(RuntimeError, "Connection lost"):
+            list(stream)
+        self.assertTrue(proxy.closed)
+
+
+class TestSpilledQueryResult(unittest.TestCase):
+
+    def test_fetch_within_budget(self):
+        result = QueryGenerator.fetch_results(FakeResultProxy(data, headers), memory_budget=10 ** 6)
+        self.assertFalse(result.spilled)
+        self.assertEqual(result.result_data, QueryResult(field_names=headers, result_data=data).result_data)
+
+    def test_fetch_spilled(self):
+        proxy = FakeResultProxy(data * 5, headers)
+        result = QueryGenerator.fetch_results(proxy, memory_budget=100)
+        self.assertTrue(result.spilled)
+        self.assertTrue(proxy.closed)
+        self.assertEqual(result.result_count, 10)
+        self.assertEqual(list(result.result_data[-1]), row2)
+        self.assertEqual([list(row) for row in result.result_data], data * 5)
+        result.map_function_to_field('Name', str.upper)
+        result.apply(lambda row: row.update({'DOB': row['DOB'].year}))
+        self.assertEqual(list(result.result_data[0]), ['BILLY', 1988])
+        rf = ResultFilter(result, 'Name')
+        rf.filter()
+        self.assertEqual(rf.keys, ['BILLY', 'ERIKA'])
+        self.assertEqual(rf.filtered_results['ERIKA'].result_data[0]['DOB'], 1988)
+
+
+class TestQueryResultConversion(unittest.TestCase):
+
+    def setUp(self):
+        self.result = QueryResult(field_names=headers + ['Score'], result_data=[row1 + [1], row2 + [None]])
+
+    def test_columns(self):
+        self.assertEqual(
+            [['Billy', 'Erika'], [row1[1], row2[1]], [1, None]],
+            self.result.columns()
+        )
+        self.assertEqual([[], []], QueryResult(field_names=headers, result_data=[]).columns())
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_to_numpy(self):
+        arrays = self.result.to_numpy()
+        self.assertEqual(headers + ['Score'], list(arrays))
+        self.assertEqual(object, arrays['Name'].dtype)
+        self.assertEqual(np.dtype('datetime64[D]'), arrays['DOB'].dtype)
+        self.assertEqual(np.dtype('float64'), arrays['Score'].dtype)
+
+    @unittest.skipIf(pd is None, "pandas is not installed")
+    def test_pandas_round_trip(self):
+        result = QueryResult.from_dataframe(self.result.to_pandas())
+        self.assertEqual(self.result.field_names, result.field_names)
+        self.assertEqual([None, 'Erika'], [result.result_data[1]['Score'], result.result_data[1]['Name']])
+
+    @unittest.skipIf(pa is None, "pyarrow is not installed")
+    def test_to_arrow(self):
+        table = self.result.to_arrow()
+        self.assertEqual(self.result.field_names, table.column_names)
+        self.assertEqual(2, table.num_rows)
+
+
+class TestColumnTransforms(unittest.TestCase):
+
+    def setUp(self):
+        self.result = QueryResult(
+            field_names=['Amount', 'Rate', 'Updated'],
+            result_data=[
+                [Decimal('1.005'), 0.125, datetime(2021, 3, 14, 6, 30)],
+                [Decimal('2.115'), None, datetime(2021, 3, 14, 7, 30)],
+                [None, 2.5, None],
+            ]
+        )
+
+    def test_round_and_scale(self):
+        self.result.round_field('Amount', 2)
+        self.result.round_field('Rate', 2)
+        self.assertEqual([Decimal('1.00'), Decimal('2.12'), None], self.result.column('Amount'))
+        self.assertEqual([0.12, None, 2.5], self.result.column('Rate'))
+        self.result.scale_field('Rate', 2)
+        self.result.scale_field('Amount', 0.5)
+        self.assertEqual([0.24, None, 5.0], self.result.column('Rate'))
+        self.assertEqual([Decimal('0.500'), Decimal('1.060'), None], self.result.column('Amount'))
+
+    def test_transform_and_fill_null(self):
+        self.result.fill_null('Rate', 1)
+        self.assertEqual([0.125, 1, 2.5], self.result.column('Rate'))
+        self.result.transform('Rate', lambda column: [value * 4 for value in column])
+        self.assertEqual([0.5, 4, 10.0], self.result.column('Rate'))
+
+    def test_mixed_int_and_float_column(self):
+        result = QueryResult(field_names=['a'], result_data=[[1], [2.7], [3.5]])
+        result.scale_field('a', 2)
+        self.assertEqual([2, 5.4, 7.0], result.column('a'))
+        result = QueryResult(field_names=['a'], result_data=[[1], [2.74], [3.5]])
+        result.round_field('a', 1)
+        self.assertEqual([1, 2.7, 3.5], result.column('a'))
+        result.transform('a', lambda column: [value * 2 for value in column])
+        self.assertEqual([2, 5.4, 7.0], result.column('a'))
+
+    def test_int_column_with_nulls(self):
+        result = QueryResult(field_names=['a'], result_data=[[1], [None], [3]])
+        result.scale_field('a', 2)
+        result.round_field('a', 1)
+        self.assertEqual([2, None, 6], result.column('a'))
+        self.assertEqual([int, int], [value.__class__ for value in result.column('a') if value is not None])
+        result.transform('a', lambda column: [value + 1 for value in column])
+        self.assertEqual([3, None, 7], result.column('a'))
+        self.assertEqual([int, int], [value.__class__ for value in result.column('a') if value is not None])
+
+    def test_large_int_column(self):
+        result = QueryResult(field_names=['a'], result_data=[[2 ** 70], [1]])
+        result.scale_field('a', 2)
+        self.assertEqual([2 ** 71, 2], result.column('a'))
+        result.round_field('a')
+        result.transform('a', lambda column: [value + 1 for value in column])
+        self.assertEqual([2 ** 71 + 1, 3], result.column('a'))
+        # Scaling by an int must not overflow int64, even if the values fit in it.
+        result = QueryResult(field_names=['a'], result_data=[[2 ** 62], [1]])
+        result.scale_field('a', 4)
+        self.assertEqual([2 ** 64, 4], result.column('a'))
+
+    def test_convert_timezone(self):
+        self.result.convert_timezone('Updated', 'US/Eastern')
+        self.assertEqual(
+            [datetime(2021, 3, 14, 1, 30), datetime(2021, 3, 14, 3, 30), None],
+            self.result.column('Updated')
+        )
+        with self.assertRaises(TypeError):
+            self.result.convert_timezone('Rate', 'US/Eastern')
+
+
+class TestJoin(unittest.TestCase):
+
+    def setUp(self):
+        self.people = QueryResult(field_names=['Name', 'Team'], result_data=[['Billy', 1], ['Erika', 2], ['Zed', None]])
+        self.teams = QueryResult(
+            field_names=['Team', 'Name'],
+            result_data=[[1, 'Red'], [2, 'Blue'], [1, 'Crimson'], [3, 'Green']]
+        )
+
+    def test_inner_join(self):
+        joined = self.people.join(self.teams, on='Team')
+        self.assertEqual(['Name', 'Team', 'Name_right'], joined.field_names)
+        self.assertEqual(3, joined.result_count)
+        self.assertEqual(
+            sorted([['Billy', 1, 'Red'], ['Billy', 1, 'Crimson'], ['Erika', 2, 'Blue']]),
+            sorted(list(row) for row in joined.result_data)
+        )
+        reverse = self.teams.join(self.people, on='Team')
+        self.assertEqual(3, reverse.result_count)
+
+    def test_left_join(self):
+        for other in (self.teams, QueryResult(field_names=['Team', 'Name'], result_data=[[2, 'Blue']])):
+            joined = self.people.join(other, on='Team', how='left')
+            names = {tuple(row)[:2]: row['Name_right'] for row in joined.result_data}
+            self.assertEqual(None, names[('Zed', None)])
+            self.assertEqual('Blue', names[('Erika', 2)])
+
+    def test_join_keeps_left_order(self):
+        # The index is built on the smaller side: here the left side, which is then reordered.
+        joined = self.people.join(self.teams, on='Team', how='left')
+        self.assertEqual(
+            [['Billy', 1, 'Red'], ['Billy', 1, 'Crimson'], ['Erika', 2, 'Blue'], ['Zed', None, None]],
+            [list(row) for row in joined.result_data]
+        )
+        reds = QueryResult(field_names=['Team', 'Name'], result_data=[[1, 'Red'], [1, 'Crimson']])
+        joined = self.people.join(reds, on='Team', how='left')
+        self.assertEqual(
+            [['Billy', 1, 'Red'], ['Billy', 1, 'Crimson'], ['Erika', 2, None], ['Zed', None, None]],
+            [list(row) for row in joined.result_data]
+        )
+
+    def test_join_stream(self):
+        stream = QueryResultStream(['Team', 'Name'], FakeResultProxy([[1, 'Red'], [2, 'Blue'], [1, 'Crimson']]))
+        joined = self.people.join(stream, on='Team', how='left', lazy=True)
+        self.assertEqual(['Name', 'Team', 'Name_right'], joined.field_names)
+        rows = [list(row) for row in joined]
+        self.assertEqual(
+            [['Billy', 1, 'Red'], ['Erika', 2, 'Blue'], ['Billy', 1, 'Crimson'], ['Zed', None, None]],
+            rows
+        )
+        self.assertEqual(4, joined.result_count)
+
+
+class TestAggregates(unittest.TestCase):
+
+    def setUp(self):
+        self.result = QueryResult(
+            field_names=['Region', 'Year', 'Units', 'Price', 'Revenue'],
+            result_data=[
+                ['East', 2020, 1, 1.5, Decimal('1.50')],
+                ['West', 2020, 2, None, Decimal('2.25')],
+                ['East', 2021, 3, 2.5, None],
+                ['East', 2020, None, 0.5, Decimal('0.25')],
+            ]
+        )
+
+    def test_group_by_agg(self):
+        summary = self.result.group_by('Region').agg(
+            {'Units': ['sum', 'count', 'max'], 'Price': 'mean', 'Revenue': 'sum', 'Year': lambda years: len(set(years))}
+        )
+        self.assertEqual(
+            ['Region', 'Units_sum', 'Units_count', 'Units_max', 'Price', 'Revenue', 'Year'],
+            summary.field_names
+        )
+        self.assertEqual(
+            [['East', 4, 2, 3, 1.5, Decimal('1.75'), 2], ['West', 2, 1, 2, None, Decimal('2.25'), 1]],
+            [list(row) for row in summary.result_data]
+        )
+
+    def test_agg_mixed_numbers(self):
+        result = QueryResult(field_names=['Key', 'Value'], result_data=[['x', 1], ['x', 2.7], ['y', 3.5]])
+        summary = result.group_by('Key').agg({'Value': ['sum', 'max', 'mean']})
+        self.assertEqual(
+            [['x', 3.7, 2.7, 1.85], ['y', 3.5, 3.5, 3.5]],
+            [[row['Key']] + [round(value, 10) for value in list(row)[1:]] for row in summary.result_data]
+        )
+
+    def test_agg_sum_overflow(self):
+        result = QueryResult(field_names=['Key', 'Value'], result_data=[['x', 2 ** 62], ['x', 2 ** 62], ['y', 1]])
+        summary = result.group_by('Key').agg({'Value': 'sum'})
+        self.assertEqual([['x', 2 ** 63], ['y', 1]], [list(row) for row in summary.result_data])
+
+    def test_pivot_name_collision(self):
+        result = QueryResult(field_names=['Region', 'Key', 'Units'], result_data=[['East', 'Region', 1]])
+        with self.assertRaisesRegex(ValueError, "duplicate"):
+            result.pivot(index='Region', columns='Key', values='Units')
+
+    def test_pivot(self):
+        pivoted = self.result.pivot(index='Region', columns='Year', values='Units', aggfunc='sum')
+        self.assertEqual(['Region', '2020', '2021'], pivoted.field_names)
+        self.assertEqual([['East', 1, 3], ['West', 2, None]], [list(row) for row in pivoted.result_data])
+
+
+class TestFieldIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.result = QueryResult(
+            field_names=['Account', 'Amount'],
+            result_data=[[3, 10], [1, 20], [3, 30], [2, 40], [None, 50]]
+        )
+
+    def test_lookup_and_range(self):
+        index = self.result.index_on('Account')
+        self.assertEqual([10, 30], [row['Amount'] for row in index.lookup(3)])
+        self.assertEqual([], index.lookup(4))
+        self.assertEqual([20, 40], [row['Amount'] for row in index.range(1, 3)])
+        self.assertEqual([40, 10, 30], [row['Amount'] for row in index.range(2, 3, include_hi=True)])
+        self.assertEqual([20, 40, 10, 30], [row['Amount'] for row in self.result.index_on('Account', 'sorted').range()])
+        self.assertIs(index, self.result.index_on('Account'))
+
+    def test_invalidation(self):
+        index = self.result.index_on('Account')
+        amount_index = self.result.index_on('Amount')
+        self.result.map_function_to_field('Account', lambda value: value and value * 10)
+        self.assertIsNot(index, self.result.index_on('Account'))
+        self.assertFalse(index.is_current())
+        self.assertIs(amount_index, self.result.index_on('Amount'))
+        self.assertEqual([10, 30], [row['Amount'] for row in self.result.index_on('Account').lookup(30)])
+        self.result.apply(lambda row: None)
+        self.assertIsNot(amount_index, self.result.index_on('Amount'))
+
+    def test_rebuild(self):
+        index = self.result.index_on('Account')
+        self.result.result_data[0]['Account'] = 4
+        self.result.result_data.append(RowDict(fields=['Account', 'Amount'], values=[1, 60]))
+        self.assertIs(index, self.result.index_on('Account'))
+        self.assertIs(index, index.rebuild())
+        self.assertEqual([10], [row['Amount'] for row in self.result.index_on('Account').lookup(4)])
+        self.assertEqual([20, 60], [row['Amount'] for row in self.result.index_on('Account').lookup(1)])
+
+    def test_assigning_rows_invalidates(self):
+        index = self.result.index_on('Account')
+        self.result.result_data = [RowDict(fields=['Account', 'Amount'], values=[5, 70])]
+        self.assertFalse(index.is_current())
+        self.assertEqual([70], [row['Amount'] for row in self.result.index_on('Account').lookup(5)])
+
+    def test_mixed_types(self):
+        result = QueryResult(field_names=['Account', 'Amount'], result_data=[['b', 10], [2, 20], ['a', 30], [1.5, 40]])
+        index = result.index_on('Account', 'sorted')
+        self.assertEqual([40, 20, 30, 10], [row['Amount'] for row in index.range()])
+        self.assertEqual([40, 20], [row['Amount'] for row in index.range(1)])
+        self.assertEqual([30], [row['Amount'] for row in index.range('a', 'b')])
+        with self.assertRaises(TypeError):
+            index.range(1, 'b')
+
 
 class TestRowDict(unittest.TestCase):
 
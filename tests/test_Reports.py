@@ -5,10 +5,18 @@ Test failure notification is sent on failure.
 Test email is not sent on failure.
 """
 
+import subprocess
+import sys
+import time
+from datetime import datetime
 from types import MethodType
 import unittest
+import pytz
 from sqlalchemy.exc import InvalidRequestError
-from porthole import config, BasicReport, GenericReport, ReportRunner, QueryExecutor
+from porthole import config, BasicReport, ConnectionManager, GenericReport, ReportRunner, QueryExecutor
+from porthole.app import Session
+from porthole.mailer import Mailer
+from porthole.models import AutomatedReport, ReportLog
 
 
 TEST_QUERY = "select count(*) from sys.flarp;"
@@ -217,3 +225,83 @@ class TestReportRunner(unittest.TestCase):
         self.assertTrue(parsed.debug_mode)
         parsed = ReportRunner().parse_args(['--debug'])
         self.assertTrue(parsed.debug_mode)
+
+    def test_daemon_modules_not_imported(self):
+        daemon_modules = ['porthole.scheduler', 'porthole.server', 'porthole.work_queue', 'porthole.workers']
+        code = "import sys, porthole; print(','.join(m for m in {!r} if m in sys.modules))".format(daemon_modules)
+        output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, check=True).stdout
+        self.assertEqual('', output.decode().strip())
+
+    def test_run_batch(self):
+        def failing_report():
+            raise RuntimeError("Report failed")
+
+        def active_report():
+            report = GenericReport(report_name='test_report_active', report_title='Test Report - Active')
+            self.assertEqual(['speedyturkey@gmail.com'], report.to_recipients)
+            self.assertIsNotNone(ConnectionManager.engine_cache)
+            report.cleanup()
+
+        runner = ReportRunner(report_map={'failing': failing_report, 'active': active_report})
+        outcomes = runner.run_batch(['failing', 'active'])
+        self.assertEqual(['failing', 'active'], [outcome.report_name for outcome in outcomes])
+        self.assertEqual([False, True], [outcome.succeeded for outcome in outcomes])
+        self.assertIsInstance(outcomes[0].error, RuntimeError)
+        self.assertIsNone(ConnectionManager.engine_cache)
+        self.assertIsNone(GenericReport.metadata_cache)
+        self.assertFalse(Mailer.share_connection)
+        self.assertEqual([], runner.due_reports())
+
+    def test_due_reports(self):
+        runner = ReportRunner(report_map={'test_report_active': lambda: None})
+        now = pytz.utc.localize(datetime(2021, 3, 15, 10, 30))
+        session = Session()
+        report = session.query(AutomatedReport).filter_by(report_name='test_report_active').one()
+        try:
+            report.schedule_minute = '0'
+            session.commit()
+            # Reports due since their last run are run, even if that was not this minute.
+            runner.last_started = lambda: {'test_report_active': datetime(2021, 3, 15, 8, 0, 5)}
+            self.assertEqual(['test_report_active'], runner.due_reports(now))
+            runner.last_started = lambda: {'test_report_active': datetime(2021, 3, 15, 10, 0, 5)}
+            self.assertEqual([], runner.due_reports(now))
+            # Reports which have never run are due if their schedules fire this minute.
+            runner.last_started = lambda: {}
+            self.assertEqual([], runner.due_reports(now))
+            self.assertEqual(['test_report_active'], runner.due_reports(now.replace(minute=0, second=30)))
+        finally:
+            report.schedule_minute = None
+            session.commit()
+            session.close()
+
+    def test_last_started(self):
+        session = Session()
+        logs = [ReportLog('test_last_started', datetime(2021, 3, 15, hour)) for hour in (8, 10, 9)]
+        session.add_all(logs)
+        session.commit()
+        try:
+            self.assertEqual(datetime(2021, 3, 15, 10), ReportRunner.last_started()['test_last_started'])
+        finally:
+            for log in logs:
+                session.delete(log)
+            session.commit()
+            session.close()
+
+    def test_run_parallel(self):
+        def failing_report():
+            raise RuntimeError("Report failed")
+
+        def hung_report():
+            time.sleep(60)
+
+        runner = ReportRunner(report_map={
+            'succeeding': lambda: None,
+            'failing': failing_report,
+            'hung': {'function': hung_report, 'timeout': 1, 'databases': ['Test']},
+        })
+        started = time.monotonic()
+        outcomes = runner.run_batch(['hung', 'failing', 'succeeding'], workers=2)
+        self.assertLess(time.monotonic() - started, 30)
+        self.assertEqual(['hung', 'failing', 'succeeding'], [outcome.report_name for outcome in outcomes])
+        self.assertEqual([False, False, True], [outcome.succeeded for outcome in outcomes])
+        self.assertIsInstance(outcomes[0].error, TimeoutError)
@@ -1,7 +1,10 @@
 import os
 import datetime
 import unittest
-from porthole import WorkbookBuilder
+import openpyxl
+from porthole import ColumnSchema, WorkbookBuilder
+from porthole.queries import RowDict
+from porthole.xlsx import ColumnWidths, create_cell_formats
 
 
 class TestWorkbookBuilder(unittest.TestCase):
@@ -45,3 +48,149 @@ class TestWorkbookBuilder(unittest.TestCase):
         WorkbookBuilder.DEFAULT_COL_WIDTH = 0
         widths = self.test_builder.calculate_column_widths(field_names, data, autofit_columns=True)
         self.assertEqual(widths[2], date_format_length * 1.15)
+
+    def test_write_unformatted_rows(self):
+        field_names = ['Name', 'Amount', 'Date', 'Flag', 'Other']
+        data = [
+            ['Foo', 1.5, datetime.date(2020, 1, 2), True, None],
+            [None, 'n/a', datetime.datetime(2020, 1, 3, 4, 5), False, 7],
+            ['=1+1', 3, None, None, 'Bar'],
+        ]
+        self.test_builder.add_worksheet("TestSheet", field_names, data)
+        self.test_builder.close_workbook()
+        worksheet = openpyxl.load_workbook(self.test_builder.filename)["TestSheet"]
+        values = list(worksheet.values)
+        self.assertEqual(values[0], tuple(field_names))
+        self.assertEqual(values[1], ('Foo', 1.5, datetime.datetime(2020, 1, 2), True, None))
+        self.assertEqual(values[2], (None, 'n/a', datetime.datetime(2020, 1, 3, 4, 5), False, 7))
+        self.assertEqual(values[3], ('=1+1', 3, None, None, 'Bar'))
+        # Strings are handled alike in every column, so formulas are written as formulas.
+        self.assertEqual('f', worksheet['A4'].data_type)
+
+    def test_add_worksheet_stream(self):
+        field_names = ['Field1', 'Field2']
+        rows = (['Foo', i] for i in range(5))
+        rows_written = self.test_builder.add_worksheet_stream("TestSheet", field_names, rows)
+        self.assertEqual(rows_written, 5)
+        self.assertEqual(self.test_builder.add_worksheet_stream("Empty", field_names, iter([])), 0)
+        self.test_builder.close_workbook()
+        worksheet = openpyxl.load_workbook(self.test_builder.filename)["TestSheet"]
+        self.assertEqual(list(worksheet.values)[-1], ('Foo', 4))
+
+    def test_autofit_uses_longest_value(self):
+        field_names = ['Field1']
+        data = [['A' * 20], ['B' * 22], ['C' * 21]]
+        widths = self.test_builder.calculate_column_widths(field_names, data, autofit_columns=True)
+        self.assertEqual(widths[0], 22 * 1.15)
+
+    def test_autofit_sample(self):
+        field_names = ['Field1', 'Field2']
+        # The widest values appear only after the first 100 rows have been measured and the reservoir has filled.
+        data = [['A' * 5, i] for i in range(200)] + [['A' * (40 if i % 2 else 10), i] for i in range(200, 10000)]
+        exact = ColumnWidths(field_names)
+        sampled = ColumnWidths(field_names, sample_size=100, seed=1)
+        first_rows = ColumnWidths(field_names)
+        for row in data:
+            exact.add_row(row)
+            sampled.add_row(row)
+        for row in data[:100]:
+            first_rows.add_row(row)
+        self.assertEqual(len(sampled.reservoir), 100)
+        self.assertEqual(40, max(len(row[0]) for row in sampled.reservoir))
+        self.assertGreater(sampled.widths()[0], first_rows.widths()[0])
+        self.assertEqual(sampled.widths(), exact.widths())
+
+    def test_column_format_rules(self):
+        self.test_builder.add_format('money', {'num_format': '$#,##0.00'})
+        self.test_builder.add_format('bold', {'bold': True})
+        field_names = ['Name', 'Salary', 'Age']
+        data = [
+            RowDict(fields=field_names, values=['Foo', 1000.5, 30]),
+            RowDict(fields=field_names, values=['Bar', 2000, 41]),
+        ]
+        format_rules = {
+            'Salary': {'type': 'all', 'format': 'money'},
+            'Age': {'type': 'boolean', 'format': 'bold', 'function': lambda row: row['Age'] % 2 == 0},
+            'Name': {'type': 'conditional', 'function': lambda row: 'bold' if row['Name'] == 'Bar' else None},
+        }
+        self.assertEqual(
+            create_cell_formats(data, 'column', format_rules),
+            [[None, 'money', 'bold'], ['bold', 'money', None]]
+        )
+        self.test_builder.add_worksheet("TestSheet", field_names, data, format_axis='column', format_rules=format_rules)
+        self.test_builder.close_workbook()
+        worksheet = openpyxl.load_workbook(self.test_builder.filename)["TestSheet"]
+        self.assertEqual(worksheet['B2'].number_format, '$#,##0.00')
+        self.assertEqual(worksheet['B3'].number_format, '$#,##0.00')
+        self.assertTrue(worksheet['C2'].font.b)
+        self.assertFalse(worksheet['C3'].font.b)
+        self.assertFalse(worksheet['A2'].font.b)
+        self.assertTrue(worksheet['A3'].font.b)
+
+    def test_row_format_rules(self):
+        self.test_builder.add_format('highlight', {'bg_color': '#FFFF00'})
+        field_names = ['Name', 'Status']
+        data = [
+            RowDict(fields=field_names, values=['Foo', 'overdue']),
+            RowDict(fields=field_names, values=['Bar', 'paid']),
+        ]
+        calls = []
+
+        def is_overdue(row):
+            calls.append(row)
+            return row['Status'] == 'overdue'
+
+        format_rules = [{'type': 'boolean', 'format': 'highlight', 'function': is_overdue}]
+        self.assertEqual(create_cell_formats(data, 'row', format_rules), [['highlight', 'highlight'], [None, None]])
+        self.assertEqual(len(calls), 2)
+        self.test_builder.add_worksheet("TestSheet", field_names, data, format_axis='row', format_rules=format_rules)
+        self.assertEqual(len(calls), 4)
+        self.test_builder.close_workbook()
+        worksheet = openpyxl.load_workbook(self.test_builder.filename)["TestSheet"]
+        self.assertEqual(worksheet['A2'].fill.fgColor.rgb, 'FFFFFF00')
+        self.assertEqual(worksheet['B2'].fill.fgColor.rgb, 'FFFFFF00')
+        self.assertNotEqual(worksheet['A3'].fill.fgColor.rgb, 'FFFFFF00')
+
+    def test_row_format_rules_dates(self):
+        self.test_builder.add_format('highlight', {'bg_color': '#FFFF00'})
+        field_names = ['Name', 'Due', 'Sent']
+        data = [
+            ['Foo', datetime.date(2020, 1, 2), datetime.datetime(2020, 1, 2, 3, 4)],
+            ['Bar', datetime.date(2020, 1, 3), datetime.datetime(2020, 1, 3, 3, 4)],
+        ]
+        format_rules = [{'type': 'boolean', 'format': 'highlight', 'function': lambda row: row[0] == 'Foo'}]
+        self.test_builder.add_worksheet("TestSheet", field_names, data, format_axis='row', format_rules=format_rules)
+        self.test_builder.close_workbook()
+        worksheet = openpyxl.load_workbook(self.test_builder.filename)["TestSheet"]
+        for cell in ('B2', 'C2', 'B3', 'C3'):
+            self.assertEqual('mm/dd/yy', worksheet[cell].number_format)
+        self.assertEqual(worksheet['B2'].fill.fgColor.rgb, 'FFFFFF00')
+        self.assertEqual(datetime.datetime(2020, 1, 2), worksheet['B2'].value)
+
+    def test_overflow_to_additional_sheets(self):
+        self.test_builder.MAX_ROWS = 4
+        field_names = ['Field1', 'Field2']
+        rows = (['Foo', i] for i in range(7))
+        rows_written = self.test_builder.add_worksheet_stream("TestSheet", field_names, rows)
+        self.assertEqual(rows_written, 7)
+        self.assertEqual(
+            ["TestSheet", "TestSheet (2)", "TestSheet (3)"],
+            [worksheet.name for worksheet in self.test_builder.workbook.worksheets()]
+        )
+        self.test_builder.add_worksheet("Exact", field_names, [['Bar', i] for i in range(3)])
+        self.assertNotIn("Exact (2)", self.test_builder.workbook.sheetnames)
+        with self.assertRaises(ValueError):
+            self.test_builder.add_worksheet_stream("NoOverflow", field_names, [['Baz', 1]] * 4, overflow=False)
+        self.test_builder.close_workbook()
+        workbook = openpyxl.load_workbook(self.test_builder.filename)
+        self.assertEqual(list(workbook["TestSheet (3)"].values), [tuple(field_names), ('Foo', 6)])
+
+    def test_add_worksheet_with_schema(self):
+        field_names = ['Name', 'Amount']
+        data = [[None, None], ['Foo', 2.5]]
+        schema = ColumnSchema.from_rows(field_names, data)
+        self.assertEqual(schema.column_types, [str, float])
+        self.test_builder.add_worksheet("TestSheet", field_names, data, schema=schema)
+        self.test_builder.close_workbook()
+        worksheet = openpyxl.load_workbook(self.test_builder.filename)["TestSheet"]
+        self.assertEqual(list(worksheet.values)[1:], [(None, None), ('Foo', 2.5)])
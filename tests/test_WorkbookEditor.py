@@ -1,7 +1,9 @@
 import os
 import unittest
+from unittest import mock
 from porthole import WorkbookEditor
 import openpyxl
+import openpyxl.styles
 
 
 class TestWorkbookEditor(unittest.TestCase):
@@ -66,4 +68,56 @@ class TestWorkbookEditor(unittest.TestCase):
         values = wb2.get_all_values(sheet_name)
         self.assertEqual(values[0][0], 3.14)
 
+    def test_get_all_values_columns(self):
+        sheet_name = self.test_sheet.title
+        wb = WorkbookEditor(workbook_filename=self.test_filename)
+        wb.replace_sheet_contents(sheet_name=sheet_name, data_rows=self.test_data, headers=self.test_fields)
+        values = wb.get_all_values(sheet_name, columns=['b', 3])
+        self.assertEqual(values, [('b', 'd'), ('grand', 'duke'), ('ten', 'men')])
+
+    def test_read_only_replace_sheet_contents(self):
+        sheet_name = self.test_sheet.title
+        self.test_workbook.create_sheet('test_sheet_2').append(['unchanged'])
+        self.test_workbook.save(filename=self.test_filename)
+        wb = WorkbookEditor(workbook_filename=self.test_filename, read_only=True)
+        wb.replace_sheet_contents(sheet_name=sheet_name, data_rows=iter(self.test_data), headers=self.test_fields)
+        self.assertEqual(wb.get_all_values(sheet_name), [(3.14,)])
+        wb.save_workbook()
+        self.assertEqual(list(wb.iter_values(sheet_name)), [tuple(self.test_fields)] + self.test_data)
+        wb2 = WorkbookEditor(workbook_filename=self.test_filename)
+        self.assertEqual(wb2.workbook.sheetnames, [sheet_name, 'test_sheet_2'])
+        self.assertEqual(wb2.get_all_values('test_sheet_2'), [('unchanged',)])
+        wb.workbook.close()
+
+    def test_read_only_save_keeps_styles(self):
+        styled = self.test_workbook.create_sheet('styled')
+        styled.append(['Rate', 'Total'])
+        styled.append([0.25, 10])
+        styled['A2'].number_format = '0.00%'
+        styled['A1'].font = openpyxl.styles.Font(bold=True)
+        styled.column_dimensions['A'].width = 30
+        styled.merge_cells('A3:B3')
+        self.test_workbook.save(filename=self.test_filename)
+        wb = WorkbookEditor(workbook_filename=self.test_filename, read_only=True)
+        wb.replace_sheet_contents(self.test_sheet.title, data_rows=iter(self.test_data), headers=self.test_fields)
+        wb.save_workbook()
+        wb.workbook.close()
+        worksheet = openpyxl.load_workbook(self.test_filename)['styled']
+        self.assertEqual([('Rate', 'Total'), (0.25, 10), (None, None)], list(worksheet.values))
+        self.assertEqual('0.00%', worksheet['A2'].number_format)
+        self.assertTrue(worksheet['A1'].font.b)
+        self.assertEqual(30, worksheet.column_dimensions['A'].width)
+        self.assertEqual(['A3:B3'], [str(cell_range) for cell_range in worksheet.merged_cells.ranges])
+
+    def test_read_only_failed_save_removes_temp_file(self):
+        def failing_save(workbook, filename):
+            open(filename, 'w').close()
+            raise OSError("Disk full")
 
+        wb = WorkbookEditor(workbook_filename=self.test_filename, read_only=True)
+        wb.replace_sheet_contents(sheet_name=self.test_sheet.title, data_rows=iter(self.test_data), headers=self.test_fields)
+        with mock.patch.object(openpyxl.Workbook, 'save', failing_save):
+            with self.assertRaises(OSError):
+                wb.save_workbook()
+        self.assertFalse(os.path.exists(f".{self.test_filename}.tmp"))
+        wb.workbook.close()
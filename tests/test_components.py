@@ -1,4 +1,4 @@
-import os, unittest
+import csv, gzip, os, unittest, zipfile
 from porthole import ConnectionManager, config
 from porthole.components import ReportWriter
 
@@ -40,3 +40,93 @@ class TestReportWriter(unittest.TestCase):
         writer.create_worksheet_from_query(self.cm, "sheet/1", sql=test_query)
         writer.close_workbook()
         self.assertFalse(writer.logger.error_buffer.empty)
+
+    def test_create_worksheet_streaming(self):
+        writer = ReportWriter("Test Report 4")
+        writer.build_file()
+        test_query = "select * from {}.flarp;".format(self.cm.schema)
+        writer.create_worksheet_from_query(
+            self.cm, "sheet1", sql=test_query, query_kwargs={'stream': True, 'batch_size': 3}
+        )
+        writer.close_workbook()
+        self.assertEqual(writer.record_count, 4)
+        self.assertTrue(writer.logger.error_buffer.empty)
+        os.unlink(writer.report_file)
+
+    def test_create_worksheet_pipelined(self):
+        writer = ReportWriter("Test Report 5")
+        writer.build_file()
+        test_query = "select * from {}.flarp;".format(self.cm.schema)
+        writer.create_worksheet_from_query(
+            self.cm, "sheet1", sql=test_query, query_kwargs={'pipelined': True, 'batch_size': 1}
+        )
+        writer.close_workbook()
+        self.assertEqual(writer.record_count, 4)
+        self.assertTrue(writer.logger.error_buffer.empty)
+        os.unlink(writer.report_file)
+
+    def test_create_worksheets_from_queries(self):
+        writer = ReportWriter("Test Report 6")
+        writer.build_file()
+        test_query = "select * from {}.flarp;".format(self.cm.schema)
+        writer.create_worksheets_from_queries([
+            {'cm': self.cm, 'sheet_name': 'sheet1', 'sql': test_query},
+            {'cm': self.cm, 'sheet_name': 'sheet2', 'sql': test_query, 'query_kwargs': {'stream': True}},
+            {'cm': self.cm, 'sheet_name': 'sheet3', 'sql': test_query, 'query_kwargs': {'increment_counter': False}},
+        ])
+        self.assertEqual(
+            ['sheet1', 'sheet2', 'sheet3'],
+            [worksheet.name for worksheet in writer.workbook_builder.workbook.worksheets()]
+        )
+        writer.close_workbook()
+        self.assertEqual(writer.record_count, 8)
+        self.assertTrue(writer.logger.error_buffer.empty)
+        self.assertFalse(self.cm.closed())
+        os.unlink(writer.report_file)
+
+    def test_create_csv_files(self):
+        writer = ReportWriter("Test Report 7", output_format='csv.gz')
+        writer.build_file()
+        test_query = "select * from {}.flarp;".format(self.cm.schema)
+        writer.create_worksheet_from_query(self.cm, "sheet1", sql=test_query)
+        writer.create_worksheet_from_query(self.cm, "sheet2", sql=test_query, query_kwargs={'stream': True})
+        writer.close_workbook()
+        self.assertTrue(writer.logger.error_buffer.empty)
+        self.assertEqual(2, len(writer.report_files))
+        self.assertEqual(writer.report_files[0], writer.report_file)
+        self.assertTrue(writer.report_file.endswith(' - sheet1.csv.gz'))
+        for report_file in writer.report_files:
+            self.assertTrue(report_file.endswith('.csv.gz'))
+            with gzip.open(report_file, 'rt', newline='') as f:
+                rows = list(csv.reader(f))
+            self.assertEqual(5, len(rows))
+            self.assertEqual(['flarp_id', 'foo', 'bar'], rows[0][:3])
+            self.assertEqual([['1', 'Some text', '17'], ['3', 'Bees?', '3']], [rows[1][:3], rows[3][:3]])
+            os.unlink(report_file)
+
+    def test_row_threshold_chooses_zip(self):
+        writer = ReportWriter("Test Report 8", row_threshold=3, large_output_format='zip')
+        writer.build_file()
+        self.assertIsNone(writer.workbook_builder)
+        writer.add_format('bold', {'bold': True})
+        test_query = "select * from {}.flarp;".format(self.cm.schema)
+        writer.create_worksheet_from_query(self.cm, "sheet1", sql=test_query)
+        writer.create_worksheet_from_query(self.cm, "sheet2", sql=test_query)
+        writer.close_workbook()
+        self.assertTrue(writer.report_file.endswith('.zip'))
+        self.assertEqual([writer.report_file], writer.report_files)
+        with zipfile.ZipFile(writer.report_file) as archive:
+            self.assertEqual(['sheet1.csv', 'sheet2.csv'], archive.namelist())
+        os.unlink(writer.report_file)
+
+    def test_row_threshold_applies_pending_formats(self):
+        writer = ReportWriter("Test Report 9", row_threshold=100)
+        writer.build_file()
+        writer.add_format('bold', {'bold': True})
+        test_query = "select * from {}.flarp;".format(self.cm.schema)
+        writer.create_worksheet_from_query(self.cm, "sheet1", sql=test_query)
+        writer.close_workbook()
+        self.assertTrue(writer.logger.error_buffer.empty)
+        self.assertTrue(writer.report_file.endswith('.xlsx'))
+        self.assertIn('bold', writer.workbook_builder.formats)
+        os.unlink(writer.report_file)
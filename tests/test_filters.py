@@ -1,8 +1,10 @@
 import sys
 import unittest
+from collections import OrderedDict
 from random import randint, choice
-from porthole import QueryResult, ResultFilter
-from porthole.queries import RowDict
+from porthole import QueryResult, ResultFilter, SortedResultFilter
+from porthole.queries import QueryResultStream, RowDict
+from tests.helpers import FakeResultProxy
 
 
 class TestResultFilter(unittest.TestCase):
@@ -36,3 +38,95 @@ class TestResultFilter(unittest.TestCase):
         test_filter.filter()
         for key, data in test_filter:
             self.assertTrue(key in self.names)
+
+    def test_filter_encoded(self):
+        self.result.dictionary_encode()
+        self.assertEqual(['Name'], list(self.result.encoded_columns))
+        test_filter = ResultFilter(result_to_filter=self.result, filter_by='Name')
+        test_filter.filter()
+        self.assertEqual(self.result.encoded_columns['Name'].values, test_filter.keys)
+        for key, data in test_filter:
+            expected = [list(row) for row in self.data if row['Name'] == key]
+            self.assertEqual(expected, [list(row) for row in data.result_data])
+
+    def test_filter_encoded_after_direct_changes(self):
+        self.result.dictionary_encode()
+        self.result.result_data[0]['Name'] = 'Changed'
+        self.result.result_data.append(RowDict(fields=self.fields, values=['Added', 1]))
+        test_filter = ResultFilter(result_to_filter=self.result, filter_by='Name')
+        test_filter.filter()
+        self.assertNotIn('Name', self.result.encoded_columns)
+        self.assertEqual(set(self.names) | {'Changed', 'Added'}, set(test_filter.keys))
+        self.assertEqual(1, test_filter.filtered_results['Changed'].result_count)
+
+    def test_filter_multiple_fields(self):
+        test_filter = ResultFilter(result_to_filter=self.result, filter_by=['Name', 'Number'])
+        test_filter.filter()
+        expected = list(OrderedDict.fromkeys((row['Name'], row['Number']) for row in self.data))
+        self.assertEqual(expected, test_filter.keys)
+        for key, data in test_filter:
+            self.assertTrue(all((row['Name'], row['Number']) == key for row in data.result_data))
+            self.assertEqual(data.result_count, len(data.result_data))
+
+    def test_filtered_results_share_rows(self):
+        test_filter = ResultFilter(result_to_filter=self.result, filter_by='Name')
+        test_filter.filter()
+        key = test_filter.keys[0]
+        self.assertIs(self.result.result_data[0], test_filter.filtered_results[key].result_data[0])
+
+    def test_filtered_data_and_indexes(self):
+        test_filter = ResultFilter(result_to_filter=self.result, filter_by='Name')
+        test_filter.filter()
+        for key in test_filter.keys:
+            expected = [list(row) for row in self.data if row['Name'] == key]
+            self.assertEqual(expected, [list(row) for row in test_filter.filtered_data[key]])
+            indexes = [idx for idx, row in enumerate(self.data) if row['Name'] == key]
+            self.assertEqual(indexes, test_filter.filtered_indexes[key])
+
+    def test_views_built_when_accessed(self):
+        test_filter = ResultFilter(result_to_filter=self.result, filter_by='Name')
+        test_filter.filter()
+        self.assertTrue(all(view._result_data is None for view in test_filter.filtered_results.values()))
+        key = test_filter.keys[0]
+        self.assertEqual(test_filter.filtered_results[key].result_count, len(test_filter.filtered_data[key]))
+        self.assertEqual(
+            [key], [name for name, view in test_filter.filtered_results.items() if view._result_data is not None]
+        )
+
+    def test_view_changes_discard_parent_caches(self):
+        self.result.dictionary_encode()
+        index = self.result.index_on('Name')
+        schema = self.result.schema
+        test_filter = ResultFilter(result_to_filter=self.result, filter_by='Name')
+        test_filter.filter()
+        test_filter.filtered_results['Foo'].map_function_to_field('Name', lambda name: name.upper())
+        self.assertIsNone(self.result.encoded_column('Name'))
+        self.assertIsNot(index, self.result.index_on('Name'))
+        self.assertIsNot(schema, self.result.schema)
+        self.assertEqual([], self.result.index_on('Name').lookup('Foo'))
+
+    def test_for_each(self):
+        test_filter = ResultFilter(result_to_filter=self.result, filter_by='Name')
+        counts = test_filter.for_each(lambda key, data: (key, len(data.result_data)), max_workers=2)
+        self.assertEqual(test_filter.keys, [key for key, count in counts])
+        self.assertEqual(len(self.data), sum(count for key, count in counts))
+
+
+class TestSortedResultFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.fields = ['Name', 'Number']
+        self.rows = sorted([[choice(['Foo', 'Bar', 'Bodoni']), randint(0, 100)] for _ in range(0, 100)])
+
+    def test_filter_stream(self):
+        stream = QueryResultStream(self.fields, FakeResultProxy(self.rows), batch_size=7)
+        groups = list(SortedResultFilter(stream, filter_by='Name'))
+        self.assertEqual(sorted(set(row[0] for row in self.rows)), [key for key, data in groups])
+        for key, data in groups:
+            self.assertEqual([row for row in self.rows if row[0] == key], [list(row) for row in data.result_data])
+            self.assertEqual(data.result_count, len(data.result_data))
+
+    def test_unsorted_input(self):
+        result = QueryResult(field_names=self.fields, result_data=[['Foo', 1], ['Bar', 2], ['Foo', 3]])
+        with self.assertRaisesRegex(ValueError, "not sorted"):
+            list(SortedResultFilter(result, filter_by='Name'))
@@ -0,0 +1,62 @@
+import unittest
+from datetime import datetime, timedelta
+import pytz
+from porthole import ReportRunner
+from porthole.scheduler import ReportScheduler
+from porthole.app import Session
+from porthole.models import AutomatedReport
+
+
+class TestReportScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.runner = ReportRunner(report_map={'hourly': lambda: None, 'daily': lambda: None})
+        self.scheduler = ReportScheduler(self.runner, workers=1)
+        self.now = pytz.utc.localize(datetime(2021, 3, 15, 10, 30))
+
+    def test_queue_due(self):
+        self.scheduler.update_schedule(AutomatedReport(report_name='hourly', active=1, schedule_minute='0'), self.now)
+        self.scheduler.update_schedule(
+            AutomatedReport(report_name='daily', active=1, schedule_minute='45', schedule_hour='10'), self.now
+        )
+        self.scheduler.update_schedule(AutomatedReport(report_name='unmapped', active=1, schedule_minute='0'), self.now)
+        self.scheduler.update_schedule(AutomatedReport(report_name='hourly', active=0, schedule_minute='0'), self.now)
+        self.scheduler.update_schedule(AutomatedReport(report_name='hourly', active=1, schedule_minute='50'), self.now)
+        self.assertEqual(['daily', 'hourly'], sorted(self.scheduler.schedules))
+        self.scheduler.queue_due(self.now + timedelta(minutes=10))
+        self.assertEqual([], list(self.scheduler.queued))
+        # Stale heap entries for the rescheduled report are ignored.
+        self.scheduler.queue_due(self.now + timedelta(minutes=25))
+        self.assertEqual(['daily', 'hourly'], list(self.scheduler.queued))
+        # A report which is due again before its last run has started is skipped.
+        self.scheduler.queue_due(self.now + timedelta(minutes=80))
+        self.assertEqual(['daily', 'hourly'], list(self.scheduler.queued))
+        self.assertEqual((self.now + timedelta(minutes=140), 'hourly'), self.scheduler.heap[0][:2])
+
+    def test_reload(self):
+        session = Session()
+        report = session.query(AutomatedReport).filter_by(report_name='test_report_active').one()
+        self.runner.report_map['test_report_active'] = lambda: None
+        try:
+            self.scheduler.reload(self.now)
+            self.assertNotIn('test_report_active', self.scheduler.schedules)
+            report.schedule_minute = '15'
+            session.commit()
+            self.scheduler.reload(self.now)
+            self.assertEqual({15}, self.scheduler.schedules['test_report_active'].schedule.minutes)
+        finally:
+            report.schedule_minute = None
+            session.commit()
+            session.close()
+        self.scheduler.reload(self.now)
+        self.assertNotIn('test_report_active', self.scheduler.schedules)
+
+    def test_run_pending(self):
+        self.scheduler.update_schedule(AutomatedReport(report_name='hourly', active=1, schedule_minute='0'), self.now)
+        self.scheduler.next_reload = self.now + timedelta(hours=2)
+        self.scheduler.run_pending(self.now + timedelta(minutes=30))
+        self.assertTrue(self.scheduler.pool.is_running('hourly'))
+        while self.scheduler.pool.running:
+            self.scheduler.pool.wait(1)
+            finished = self.scheduler.pool.collect()
+        self.assertTrue(finished[0][1].succeeded)
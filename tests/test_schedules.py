@@ -0,0 +1,56 @@
+import unittest
+from datetime import datetime
+import pytz
+from porthole.models import AutomatedReport
+from porthole.schedules import Schedule, parse_schedule_field
+
+
+class TestSchedule(unittest.TestCase):
+
+    def test_parse_schedule_field(self):
+        self.assertEqual(set(range(0, 60)), parse_schedule_field(None, 0, 59))
+        self.assertEqual({0, 15, 30, 45}, parse_schedule_field('*/15', 0, 59))
+        self.assertEqual({1, 3, 5, 10}, parse_schedule_field('1-5/2, 10', 0, 59))
+        self.assertEqual({30, 45}, parse_schedule_field('30/15', 0, 59))
+        with self.assertRaises(ValueError):
+            parse_schedule_field('0-60', 0, 59)
+
+    def test_is_due(self):
+        schedule = Schedule(minute='0', hour='7', day_of_week='1-5', timezone='US/Eastern')
+        # Monday, 7am Eastern.
+        self.assertTrue(schedule.is_due(datetime(2021, 3, 15, 11, 0)))
+        self.assertTrue(schedule.is_due(pytz.timezone('US/Eastern').localize(datetime(2021, 3, 15, 7, 0, 30))))
+        self.assertFalse(schedule.is_due(datetime(2021, 3, 15, 12, 0)))
+        # Saturday.
+        self.assertFalse(schedule.is_due(datetime(2021, 3, 20, 11, 0)))
+
+    def test_day_of_month_or_day_of_week(self):
+        schedule = Schedule(minute='0', hour='0', day_of_month='1', day_of_week='7')
+        self.assertTrue(schedule.is_due(datetime(2021, 3, 1)))
+        self.assertTrue(schedule.is_due(datetime(2021, 3, 7)))
+        self.assertFalse(schedule.is_due(datetime(2021, 3, 8)))
+
+    def test_from_report(self):
+        self.assertIsNone(Schedule.from_report(AutomatedReport(report_name='unscheduled')))
+        report = AutomatedReport(report_name='scheduled', schedule_minute='30', schedule_timezone='UTC')
+        self.assertEqual({30}, Schedule.from_report(report).minutes)
+
+    def test_next_fire_time(self):
+        schedule = Schedule(minute='0', hour='7', day_of_week='1-5', timezone='US/Eastern')
+        # Friday, 8am Eastern; the next fire time is Monday, 7am Eastern.
+        self.assertEqual(pytz.utc.localize(datetime(2021, 3, 15, 11, 0)), schedule.next_fire_time(datetime(2021, 3, 12, 13, 0)))
+        # Fire times are strictly after the provided time.
+        self.assertEqual(pytz.utc.localize(datetime(2021, 3, 16, 11, 0)), schedule.next_fire_time(datetime(2021, 3, 15, 11, 0)))
+        self.assertIsNone(Schedule(day_of_month='30', month_of_year='2').next_fire_time(datetime(2021, 1, 1)))
+
+    def test_next_fire_time_across_dst(self):
+        eastern = pytz.timezone('US/Eastern')
+        # 2:30am does not exist on the day clocks go forward, so the schedule next fires the following day.
+        schedule = Schedule(minute='30', hour='2', timezone='US/Eastern')
+        fire_time = schedule.next_fire_time(eastern.localize(datetime(2021, 3, 13, 12, 0)))
+        self.assertEqual(datetime(2021, 3, 15, 2, 30), fire_time.astimezone(eastern).replace(tzinfo=None))
+        # 1:30am occurs twice on the day clocks go back, but the schedule fires once.
+        schedule = Schedule(minute='30', hour='1', timezone='US/Eastern')
+        fire_time = schedule.next_fire_time(eastern.localize(datetime(2021, 11, 6, 12, 0)))
+        self.assertEqual(pytz.utc.localize(datetime(2021, 11, 7, 5, 30)), fire_time)
+        self.assertEqual(pytz.utc.localize(datetime(2021, 11, 8, 6, 30)), schedule.next_fire_time(fire_time))
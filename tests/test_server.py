@@ -0,0 +1,85 @@
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+from unittest import mock
+import porthole_run
+from porthole import ReportRunner
+from porthole.server import ReportServer, default_socket_path
+
+
+def failing_report():
+    raise RuntimeError("Report failed")
+
+
+class TestReportServer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, 'porthole.sock')
+        runner = ReportRunner(report_map={'succeeding': lambda: None, 'failing': failing_report})
+        server = ReportServer(runner, socket_path=self.socket_path, workers=2)
+        self.process = multiprocessing.get_context('fork').Process(target=server.serve_forever)
+        self.process.start()
+        started = time.monotonic()
+        while not os.path.exists(self.socket_path) and time.monotonic() - started < 30:
+            time.sleep(0.05)
+
+    def tearDown(self):
+        self.process.terminate()
+        self.process.join(30)
+        shutil.rmtree(self.directory)
+
+    def test_run_reports(self):
+        responses = porthole_run.run_reports(['succeeding', 'failing', 'unmapped'], self.socket_path)
+        self.assertEqual(['succeeding', 'failing', 'unmapped'], [response['report'] for response in responses])
+        self.assertEqual([True, False, False], [response['succeeded'] for response in responses])
+        self.assertIn('no report function mapped', responses[2]['error'])
+        responses = porthole_run.run_reports(['succeeding'], self.socket_path, wait=False)
+        self.assertTrue(responses[0]['accepted'])
+
+    def test_invalid_requests(self):
+        for request in (b'{"report": ["x"]}\n', b'["x"]\n', b'not json\n'):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(self.socket_path)
+                client.sendall(request)
+                response = porthole_run.read_response(client)
+            self.assertFalse(response['succeeded'])
+            self.assertIn('Invalid request', response['error'])
+        self.assertTrue(porthole_run.run_reports(['succeeding'], self.socket_path)[0]['succeeded'])
+
+    def test_slow_client(self):
+        # A client which has connected without sending its request does not delay others.
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as slow:
+            slow.connect(self.socket_path)
+            started = time.monotonic()
+            responses = porthole_run.run_reports(['succeeding'], self.socket_path)
+            self.assertTrue(responses[0]['succeeded'])
+            self.assertLess(time.monotonic() - started, ReportServer.REQUEST_TIMEOUT)
+            slow.sendall(json.dumps({'report': 'succeeding'}).encode('utf-8') + b'\n')
+            self.assertTrue(porthole_run.read_response(slow)['succeeded'])
+
+    def test_main(self):
+        self.assertEqual(0, porthole_run.main(['succeeding', '--socket', self.socket_path]))
+        self.assertEqual(1, porthole_run.main(['failing', '--socket', self.socket_path]))
+        self.assertEqual(2, porthole_run.main(['succeeding', '--socket', os.path.join(self.directory, 'missing.sock')]))
+
+    def test_stop(self):
+        self.process.terminate()
+        self.process.join(30)
+        self.assertEqual(0, self.process.exitcode)
+        self.assertFalse(os.path.exists(self.socket_path))
+
+
+class TestDefaultSocketPath(unittest.TestCase):
+    def test_default_socket_path(self):
+        with mock.patch.dict(os.environ, {'PORTHOLE_SOCKET': '/tmp/custom.sock'}):
+            self.assertEqual('/tmp/custom.sock', default_socket_path())
+        with mock.patch.dict(os.environ):
+            os.environ.pop('PORTHOLE_SOCKET', None)
+            self.assertEqual(os.path.join(tempfile.gettempdir(), 'porthole.sock'), default_socket_path())
+        self.assertIs(default_socket_path, porthole_run.default_socket_path)
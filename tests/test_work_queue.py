@@ -0,0 +1,108 @@
+import time
+import unittest
+from datetime import timedelta
+from porthole import DataTask, ReportRunner
+from porthole.work_queue import RunQueue, RunQueueWorker
+from porthole.app import Session
+from porthole.models import ReportRun
+
+
+def failing_report():
+    raise RuntimeError("Report failed")
+
+
+class TestRunQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = RunQueue(stale_after=60)
+
+    def get_run(self, run_id):
+        session = Session()
+        try:
+            return session.query(ReportRun).get(run_id)
+        finally:
+            session.close()
+
+    def test_claim(self):
+        first_id = self.queue.enqueue('first')
+        second_id = self.queue.enqueue('second')
+        run = self.queue.claim('worker_a')
+        self.assertEqual((first_id, 'first', 'running', 1), (run.id, run.report_name, run.status, run.attempts))
+        self.assertEqual(second_id, self.queue.claim('worker_b').id)
+        self.assertEqual([], self.queue.heartbeat([first_id], 'worker_a'))
+        self.assertEqual([first_id], self.queue.heartbeat([first_id], 'worker_b'))
+        self.queue.complete(first_id, 'worker_a', succeeded=True)
+        self.queue.complete(second_id, 'worker_b', succeeded=False, error=RuntimeError("Report failed"))
+        self.assertEqual('succeeded', self.get_run(first_id).status)
+        second = self.get_run(second_id)
+        self.assertEqual(('failed', 'Report failed'), (second.status, second.error_detail))
+
+    def test_release(self):
+        run_id = self.queue.enqueue('released')
+        self.assertEqual(run_id, self.queue.claim('worker_a').id)
+        self.queue.release(run_id, 'worker_b')
+        self.assertEqual(('running', 'worker_a', 1), self.run_state(run_id))
+        self.queue.release(run_id, 'worker_a')
+        self.assertEqual(('queued', None, 0), self.run_state(run_id))
+        self.assertEqual(run_id, self.queue.claim('worker_b').id)
+        self.queue.complete(run_id, 'worker_b', succeeded=True)
+
+    def run_state(self, run_id):
+        run = self.get_run(run_id)
+        return run.status, run.worker, run.attempts
+
+    def test_reclaim_stale(self):
+        run_id = self.queue.enqueue('crashed', max_attempts=2)
+        session = Session()
+        try:
+            for attempt in range(2):
+                self.assertEqual(run_id, self.queue.claim('worker_a').id)
+                run = session.query(ReportRun).get(run_id)
+                run.heartbeat_at -= timedelta(minutes=5)
+                session.commit()
+                self.assertEqual(1 - attempt, self.queue.reclaim_stale())
+        finally:
+            session.close()
+        # The run was reclaimed after its first attempt, and failed after its second.
+        self.assertEqual([run_id], self.queue.heartbeat([run_id], 'worker_a'))
+        self.assertEqual(('failed', 2), (self.get_run(run_id).status, self.get_run(run_id).attempts))
+
+
+class TestRunQueueWorker(unittest.TestCase):
+
+    def test_run_pending(self):
+        queue = RunQueue()
+        runner = ReportRunner(report_map={
+            'succeeding': lambda: None,
+            'failing': failing_report,
+            'test_report_active': lambda: None,
+        })
+        run_ids = runner.enqueue(['succeeding', 'failing']) + [DataTask.enqueue('test_report_active')]
+        worker = RunQueueWorker(runner, queue, workers=2)
+        started = time.monotonic()
+        while (worker.run_pending() or worker.pool.running) and time.monotonic() - started < 30:
+            worker.pool.wait(0.5)
+        session = Session()
+        try:
+            runs = {run.id: run for run in session.query(ReportRun).filter(ReportRun.id.in_(run_ids))}
+        finally:
+            session.close()
+        self.assertEqual(['succeeded', 'failed', 'succeeded'], [runs[run_id].status for run_id in run_ids])
+        self.assertEqual(['report', 'report', 'task'], [runs[run_id].run_type for run_id in run_ids])
+
+    def test_release_claimed(self):
+        queue = RunQueue()
+        worker = RunQueueWorker(ReportRunner(report_map={'unstarted': lambda: None}), queue)
+        run_id = queue.enqueue('unstarted')
+        worker.claimed.append(queue.claim(worker.name))
+        self.assertEqual(run_id, worker.claimed[0].id)
+        worker.release_claimed()
+        self.assertEqual(0, len(worker.claimed))
+        session = Session()
+        try:
+            run = session.query(ReportRun).get(run_id)
+            self.assertEqual(('queued', None, 0), (run.status, run.worker, run.attempts))
+            session.delete(run)
+            session.commit()
+        finally:
+            session.close()